@@ -1,13 +1,24 @@
+import os
+import time
+import asyncio
 import pandas as pd
-from openai import OpenAI
-import streamlit as st
 import json
 
-def generate_food_formula(info):
-    """최초 정밀 배합비 생성 함수"""
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+try:
+    from parts.engine_data import FOOD_CODE_MAP, get_recommended_flavors, DATA_DIR
+    from parts import engine_formula, engine_llm, engine_sched
+except ImportError:
+    from engine_data import FOOD_CODE_MAP, get_recommended_flavors, DATA_DIR
+    import engine_formula
+    import engine_llm
+    import engine_sched
 
-    prompt = f"""
+FORMULA_SYSTEM = "Professional Food Scientist. Output ONLY JSON."
+SWEEP_DIR      = os.path.join(DATA_DIR, "formula_sweep")
+
+
+def _formula_prompt(info):
+    return f"""
     당신은 식품기술사이자 식품공학 박사입니다. 다음 조건으로 제조 현장용 정밀 배합비를 설계하세요.
     
     1. 식품유형: {info['category']} > {info['sub_category']}
@@ -21,60 +32,214 @@ def generate_food_formula(info):
     - 컬럼: "원료명", "배합비(%)", "사용 목적", "용도", "용법", "사용주의사항"
     """
 
+
+def _formula_messages(info):
+    return [{"role": "system", "content": FORMULA_SYSTEM},
+            {"role": "user", "content": _formula_prompt(info)}]
+
+
+def _repaired(result):
+    """응답 JSON → 검증·보정된 배합비 DataFrame (이슈 목록은 df.attrs["issues"])"""
+    df, issues = engine_formula.repair_formula(engine_formula.extract_rows(result))
+    if engine_formula.is_fatal(issues):
+        raise ValueError(engine_formula.summarize(issues, levels=("error",)))
+    df.attrs["issues"] = issues
+    return df
+
+
+def _parse_formula(content):
+    """모델 응답(JSON 문자열) → (배합비 DataFrame, 설계근거)"""
+    result = json.loads(content)
+    df = _repaired(result)
+    reasoning = result.get('설계근거', "식품공전 규격에 최적화된 설계입니다.") if isinstance(result, dict) else ""
+    return df, reasoning
+
+
+def generate_food_formula(info, refresh=False, replay=None, api_key=None):
+    """최초 정밀 배합비 생성 함수 (refresh=True: 같은 조건 "다시 생성" — 캐시를 건너뛰고 새 응답으로 갱신)"""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": "Professional Food Scientist. Output ONLY JSON."},
-                      {"role": "user", "content": prompt}],
-            response_format={ "type": "json_object" }
+        content = engine_llm.chat(
+            _formula_messages(info),
+            model=engine_llm.model_for("formula"),
+            response_format={ "type": "json_object" },
+            refresh=refresh,
+            is_valid=engine_llm.is_json,
+            key=api_key,
+            replay=replay,
         )
-        result = json.loads(response.choices[0].message.content)
-        # 다양한 JSON 키 구조에 대응
-        data = result.get('ingredients', list(result.values())[0])
-        if not isinstance(data, list): # 만약 리스트가 아니라면 내부 리스트 탐색
-            data = list(result.values())[0]
-            
-        df = pd.DataFrame(data)
-        reasoning = result.get('설계근거', "식품공전 규격에 최적화된 설계입니다.")
-        return df, reasoning
+        return _parse_formula(content)
     except Exception as e:
         return pd.DataFrame(), str(e)
 
-def update_formula_with_chat(current_df, user_request):
-    """채팅 피드백을 반영하여 배합비를 수정하는 함수"""
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    current_data_str = current_df.to_json(orient='records', force_ascii=False)
+
+# ─────────────────────────────────────────────
+# 카탈로그 일괄 생성 (소분류 × 추천 플레이버, asyncio 동시 호출)
+# ─────────────────────────────────────────────
+def _sweep_key(info):
+    return f"{info['sub_category']}|{info['flavor_name']}"
+
+
+def catalog_infos(concept="", categories=None):
+    """FOOD_CODE_MAP 소분류 × get_recommended_flavors 조합 → generate_food_formula 입력 목록"""
+    infos = []
+    for category in categories or FOOD_CODE_MAP:
+        for sub_category in FOOD_CODE_MAP[category]:
+            for flavor in get_recommended_flavors(category):
+                infos.append({"category": category, "sub_category": sub_category,
+                              "flavor_name": flavor, "concept": concept})
+    return infos
+
+
+def _load_sweep_log(path):
+    rows = []
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue   # 중단 시 잘린 마지막 줄
+    return rows
+
+
+async def _sweep_one(client, sem, info, timeout, retries):
+    async with sem:
+        t0 = time.perf_counter()
+        row = {**info, "ok": False, "reasoning": "", "formula": "", "error": "", "attempts": 0}
+        messages, fmt, mdl = _formula_messages(info), {"type": "json_object"}, engine_llm.model_for("formula")
+        key = engine_llm.cache_key(mdl, messages, fmt)
+        use_cache = True
+        for attempt in range(retries + 1):
+            row["attempts"] = attempt + 1
+            try:
+                content = engine_llm.lookup(key) if use_cache else None
+                fresh = content is None
+                if fresh:
+                    if client is None:
+                        raise engine_llm.ReplayMiss("재생 모드: 기록된 응답 없음")
+                    # 일괄 작업은 BATCH 우선순위 — 대화형 요청이 먼저 나간다
+                    async with engine_sched.scheduler.aslot(mdl, engine_sched.estimate_tokens(messages),
+                                                            engine_sched.BATCH) as slot:
+                        t_call = time.perf_counter()
+                        try:
+                            response = await asyncio.wait_for(
+                                client.chat.completions.create(model=mdl, messages=messages, response_format=fmt),
+                                timeout,
+                            )
+                        except Exception:
+                            engine_llm.record(mdl, time.perf_counter() - t_call, ok=False)
+                            raise
+                        usage = getattr(response, "usage", None)
+                        engine_llm.record(mdl, time.perf_counter() - t_call, usage)
+                        slot["tokens"] = getattr(usage, "total_tokens", None)
+                    content = response.choices[0].message.content
+                # 파싱까지 성공한 응답만 캐시 — 캐시된 응답이 깨졌으면 다음 시도는 캐시를 건너뛴다
+                use_cache = False
+                df, reasoning = _parse_formula(content)
+                if fresh and not df.empty:
+                    engine_llm.store(key, mdl, content)
+                row.update(ok=not df.empty, reasoning=reasoning, error="" if not df.empty else "빈 배합비",
+                           formula=df.to_json(orient="records", force_ascii=False))
+                break
+            except asyncio.TimeoutError:
+                row["error"] = f"시간 초과 ({timeout}s)"
+            except engine_llm.ReplayMiss as e:
+                row["error"] = str(e)
+                break
+            except Exception as e:
+                row["error"] = str(e)
+            if attempt < retries:
+                await asyncio.sleep(2 ** attempt)
+        row["elapsed_s"] = round(time.perf_counter() - t0, 2)
+        return row
+
+
+async def sweep_formulas(infos, api_key=None, concurrency=16, timeout=120, retries=1,
+                         log_path=None, on_result=None, replay=None):
+    """
+    여러 조건의 배합비를 동시에 생성 (최대 concurrency개 동시 요청, 요청당 timeout초).
+    완료되는 순서대로 log_path(JSONL)에 한 줄씩 기록하고 on_result(row, done, total)를 호출한다.
+    log_path에 이미 성공 기록이 있는 조합은 건너뛰므로 중단 후 같은 경로로 다시 실행하면 이어서 진행된다.
+    반환: 조합별 1행 DataFrame (formula 컬럼은 배합비 JSON 문자열)
+    """
+    api_key = api_key or engine_llm.api_key()
+    done_rows = {_sweep_key(r): r for r in _load_sweep_log(log_path) if r.get("ok")}
+    todo = [i for i in infos if _sweep_key(i) not in done_rows]
+
+    if log_path:
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    client = None if engine_llm.is_replay(replay) else engine_llm.async_client(api_key, max_retries=0)
+    sem = asyncio.Semaphore(concurrency)
+    rows = list(done_rows.values())
+    try:
+        tasks = [asyncio.ensure_future(_sweep_one(client, sem, info, timeout, retries)) for info in todo]
+        for n, fut in enumerate(asyncio.as_completed(tasks), 1):
+            row = await fut
+            rows.append(row)
+            if log_path:
+                with open(log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            if on_result:
+                on_result(row, len(done_rows) + n, len(done_rows) + len(todo))
+    finally:
+        if client is not None:
+            await client.close()
+    return pd.DataFrame(rows)
+
+
+def run_catalog_sweep(concept="", categories=None, out_path=None, **kwargs):
+    """
+    카탈로그 전체 일괄 생성 (동기 진입점).
+    out_path가 .parquet이면 같은 이름의 .jsonl을 진행 로그로 쓰고 완료 후 Parquet으로 저장한다.
+    """
+    out_path = out_path or os.path.join(SWEEP_DIR, "catalog.parquet")
+    log_path = os.path.splitext(out_path)[0] + ".jsonl"
+    df = asyncio.run(sweep_formulas(catalog_infos(concept, categories), log_path=log_path, **kwargs))
+    if out_path.endswith(".parquet"):
+        df.to_parquet(out_path, index=False)
+    return df
+
+def update_formula_with_chat(current_df, user_request, replay=None, api_key=None):
+    """
+    채팅 피드백을 반영하여 배합비를 수정하는 함수.
+    현재 배합비는 '원료명|배합비' 줄로만 보내고, 모델은 변경분(패치)만 돌려준다 → 로컬에서 적용 · 재정규화
+    api_key: 세션에서 받은 키 (워커 스레드에서는 st.secrets·세션을 읽지 않도록 호출 측이 넘긴다)
+    """
+    current_data_str = engine_formula.compact_table(current_df)
 
     prompt = f"""
     당신은 대한민국 최고 권위의 식품 R&D 전문가입니다.
     
-    [현재 배합비 데이터]
+    [현재 배합비 (원료명|배합비%)]
     {current_data_str}
     
     [사용자의 수정 요청]
     "{user_request}"
     
-    위 요청을 기술적으로 검토하여 배합비를 수정하십시오. 
-    1. 배합비 합계는 반드시 100.00%를 유지해야 합니다.
-    2. 수정된 원료의 '사용주의사항'이나 '용법'도 전문가 수준으로 업데이트하십시오.
-    3. 응답은 {{"updated_ingredients": [...], "reason": "수정 근거 설명"}} 형식의 JSON으로만 하십시오.
+    위 요청을 기술적으로 검토하여 바뀌는 원료만 패치로 응답하십시오. 바뀌지 않는 원료는 쓰지 마십시오.
+    1. op 종류: "set"(값 지정), "add"(신규 원료), "remove"(삭제), "adjust"(delta만큼 증감)
+    2. 지정하지 않은 원료는 합계 100.00%가 되도록 자동 비례 조정됩니다.
+    3. set/add에는 필요 시 '용법', '사용주의사항'을 전문가 수준으로 함께 적으십시오.
+    4. 응답은 {{"ops": [{{"op": "adjust", "원료명": "설탕", "delta": -2}}, {{"op": "add", "원료명": "알룰로스", "배합비(%)": 2, "용법": "..."}}], "reason": "수정 근거 설명"}} 형식의 JSON으로만 하십시오.
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": "Update the food formula precisely based on feedback. Respond in JSON."},
-                      {"role": "user", "content": prompt}],
-            response_format={ "type": "json_object" }
+        content = engine_llm.chat(
+            [{"role": "system", "content": "Return a minimal JSON patch for the food formula based on feedback."},
+             {"role": "user", "content": prompt}],
+            model=engine_llm.model_for("formula"),
+            response_format={ "type": "json_object" },
+            is_valid=engine_llm.is_json,
+            priority=engine_sched.INTERACTIVE,   # 채팅 튜닝은 대기열 맨 앞
+            replay=replay,
+            key=api_key,
         )
-        result = json.loads(response.choices[0].message.content)
-        
-        # 수정된 리스트 추출
-        raw_list = result.get('updated_ingredients', [])
-        if not raw_list:
-             raw_list = list(result.values())[0]
-             
-        new_df = pd.DataFrame(raw_list)
+        result = json.loads(content)
+        if isinstance(result.get("ops"), list):
+            new_df, issues = engine_formula.apply_patch(current_df, result["ops"])
+            new_df.attrs["issues"] = issues
+        else:   # 전체 목록으로 답한 경우 기존 방식으로 보정
+            new_df = _repaired(result)
         return new_df, result.get('reason', "요청하신 기술적 피드백을 레시피에 반영했습니다.")
     except Exception as e:
-        return current_df, f"수정 작업 중 기술적 오류가 발생했습니다: {e}"
\ No newline at end of file
+        return current_df, f"수정 작업 중 기술적 오류가 발생했습니다: {e}"
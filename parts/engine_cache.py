@@ -0,0 +1,194 @@
+# engine_cache.py
+# 참조 데이터셋 디스크 캐시 (서비스별 TTL · 내용 해시 · 백그라운드 재검증) + 메모리 TTL/LRU 캐시
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from parts.engine_data import DATA_DIR
+except ImportError:
+    from engine_data import DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, "api_cache")
+
+# 서비스 ID별 TTL(초) — 기준규격·영양DB는 거의 바뀌지 않음
+TTL = {
+    "I2580": 7 * 86400,    # 개별기준규격
+    "I2600": 7 * 86400,    # 공통기준규격
+    "I2590": 30 * 86400,   # 공통기준종류
+    "I0760": 7 * 86400,    # 건강기능식품 영양DB
+}
+DEFAULT_TTL = 86400
+
+_refreshing = set()
+_lock = threading.Lock()
+
+
+def _key(svc_id, *args):
+    raw = json.dumps([svc_id, *args], ensure_ascii=False)
+    return f"{svc_id}_{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _read(key):
+    try:
+        with open(_path(key), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(key, value):
+    """값 저장. 내용 해시가 같으면 본문은 그대로 두고 저장 시각만 갱신"""
+    body = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    old = _read(key)
+    entry = {"saved_at": time.time(), "hash": digest,
+             "value": old["value"] if old and old.get("hash") == digest else value}
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _path(key) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, _path(key))
+
+
+def _revalidate(key, loader, is_valid):
+    try:
+        value = loader()
+        if is_valid(value):
+            _write(key, value)
+    except Exception:
+        pass   # 재검증 실패 시 기존 캐시 유지
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+
+def cached_call(svc_id, args, loader, ttl=None, is_valid=lambda v: True):
+    """
+    디스크 캐시 조회. 없으면 loader()로 받아 저장(is_valid 통과 시),
+    TTL이 지났으면 기존 값을 즉시 반환하고 백그라운드에서 재검증한다.
+    """
+    key = _key(svc_id, *args)
+    entry = _read(key)
+    if entry is None:
+        value = loader()
+        if is_valid(value):
+            _write(key, value)
+        return value
+
+    ttl = TTL.get(svc_id, DEFAULT_TTL) if ttl is None else ttl
+    if time.time() - entry["saved_at"] > ttl:
+        with _lock:
+            start = key not in _refreshing
+            _refreshing.add(key)
+        if start:
+            threading.Thread(target=_revalidate, args=(key, loader, is_valid), daemon=True).start()
+    return entry["value"]
+
+
+def invalidate(svc_id=None):
+    """캐시 삭제 (svc_id 미지정 시 전체) → 삭제 건수"""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    n = 0
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".json") and (svc_id is None or name.startswith(f"{svc_id}_")):
+            os.remove(os.path.join(CACHE_DIR, name))
+            n += 1
+    return n
+
+
+def cache_status():
+    """서비스별 캐시 건수 · 가장 오래된 저장 시각 → {svc_id: {...}}"""
+    status = {}
+    if not os.path.isdir(CACHE_DIR):
+        return status
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        entry = _read(name[:-5])
+        if entry is None:
+            continue
+        svc_id = name.split("_", 1)[0]
+        s = status.setdefault(svc_id, {"entries": 0, "oldest": entry["saved_at"]})
+        s["entries"] += 1
+        s["oldest"] = min(s["oldest"], entry["saved_at"])
+    for s in status.values():
+        s["oldest"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(s["oldest"]))
+    return status
+
+
+class TTLCache:
+    """프로세스 공용 메모리 캐시 — 항목별 만료(ttl초) + 최대 maxsize개 LRU 제거 (스레드 안전)"""
+
+    def __init__(self, maxsize=64, ttl=3600):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            saved_at, value = item
+            if time.time() - saved_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute, should_store=lambda v: True):
+        """
+        캐시 조회, 없으면 compute() 결과 저장. 같은 키를 다른 스레드가 계산 중이면
+        그 계산이 끝날 때까지 기다렸다가 결과를 공유한다 (single-flight).
+        반환: (값, 이번 호출에서 직접 계산했는지)
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value, False
+            with self._lock:
+                event = self._pending.get(key)
+                leader = event is None
+                if leader:
+                    event = self._pending[key] = threading.Event()
+            if leader:
+                break
+            event.wait()
+            value = self.get(key)
+            if value is not None:
+                return value, False
+            # 앞선 계산이 실패·미저장 → 다시 시도 (다음 leader 선출)
+        try:
+            value = compute()
+            if should_store(value):
+                self.put(key, value)
+            return value, True
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,104 @@
+# engine_costsim.py
+# 원가 변동 몬테카를로 (원료 가격 로그정규 분포 · 원료 간 상관 · 원가 백분위 · 목표 원가 초과 확률 · 포트폴리오 합산)
+#
+# 표준정규 난수는 (표본 수, 원료 수, seed)별로 한 번만 만들어 재사용하므로,
+# 편집기에서 배합비·가격·변동성을 바꿀 때마다 행렬 곱 몇 번으로 다시 계산된다.
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    from parts import engine_props
+except ImportError:
+    import engine_props
+
+N_DRAWS     = 20000
+PERCENTILES = (5, 50, 95)
+SEED        = 42
+
+
+@lru_cache(maxsize=16)
+def _normals(n_draws, n_items, seed):
+    z = np.random.default_rng(seed).standard_normal((n_draws, n_items))
+    z.setflags(write=False)
+    return z
+
+
+def correlation(n_items, corr=0.0):
+    """
+    원료 간 상관 행렬.
+    corr: 스칼라면 모든 원료 쌍에 같은 상관 (공통 시장 요인), 행렬이면 그대로 사용.
+    양의 정부호가 아니면 고윳값을 잘라 가장 가까운 상관 행렬로 보정한다.
+    """
+    if np.ndim(corr) == 0:
+        c = float(np.clip(corr, 0.0, 0.99))
+        return (1 - c) * np.eye(n_items) + c * np.ones((n_items, n_items))
+    m = (np.asarray(corr, dtype=float) + np.asarray(corr, dtype=float).T) / 2
+    w, v = np.linalg.eigh(m)
+    if w.min() <= 1e-10:
+        m = v @ np.diag(np.maximum(w, 1e-6)) @ v.T
+        d = np.sqrt(np.diag(m))
+        m = m / np.outer(d, d)
+    return m
+
+
+def price_draws(prices, cv, corr=0.0, n_draws=N_DRAWS, seed=SEED):
+    """
+    원료 가격 표본 (표본 수, 원료 수).
+    평균 prices, 변동계수 cv(0.15 = 15%)인 로그정규 분포, 원료 간 상관은 정규 공간(가우시안 코퓰러)에서 적용.
+    """
+    m = np.asarray(prices, dtype=float)
+    s2 = np.log1p(np.broadcast_to(np.asarray(cv, dtype=float), m.shape) ** 2)
+    mu = np.log(np.maximum(m, 1e-12)) - s2 / 2
+    L = np.linalg.cholesky(correlation(len(m), corr))
+    z = _normals(int(n_draws), len(m), int(seed)) @ L.T
+    return np.where(m > 0, np.exp(mu + np.sqrt(s2) * z), 0.0)
+
+
+def simulate(ratios, props, prices, cv, corr=0.0, target=None, volumes=None,
+             n_draws=N_DRAWS, percentiles=PERCENTILES, seed=SEED):
+    """
+    배합안(들)의 L당 원가 분포.
+      ratios : (원료 수,) 배합 1개 또는 (배합 수, 원료 수) 포트폴리오 — 원료 열은 공통 (안 쓰는 원료는 0%)
+      props  : engine_props.lookup() 물성 행렬 (비중 계산용)
+      target : 목표 원가(원/L) — 스칼라 또는 배합별 배열
+      volumes: 배합별 생산량(L) — 있으면 포트폴리오 총원가 분포와 총목표 초과 확률도 계산
+    반환: {"draws": (표본 수, 배합 수) 원/L, "mean", "std", "pct": {백분위: 배열}, "p_exceed",
+           "portfolio": {"draws", "mean", "pct", "p_exceed"} (volumes 지정 시)}
+    """
+    r = np.atleast_2d(np.asarray(ratios, dtype=float))
+    density = engine_props.evaluate(r, props, np.zeros(r.shape[1]))["density"]
+    draws = price_draws(prices, cv, corr, n_draws, seed) @ r.T / 100.0 * density      # (표본 수, 배합 수)
+    out = {"draws": draws, "mean": draws.mean(axis=0), "std": draws.std(axis=0),
+           "pct": dict(zip(percentiles, np.percentile(draws, percentiles, axis=0)))}
+    if target is not None:
+        out["p_exceed"] = (draws > np.asarray(target, dtype=float)).mean(axis=0)
+    if volumes is not None:
+        v = np.asarray(volumes, dtype=float)
+        total = draws @ v
+        port = {"draws": total, "mean": float(total.mean()),
+                "pct": dict(zip(percentiles, np.percentile(total, percentiles)))}
+        if target is not None:
+            port["p_exceed"] = float((total > float(np.sum(np.broadcast_to(target, v.shape) * v))).mean())
+        out["portfolio"] = port
+    return out
+
+
+def simulate_df(df, cv_col="변동성(%)", ratio_col="함량(%)", price_col="원가(원/kg)", default_cv=10.0,
+                corr=0.0, target=None, n_draws=N_DRAWS, table=None):
+    """원료 구성표 1개 → simulate() 결과 (배합 축을 뗀 스칼라 값 + "draws" 1차원 배열)"""
+    df = df.dropna(subset=["원료명"])
+    props, _ = engine_props.lookup(df["원료명"].tolist(), table)
+
+    def num(name, default):
+        if name not in df.columns:
+            return np.full(len(df), default)
+        return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+    res = simulate(num(ratio_col, 0.0), props, num(price_col, 0.0), num(cv_col, default_cv) / 100.0,
+                   corr=corr, target=target, n_draws=n_draws)
+    return {"draws": res["draws"][:, 0], "mean": float(res["mean"][0]), "std": float(res["std"][0]),
+            "pct": {k: float(v[0]) for k, v in res["pct"].items()},
+            **({"p_exceed": float(res["p_exceed"][0])} if "p_exceed" in res else {})}
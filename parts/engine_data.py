@@ -1,5 +1,7 @@
 # engine_data.py
 
+import os
+
 # 1. 식품공전 기반 대분류-소분류 매핑
 FOOD_CODE_MAP = {
     "빙과류": ["아이스크림", "아이스밀크", "샤베트", "저지방아이스크림", "비유지방아이스크림", "빙과"],
@@ -16,4 +18,8 @@ def get_recommended_flavors(category):
         "주류": ["기본(담백)", "복숭아", "밤", "유자", "꿀", "오미자", "청포도", "바나나", "고구마", "옥수수"],
         "음료류": ["제로 콜라", "자몽 허니", "레몬 에이드", "콜드브루", "아쌈 밀크티", "청보리", "ABC주스", "타트체리", "피치 우롱", "콤부차"]
     }
-    return flavors.get(category, ["딸기", "초코", "바닐라", "메론", "바나나", "포도", "사과", "블루베리", "오렌지"])
\ No newline at end of file
+    return flavors.get(category, ["딸기", "초코", "바닐라", "메론", "바나나", "포도", "사과", "블루베리", "오렌지"])
+
+
+# 3. 로컬 데이터 저장 경로 (수집 체크포인트·미러·캐시 공용)
+DATA_DIR = os.environ.get("NPD_DATA_DIR", ".npd_data")
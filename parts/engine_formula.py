@@ -0,0 +1,261 @@
+# engine_formula.py
+# 배합비 검증 · 보정 엔진 (응답 구조 추출 · 스키마 확인 · 배합비 숫자 변환 · 최대잉여법 100.00% 재정규화)
+
+import re
+import numpy as np
+import pandas as pd
+
+RATIO_COL = "배합비(%)"
+COLUMNS   = ["원료명", RATIO_COL, "사용 목적", "용도", "용법", "사용주의사항"]
+TOTAL     = 100.0
+DECIMALS  = 2
+TOLERANCE = 5.0    # 합계가 이만큼(%p) 넘게 어긋나면 반올림 오차가 아닌 응답 오류로 보고 재정규화하지 않음
+
+# 모델이 종종 바꿔 쓰는 키 → 표준 컬럼
+ALIASES = {
+    "원료": "원료명", "원재료명": "원료명", "원료 명": "원료명", "ingredient": "원료명", "name": "원료명",
+    "배합비": RATIO_COL, "배합비(%)": RATIO_COL, "배합비율": RATIO_COL, "배합비율(%)": RATIO_COL,
+    "함량": RATIO_COL, "함량(%)": RATIO_COL, "비율(%)": RATIO_COL, "ratio": RATIO_COL, "percent": RATIO_COL,
+    "사용목적": "사용 목적", "목적": "사용 목적", "purpose": "사용 목적",
+    "주의사항": "사용주의사항", "사용 주의사항": "사용주의사항",
+}
+ROW_KEYS = ["ingredients", "updated_ingredients", "배합비", "formula", "recipe"]
+
+_NUM = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def _issue(level, code, message, row=None):
+    return {"level": level, "code": code, "row": row, "message": message}
+
+
+def is_fatal(issues):
+    return any(i["level"] == "error" and i["row"] is None for i in issues)
+
+
+def extract_rows(result):
+    """
+    모델 JSON 응답에서 원료 행 목록을 찾음.
+    알려진 키 → 값이 dict 목록인 첫 키 → 한 단계 안쪽 dict 순으로 탐색, 없으면 None
+    """
+    if isinstance(result, list):
+        return result if all(isinstance(r, dict) for r in result) else None
+    if not isinstance(result, dict):
+        return None
+    for k in ROW_KEYS:
+        if isinstance(result.get(k), list):
+            return result[k]
+    for v in result.values():
+        if isinstance(v, list) and v and all(isinstance(r, dict) for r in v):
+            return v
+    for v in result.values():
+        if isinstance(v, dict):
+            rows = extract_rows(v)
+            if rows is not None:
+                return rows
+    return None
+
+
+def coerce_ratio(value):
+    """'12.5%', '12,5', ' 3 ', 7 → float, 해석 불가 시 None"""
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value) if np.isfinite(value) else None
+    m = _NUM.search(str(value or ""))
+    if not m:
+        return None
+    return float(m.group().replace(",", "."))
+
+
+def renormalize(values, total=TOTAL, decimals=DECIMALS):
+    """
+    최대잉여법(largest remainder): 비율을 유지한 채 소수 decimals자리로 반올림하면서 합계를 정확히 total로 맞춤.
+    반환: float ndarray (합계 == total)
+    """
+    v = np.asarray(values, dtype=float)
+    units = int(round(total * 10 ** decimals))
+    if not len(v) or v.sum() <= 0:
+        return v
+    raw = v / v.sum() * units
+    base = np.floor(raw).astype(np.int64)
+    short = units - int(base.sum())
+    if short:
+        # 잔여(소수부)가 큰 순, 같으면 원래 값이 큰 순으로 1단위씩 배분
+        order = np.lexsort((-v, -(raw - base)))
+        base[order[:short]] += 1
+    return base / 10 ** decimals
+
+
+def repair_formula(rows, total=TOTAL, decimals=DECIMALS, tolerance=TOLERANCE):
+    """
+    원료 행 목록(또는 DataFrame) 검증 · 보정.
+    - 키 별칭을 표준 컬럼으로 통일, 누락된 선택 컬럼은 빈 문자열
+    - 원료명 없음 · 배합비 해석 불가/음수 행 제외, 같은 원료명은 합산
+    - 합계가 total과 tolerance 이내로 어긋나면 최대잉여법으로 재정규화
+    - 합계가 tolerance 넘게 어긋나거나, 배합비 오류로 뺀 행 때문에 합계가 맞지 않으면
+      재정규화하지 않고 치명 오류(is_fatal)로 표시 — 빠진 몫을 다른 원료에 나눠 주지 않는다
+    반환: (보정된 DataFrame, 이슈 목록 [{"level", "code", "row", "message"}])
+    """
+    issues = []
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict("records")
+    if not isinstance(rows, list) or not rows:
+        return pd.DataFrame(columns=COLUMNS), [_issue("error", "no_rows", "원료 행이 없습니다.")]
+
+    clean = []
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            issues.append(_issue("error", "bad_row", "행이 객체 형식이 아닙니다.", i))
+            continue
+        rec = {}
+        for k, v in r.items():
+            col = ALIASES.get(str(k).strip(), str(k).strip())
+            rec.setdefault(col, v)
+        name = str(rec.get("원료명") or "").strip()
+        if not name:
+            issues.append(_issue("error", "missing_name", "원료명이 없어 제외했습니다.", i))
+            continue
+        ratio = coerce_ratio(rec.get(RATIO_COL))
+        if ratio is None:
+            issues.append(_issue("error", "bad_ratio", f"'{name}' 배합비를 숫자로 읽을 수 없어 제외했습니다.", i))
+            continue
+        if ratio < 0:
+            issues.append(_issue("error", "negative_ratio", f"'{name}' 배합비가 음수라 제외했습니다.", i))
+            continue
+        if not isinstance(rec.get(RATIO_COL), (int, float, np.number)):
+            issues.append(_issue("info", "coerced_ratio", f"'{name}' 배합비 '{rec.get(RATIO_COL)}' → {ratio}", i))
+        rec["원료명"], rec[RATIO_COL] = name, ratio
+        clean.append(rec)
+
+    if not clean:
+        issues.append(_issue("error", "no_valid_rows", "유효한 원료 행이 없습니다."))
+        return pd.DataFrame(columns=COLUMNS), issues
+
+    df = pd.DataFrame(clean)
+    for c in COLUMNS:
+        if c not in df.columns:
+            df[c] = ""
+    extra = [c for c in df.columns if c not in COLUMNS]
+    df = df[COLUMNS + extra]
+    text_cols = [c for c in df.columns if c != RATIO_COL]
+    df[text_cols] = df[text_cols].fillna("").astype(str)
+
+    if df["원료명"].duplicated().any():
+        dups = df.loc[df["원료명"].duplicated(), "원료명"].unique().tolist()
+        issues.append(_issue("warning", "duplicate_name", f"중복 원료 합산: {', '.join(dups)}"))
+        agg = {c: "first" for c in df.columns if c not in ("원료명", RATIO_COL)}
+        agg[RATIO_COL] = "sum"
+        df = df.groupby("원료명", sort=False, as_index=False).agg(agg)[df.columns]
+
+    s = float(df[RATIO_COL].sum())
+    if s <= 0:
+        issues.append(_issue("error", "zero_total", "배합비 합계가 0입니다."))
+        return df, issues
+    if round(s, decimals) != round(total, decimals):
+        dropped = [i for i in issues if i["code"] in ("bad_ratio", "negative_ratio")]
+        if abs(s - total) > tolerance:
+            issues.append(_issue("error", "total_off",
+                                 f"배합비 합계 {s:.{decimals}f}%가 {total:.{decimals}f}%와 {tolerance:g}%p 넘게 달라 "
+                                 "재정규화하지 않았습니다."))
+            return df.reset_index(drop=True), issues
+        if dropped:
+            issues.append(_issue("error", "dropped_rows",
+                                 f"배합비 오류로 {len(dropped)}개 행을 빼서 합계가 {s:.{decimals}f}%입니다 — "
+                                 "재정규화하지 않았습니다."))
+            return df.reset_index(drop=True), issues
+    df[RATIO_COL] = renormalize(df[RATIO_COL].to_numpy(), total, decimals)
+    if round(s, decimals) != round(total, decimals):
+        issues.append(_issue("warning", "renormalized", f"배합비 합계 {s:.{decimals}f}% → {total:.{decimals}f}%로 재정규화"))
+    return df.reset_index(drop=True), issues
+
+
+def summarize(issues, levels=("error", "warning")):
+    """이슈 목록 → 한 줄 요약 문자열 (없으면 빈 문자열)"""
+    msgs = [i["message"] for i in issues if i["level"] in levels]
+    return " / ".join(msgs)
+
+
+# ─────────────────────────────────────────────
+# 패치 기반 수정 (set · add · remove · adjust)
+# ─────────────────────────────────────────────
+PATCH_OPS = ("set", "add", "remove", "adjust")
+
+
+def compact_table(df):
+    """패치 프롬프트용 최소 표현: '원료명|배합비' 줄 목록"""
+    return "\n".join(f"{r['원료명']}|{float(r[RATIO_COL]):g}" for r in df[["원료명", RATIO_COL]].to_dict("records"))
+
+
+def _find(df, name):
+    """원료명 위치 (공백·대소문자 무시) → index 또는 None"""
+    key = re.sub(r"\s+", "", str(name or "")).lower()
+    hits = df.index[df["원료명"].str.replace(r"\s+", "", regex=True).str.lower() == key]
+    return hits[0] if len(hits) else None
+
+
+def apply_patch(df, ops, total=TOTAL, decimals=DECIMALS):
+    """
+    배합비에 패치 적용 후 합계를 total로 맞춤.
+      {"op": "set",    "원료명": .., "배합비(%)": x, (선택) 용법 등 텍스트 필드}
+      {"op": "add",    "원료명": .., "배합비(%)": x, ...}
+      {"op": "remove", "원료명": ..}
+      {"op": "adjust", "원료명": .., "delta": ±x}
+    지정된 원료의 값은 유지하고 나머지 원료를 비례 조정해 합계를 맞춘다
+    (나머지로 맞출 수 없으면 전체 재정규화).
+    반환: (수정된 DataFrame, 이슈 목록)
+    """
+    df = df.copy().reset_index(drop=True)
+    df[RATIO_COL] = pd.to_numeric(df[RATIO_COL], errors="coerce").fillna(0.0)
+    issues, touched = [], set()
+
+    for i, op in enumerate(ops or []):
+        if not isinstance(op, dict):
+            issues.append(_issue("error", "bad_op", "패치 항목이 객체 형식이 아닙니다.", i))
+            continue
+        fields = {ALIASES.get(k, k): v for k, v in op.items() if k not in ("op", "delta")}
+        kind, name = str(op.get("op", "")).lower(), str(fields.get("원료명") or "").strip()
+        if kind not in PATCH_OPS or not name:
+            issues.append(_issue("error", "bad_op", f"해석할 수 없는 패치: {op}", i))
+            continue
+        idx = _find(df, name)
+
+        if kind == "remove":
+            if idx is None:
+                issues.append(_issue("warning", "not_found", f"'{name}' 원료가 없어 삭제를 건너뜀", i))
+            else:
+                df = df.drop(idx).reset_index(drop=True)
+                touched.discard(name)
+            continue
+
+        if kind == "adjust":
+            delta = coerce_ratio(op.get("delta"))
+            if idx is None or delta is None:
+                issues.append(_issue("warning", "not_found", f"'{name}' 조정을 건너뜀 (원료 없음 또는 delta 오류)", i))
+                continue
+            df.loc[idx, RATIO_COL] = max(0.0, df.loc[idx, RATIO_COL] + delta)
+        else:   # set · add
+            ratio = coerce_ratio(fields.get(RATIO_COL))
+            if ratio is None or ratio < 0:
+                issues.append(_issue("error", "bad_ratio", f"'{name}' 배합비 값 오류로 건너뜀", i))
+                continue
+            if idx is None:
+                if kind == "set":
+                    issues.append(_issue("info", "set_as_add", f"'{name}' 원료가 없어 새로 추가", i))
+                df.loc[len(df)] = {c: "" for c in df.columns} | {"원료명": name}
+                idx = len(df) - 1
+            elif kind == "add":
+                issues.append(_issue("info", "add_as_set", f"'{name}' 원료가 이미 있어 값만 변경", i))
+            df.loc[idx, RATIO_COL] = ratio
+            for c, v in fields.items():
+                if c in df.columns and c not in ("원료명", RATIO_COL):
+                    df.loc[idx, c] = str(v)
+        touched.add(df.loc[idx, "원료명"])
+
+    fixed = df["원료명"].isin(touched)
+    rest = total - df.loc[fixed, RATIO_COL].sum()
+    free = df.loc[~fixed, RATIO_COL].sum()
+    if rest >= 0 and free > 0:
+        df.loc[~fixed, RATIO_COL] *= rest / free
+    elif round(df[RATIO_COL].sum(), decimals) != round(total, decimals):
+        issues.append(_issue("warning", "renormalized", "지정 원료만으로 합계를 맞출 수 없어 전체를 재정규화"))
+    df[RATIO_COL] = renormalize(df[RATIO_COL].to_numpy(), total, decimals)
+    df = df[df[RATIO_COL] > 0].reset_index(drop=True)
+    return df, issues
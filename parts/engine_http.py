@@ -0,0 +1,133 @@
+# engine_http.py
+# 외부 API 공용 HTTP 클라이언트 (연결 재사용 · 호스트별 호출 제한 · 재시도 · 지연시간 집계)
+
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (5, 60)                  # (연결, 응답) 초
+RETRY_STATUS    = {429, 500, 502, 503, 504}
+
+# 호스트별 초당 호출 수 · 순간 허용량 (네이버 검색/데이터랩 10회/초, 식품안전나라는 보수적으로)
+RATE_LIMITS = {
+    "openapi.naver.com":             (10.0, 10),
+    "openapi.foodsafetykorea.go.kr": (5.0, 8),
+}
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지는 토큰 버킷 — acquire()는 토큰이 생길 때까지 대기"""
+
+    def __init__(self, rate, capacity):
+        self.rate, self.capacity = rate, capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_take(self, n=1):
+        """토큰 n개를 꺼내면 0, 부족하면 채워질 때까지 필요한 대기 시간(초) 반환"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            n = min(n, self.capacity)   # 용량보다 큰 요청은 가득 찼을 때 통과
+            if self.tokens >= n:
+                self.tokens -= n
+                return 0.0
+            return (n - self.tokens) / self.rate
+
+    def refund(self, n):
+        """미리 꺼낸 양과 실제 사용량 차이 보정 (음수면 추가 차감 → 다음 요청이 그만큼 대기)"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def acquire(self, n=1):
+        while True:
+            wait = self.try_take(n)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+def _make_session():
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+_session = _make_session()
+_buckets = {host: TokenBucket(*limit) for host, limit in RATE_LIMITS.items()}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(host, elapsed, ok):
+    with _stats_lock:
+        s = _stats.setdefault(host, {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["calls"] += 1
+        s["errors"] += 0 if ok else 1
+        s["total_ms"] += elapsed * 1000
+        s["max_ms"] = max(s["max_ms"], elapsed * 1000)
+
+
+def backoff_delay(attempt, backoff=1.0):
+    """지수 백오프 대기 시간 (backoff × 2^attempt, ±25% 지터)"""
+    return backoff * (2 ** attempt) * random.uniform(0.75, 1.25)
+
+
+def request(method, url, retries=3, backoff=1.0, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    공용 세션으로 HTTP 호출. 호스트별 토큰 버킷으로 호출 속도를 제한하고,
+    연결 오류·타임아웃·429/5xx 응답은 지수 백오프로 최대 retries회 재시도한다.
+    마지막 시도의 응답을 반환하거나 마지막 예외를 그대로 발생시킨다.
+    """
+    host = urlsplit(url).hostname or ""
+    bucket = _buckets.get(host)
+    for attempt in range(retries + 1):
+        if bucket:
+            bucket.acquire()
+        delay = backoff_delay(attempt, backoff)
+        t0 = time.perf_counter()
+        try:
+            resp = _session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            _record(host, time.perf_counter() - t0, ok=False)
+            if attempt == retries:
+                raise
+        else:
+            ok = resp.status_code not in RETRY_STATUS
+            _record(host, time.perf_counter() - t0, ok=ok)
+            if ok or attempt == retries:
+                return resp
+            retry_after = resp.headers.get("Retry-After", "")
+            if retry_after.isdigit():   # 서버가 대기 시간을 지정한 경우 우선
+                delay = int(retry_after)
+        with _stats_lock:
+            _stats[host]["retries"] += 1
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def stats():
+    """호스트별 호출 통계 → {host: {calls, errors, retries, avg_ms, max_ms}}"""
+    with _stats_lock:
+        return {
+            host: {
+                "calls": s["calls"], "errors": s["errors"], "retries": s["retries"],
+                "avg_ms": round(s["total_ms"] / max(s["calls"], 1), 1), "max_ms": round(s["max_ms"], 1),
+            }
+            for host, s in _stats.items()
+        }
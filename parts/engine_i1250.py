@@ -0,0 +1,391 @@
+# engine_i1250.py
+# 식품안전나라 I1250(식품(첨가물)품목제조보고) 대량 수집 엔진
+
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+
+try:
+    from parts.engine_data import DATA_DIR
+    from parts import engine_http
+except ImportError:
+    from engine_data import DATA_DIR
+    import engine_http
+
+BASE_URL     = "http://openapi.foodsafetykorea.go.kr/api"
+PAGE_SIZE    = 1000   # API 1회 호출 최대 건수
+MAX_WORKERS  = 8      # 동시 호출 스레드 수 (서버 부하 고려)
+HARVEST_DIR  = os.path.join(DATA_DIR, "i1250_harvest")
+# 다시 호출하면 나아질 수 있는 결과코드 (서버 오류) — 인증키 오류(INFO-100)·권한(INFO-400)·
+# 호출 한도(INFO-300)·요청 형식(ERROR-3xx)·SQL 오류(ERROR-601)는 재시도해도 같으므로 바로 실패
+TRANSIENT_CODES = {"ERROR-500"}
+MIRROR_PATH  = os.path.join(DATA_DIR, "i1250_mirror.sqlite")
+
+I1250_KOR = {
+    "LCNS_NO":                  "인허가번호",
+    "BSSH_NM":                  "업체명",
+    "PRDLST_REPORT_NO":         "품목보고번호",
+    "PRMS_DT":                  "신고일자",
+    "PRDLST_NM":                "제품명",
+    "PRDLST_DCNM":              "품목유형",
+    "PRODUCTION":               "생산종료여부",
+    "HIENG_LNTRT_DVS_NM":       "고열량저영양",
+    "CHILD_CRTFC_YN":           "어린이인증",
+    "POG_DAYCNT":               "소비기한",
+    "LAST_UPDT_DTM":            "최종수정일",
+    "INDUTY_CD_NM":             "업종",
+    "QLITY_MNTNC_TMLMT_DAYCNT": "품질유지기한",
+    "USAGE":                    "용법",
+    "PRPOS":                    "용도",
+    "DISPOS":                   "제품형태",
+    "FRMLC_MTRQLT":             "포장재질",
+    "ETQTY_XPORT_PRDLST_YN":    "내수겸용",
+}
+
+
+def _build_url(api_key, start, end, extra_params=""):
+    url = f"{BASE_URL}/{api_key}/I1250/json/{start}/{end}"
+    if extra_params:
+        url += f"/{extra_params.replace('&', '/')}"
+    return url
+
+
+class ApiError(RuntimeError):
+    """I1250 결과코드 오류 (code: "INFO-100" 등)"""
+
+    def __init__(self, code, msg=""):
+        super().__init__(f"[{code}] {msg}")
+        self.code = code
+
+
+def _transient(e):
+    """재시도할 오류인지 — 네트워크 · 5xx/429 · 깨진 응답 본문 · 일시적 결과코드만"""
+    if isinstance(e, ApiError):
+        return e.code in TRANSIENT_CODES
+    if isinstance(e, requests.HTTPError):
+        return e.response is None or e.response.status_code in engine_http.RETRY_STATUS
+    return isinstance(e, (requests.RequestException, ValueError))
+
+
+def fetch_page(api_key, start, end, extra_params="", timeout=60):
+    """start~end 구간 1페이지 호출 → (rows, total). 실패 시 예외 발생"""
+    resp = engine_http.get(_build_url(api_key, start, end, extra_params), retries=0, timeout=timeout)
+    resp.raise_for_status()
+    svc = resp.json().get("I1250", {})
+    code = svc.get("RESULT", {}).get("CODE", "")
+    if code == "INFO-200":   # 해당 데이터 없음
+        return [], 0
+    if code and code != "INFO-000":
+        raise ApiError(code, svc.get("RESULT", {}).get("MSG", ""))
+    rows = svc.get("row", [])
+    return rows, int(svc.get("total_count", 0) or len(rows))
+
+
+def fetch_page_retry(api_key, start, end, extra_params="", max_retries=4, backoff=1.5):
+    """페이지 단위 재시도 (네트워크 · 일시적 HTTP/결과코드 오류만, 지수 백오프) — 영구 오류는 바로 예외"""
+    for i in range(max_retries):
+        try:
+            return fetch_page(api_key, start, end, extra_params)
+        except Exception as e:
+            if i == max_retries - 1 or not _transient(e):
+                raise
+            time.sleep(engine_http.backoff_delay(i, backoff))
+
+
+def plan_pages(total, page_size=PAGE_SIZE):
+    """total_count를 API 규격 페이지 [(start, end), ...]로 분할 (1-based)"""
+    return [(s, min(s + page_size - 1, total)) for s in range(1, total + 1, page_size)]
+
+
+def _job_dir(extra_params):
+    key = hashlib.md5(extra_params.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(HARVEST_DIR, key)
+
+
+def clear_harvest(extra_params=""):
+    """수집 체크포인트 삭제 (처음부터 다시 수집)"""
+    shutil.rmtree(_job_dir(extra_params), ignore_errors=True)
+
+
+def iter_pages(api_key, limit, extra_params="", page_size=100, max_workers=4, max_retries=3, backoff=1.0,
+               failed=None):
+    """
+    스트리밍 수집: 첫 페이지를 먼저 받아 즉시 yield 하고,
+    나머지 페이지는 병렬 호출 후 도착하는 순서대로 yield → (rows, total)
+    total은 min(limit, total_count). 재시도 후에도 실패한 페이지는 건너뛰고
+    그 구간 (start, end)를 failed 목록에 담는다 (호출 측에서 부분 결과 여부 판단).
+    """
+    rows, total_count = fetch_page_retry(api_key, 1, min(page_size, limit), extra_params, max_retries, backoff)
+    total = min(limit, total_count)
+    yield rows, total
+    rest = [(s, e) for s, e in plan_pages(total, page_size) if s > 1]
+    if not rest:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_page_retry, api_key, s, e, extra_params, max_retries, backoff): (s, e)
+                   for s, e in rest}
+        for fut in as_completed(futures):
+            try:
+                rows = fut.result()[0]
+            except Exception:
+                if failed is not None:
+                    failed.append(futures[fut])
+                continue
+            yield rows, total
+
+
+def harvest_i1250(api_key, extra_params="", page_size=PAGE_SIZE, max_workers=MAX_WORKERS,
+                  max_retries=4, backoff=1.5, resume=True, on_progress=None):
+    """
+    I1250 전체(또는 조건부) 데이터 병렬 수집.
+    total_count 확인 → 페이지 분할 → 스레드풀 동시 호출, 완료 페이지는 디스크에 저장하여
+    중단 후 재실행 시 마지막 완료 페이지 이후부터 이어받는다.
+    반환: (rows, failed_pages, total)
+    """
+    job_dir = _job_dir(extra_params)
+    meta_path = os.path.join(job_dir, "meta.json")
+
+    # 1) 전체 건수 확인 (첫 페이지 겸용)
+    first_rows, total = fetch_page_retry(api_key, 1, page_size, extra_params, max_retries, backoff)
+    if total == 0:
+        return [], [], 0
+
+    def page_path(start):
+        return os.path.join(job_dir, f"page_{start:07d}.json")
+
+    # 2) 체크포인트 확인 — 수집 조건 · 페이지 크기 · 원천 건수(total_count)가 모두 같을 때만 이어받는다.
+    #    건수가 바뀌면 원천의 페이지 경계가 밀려 이전 페이지와 겹치거나 빠지는 행이 생기므로 처음부터.
+    meta = {"page_size": page_size, "extra_params": extra_params, "total": total}
+    if resume and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved != meta:
+            clear_harvest(extra_params)
+    elif not resume:
+        clear_harvest(extra_params)
+    os.makedirs(job_dir, exist_ok=True)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    def save_page(start, rows):
+        tmp = page_path(start) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp, page_path(start))
+
+    pages = plan_pages(total, page_size)
+    save_page(1, first_rows)
+    todo = [(s, e) for s, e in pages if not os.path.exists(page_path(s))]
+    done_cnt = len(pages) - len(todo)
+    if on_progress:
+        on_progress(done_cnt, len(pages))
+
+    # 3) 남은 페이지 병렬 호출
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_page_retry, api_key, s, e, extra_params, max_retries, backoff): (s, e)
+            for s, e in todo
+        }
+        try:
+            for fut in as_completed(futures):
+                s, e = futures[fut]
+                try:
+                    rows, _ = fut.result()
+                    save_page(s, rows)
+                    done_cnt += 1
+                except Exception:
+                    failed.append((s, e))
+                if on_progress:
+                    on_progress(done_cnt, len(pages))
+        except BaseException:
+            # on_progress에서 중단 요청(예외) 시 대기 중인 페이지는 취소 — 받은 페이지는 체크포인트에 남음
+            for fut in futures:
+                fut.cancel()
+            raise
+
+    # 4) 완료 페이지 순서대로 병합
+    all_rows = []
+    for s, _ in pages:
+        if os.path.exists(page_path(s)):
+            with open(page_path(s), encoding="utf-8") as f:
+                all_rows.extend(json.load(f))
+    return all_rows, sorted(failed), total
+
+
+# ─────────────────────────────────────────────
+# 로컬 미러 (SQLite) — 한글 컬럼 매핑은 적재 시 1회만 적용
+# ─────────────────────────────────────────────
+MIRROR_COLS = list(I1250_KOR.values())
+
+
+@contextmanager
+def _connect():
+    """미러 연결 (스키마 보장, 종료 시 커밋·닫기)"""
+    os.makedirs(os.path.dirname(MIRROR_PATH) or ".", exist_ok=True)
+    con = sqlite3.connect(MIRROR_PATH)
+    con.execute("PRAGMA journal_mode=WAL")
+    cols = ", ".join(f'"{c}" TEXT' for c in MIRROR_COLS if c != "품목보고번호")
+    con.execute(f'CREATE TABLE IF NOT EXISTS i1250 ("품목보고번호" TEXT PRIMARY KEY, {cols})')
+    for c in ["업체명", "제품명", "신고일자", "최종수정일"]:
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_i1250_{c} ON i1250("{c}")')
+    con.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+    try:
+        yield con
+        con.commit()
+    finally:
+        con.close()
+
+
+def _to_record(row):
+    """API row(영문 키) → 미러 레코드(한글 컬럼, 신고일자 YYYY-MM-DD)"""
+    rec = {I1250_KOR[k]: (str(v) if v is not None else "") for k, v in row.items() if k in I1250_KOR}
+    d = rec.get("신고일자", "")
+    if len(d) == 8 and d.isdigit():
+        rec["신고일자"] = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    return tuple(rec.get(c, "") for c in MIRROR_COLS)
+
+
+def upsert_rows(rows):
+    """API row 목록을 미러에 적재 (품목보고번호 기준 덮어쓰기) → 적재 건수"""
+    records = [_to_record(r) for r in rows if r.get("PRDLST_REPORT_NO")]
+    if not records:
+        return 0
+    cols = ", ".join(f'"{c}"' for c in MIRROR_COLS)
+    marks = ", ".join("?" * len(MIRROR_COLS))
+    with _connect() as con:
+        con.executemany(f"INSERT OR REPLACE INTO i1250 ({cols}) VALUES ({marks})", records)
+    return len(records)
+
+
+def _max_date(con):
+    """증분 동기화 기준일(YYYYMMDD): 최종수정일 최대값, 없으면 신고일자 최대값"""
+    for col in ["최종수정일", "신고일자"]:
+        v = con.execute(f'SELECT MAX("{col}") FROM i1250 WHERE "{col}" != \'\'').fetchone()[0]
+        digits = re.sub(r"\D", "", v or "")
+        if len(digits) >= 8:
+            return digits[:8]
+    return None
+
+
+def _get_meta(con, k):
+    row = con.execute("SELECT v FROM meta WHERE k=?", (k,)).fetchone()
+    return row[0] if row else None
+
+
+def mirror_status():
+    """미러 상태 → {"rows": 건수, "last_sync": 마지막 동기화 시각, "watermark": 기준일}"""
+    if not os.path.exists(MIRROR_PATH):
+        return {"rows": 0, "last_sync": None, "watermark": None}
+    with _connect() as con:
+        return {
+            "rows":      con.execute("SELECT COUNT(*) FROM i1250").fetchone()[0],
+            "last_sync": _get_meta(con, "last_sync"),
+            "watermark": _get_meta(con, "watermark"),
+        }
+
+
+def sync_mirror(api_key, full=False, on_progress=None):
+    """
+    미러 동기화. 기준일이 없거나 full=True면 전체 수집,
+    그 외에는 기준일(CHNG_DT) 이후 변경분만 받아 덮어쓴다.
+    기준일은 실패 페이지 없이 끝났을 때만 전진한다 (누락 방지).
+    반환: (적재 건수, 실패 페이지)
+    """
+    with _connect() as con:
+        since = None if full else _get_meta(con, "watermark")
+    extra = f"CHNG_DT={since}" if since else ""
+    rows, failed, _ = harvest_i1250(api_key, extra, resume=not since, on_progress=on_progress)
+    n = upsert_rows(rows)
+    if not failed:
+        with _connect() as con:
+            con.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("last_sync", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                ("watermark", _max_date(con)),
+            ])
+        clear_harvest(extra)
+    return n, failed
+
+
+def search_mirror(bssh="", prdnm="", rno="", limit=500):
+    """업체명·제품명(부분일치) / 품목보고번호(일치) 로컬 검색 → 신고일자 역순 DataFrame"""
+    where, args = [], []
+    if bssh:
+        where.append('"업체명" LIKE ?');  args.append(f"%{bssh}%")
+    if prdnm:
+        where.append('"제품명" LIKE ?');  args.append(f"%{prdnm}%")
+    if rno:
+        where.append('"품목보고번호" = ?'); args.append(rno)
+    sql = "SELECT * FROM i1250"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += ' ORDER BY "신고일자" DESC LIMIT ?'
+    with _connect() as con:
+        return pd.read_sql_query(sql, con, params=args + [limit])
+
+
+def fetch_rows(report_nos):
+    """품목보고번호 목록 → 미러 행 DataFrame (입력 순서 유지)"""
+    if not report_nos:
+        return pd.DataFrame(columns=MIRROR_COLS)
+    marks = ", ".join("?" * len(report_nos))
+    with _connect() as con:
+        df = pd.read_sql_query(f'SELECT * FROM i1250 WHERE "품목보고번호" IN ({marks})',
+                               con, params=list(report_nos))
+    order = {r: i for i, r in enumerate(report_nos)}
+    return df.sort_values("품목보고번호", key=lambda s: s.map(order)).reset_index(drop=True)
+
+
+# ─────────────────────────────────────────────
+# dtype 정규화 — 세션당 메모리 절감 (범주형 · 불리언 · datetime64 · 정수)
+# ─────────────────────────────────────────────
+CATEGORY_COLS = ["품목유형", "업종", "업체명", "생산종료여부", "고열량저영양", "제품형태", "포장재질"]
+FLAG_COLS     = ["어린이인증", "내수겸용"]          # Y/N
+DATE_COLS     = ["신고일자", "최종수정일"]
+DAYCNT_COLS   = ["소비기한", "품질유지기한"]
+
+
+def _to_datetime(s):
+    """'20240105' · '2024-01-05' · '2024-01-05 10:00:00' 등 → datetime64"""
+    digits = s.astype(str).str.replace(r"\D", "", regex=True).str.ljust(14, "0").str[:14]
+    return pd.to_datetime(digits, format="%Y%m%d%H%M%S", errors="coerce")
+
+
+def normalize_i1250(df):
+    """
+    한글 컬럼 I1250 DataFrame → 메모리 절감 dtype으로 변환 (원본 불변).
+    기한 컬럼은 모두 숫자일 때만 정수로, '제조일로부터 24개월' 같은 문구가 섞이면 범주형으로 둔다.
+    그 외 문자열 컬럼도 중복이 많으면(고유값 50% 미만) 범주형으로 바꾼다.
+    """
+    out = df.copy()
+    for c in out.columns:
+        if c in DATE_COLS:
+            out[c] = _to_datetime(out[c])
+        elif c in FLAG_COLS:
+            out[c] = out[c].map({"Y": True, "N": False}).astype("boolean")
+        elif c in DAYCNT_COLS:
+            num = pd.to_numeric(out[c].replace("", None), errors="coerce")
+            if num.notna().sum() == out[c].replace("", None).notna().sum():
+                out[c] = num.astype("Int32")
+            else:
+                out[c] = out[c].astype("category")
+        elif c in CATEGORY_COLS or (pd.api.types.is_string_dtype(out[c]) and out[c].nunique() < len(out) * 0.5):
+            out[c] = out[c].astype("category")
+    return out
+
+
+def memory_report(before, after):
+    """정규화 전후 메모리 비교 → {"before_mb", "after_mb", "ratio"}"""
+    b = float(before.memory_usage(deep=True).sum()) / 1e6
+    a = float(after.memory_usage(deep=True).sum()) / 1e6
+    return {"before_mb": round(b, 2), "after_mb": round(a, 2), "ratio": round(b / max(a, 1e-9), 1)}
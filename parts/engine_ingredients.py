@@ -0,0 +1,253 @@
+# engine_ingredients.py
+# 원료 마스터 (SQLite 영구 저장 · 원료명/별칭 조회 · 접두어 자동완성 · 배합표 결합)
+#
+# 규격·원가·물성·알레르기·공급사를 한 곳에서 관리하고, 화면에서는 메모리 스냅숏만 읽는다.
+# 스냅숏은 DB 파일이 바뀌었을 때만 다시 읽는다.
+
+import os
+import re
+import bisect
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    from parts.engine_data import DATA_DIR
+    from parts import engine_props
+except ImportError:
+    from engine_data import DATA_DIR
+    import engine_props
+
+MASTER_PATH = os.path.join(DATA_DIR, "ingredients.sqlite")
+NUM_COLS    = ["원가(원/kg)", "변동성(%)"] + engine_props.PROP_COLS
+TEXT_COLS   = ["규격", "알레르기", "공급사"]
+MASTER_COLS = ["원료명"] + TEXT_COLS[:1] + NUM_COLS + TEXT_COLS[1:]
+
+# 초기 등록분: 원료명 → (규격, 원가(원/kg), 변동성(%), 알레르기, 별칭)  — 물성은 engine_props.DEFAULT_PROPS
+SEED = {
+    "정제수":         ("식품용",          10,     2, "", ["물", "water"]),
+    "탄산가스":       ("식품첨가물",      300,    5, "", ["이산화탄소", "CO2"]),
+    "설탕":           ("백설탕",          800,   15, "", ["백설탕", "정백당", "자당", "sugar"]),
+    "과당":           ("결정과당",        1500,  12, "", ["fructose"]),
+    "액상과당":       ("과당 55%",        600,   12, "", ["고과당옥수수시럽", "HFCS"]),
+    "포도당":         ("함수결정",        900,   10, "", ["dextrose"]),
+    "올리고당":       ("프락토올리고당",  1800,  10, "", ["FOS"]),
+    "알룰로스":       ("결정",            8000,  20, "", ["allulose"]),
+    "에리스리톨":     ("결정",            6000,  15, "", ["erythritol"]),
+    "스테비올배당체": ("RA 97%",          45000, 15, "", ["스테비아", "stevia"]),
+    "수크랄로스":     ("식품첨가물",      120000, 10, "", ["sucralose"]),
+    "과즙농축액":     ("65 Brix",         4500,  25, "", ["농축과즙", "과채농축액"]),
+    "구연산":         ("무수",            2000,  10, "", ["시트르산", "무수구연산", "citric acid"]),
+    "사과산":         ("DL-",             5000,  10, "", ["말산", "malic acid"]),
+    "주석산":         ("L-",              8000,  10, "", ["tartaric acid"]),
+    "젖산":           ("88% 액상",        4000,  10, "", ["lactic acid"]),
+    "인산":           ("85% 액상",        2500,  10, "", ["phosphoric acid"]),
+    "비타민C":        ("L-아스코르브산",  30000, 12, "", ["비타민 C", "아스코르브산", "L-아스코르브산", "vitamin c"]),
+    "구연산삼나트륨": ("이수화물",        3000,  10, "", ["구연산나트륨", "sodium citrate"]),
+    "향료":           ("천연",            15000,  8, "", ["합성향료", "천연향료", "flavor"]),
+    "탈지분유":       ("국산",            6000,  15, "우유", ["skim milk powder"]),
+}
+_EXTRA_PROPS = {"탈지분유": (0.96, 0.96, 0.0, 0.0)}
+
+_lock = threading.Lock()
+_loaded = {"mtime": None, "master": None}
+
+
+def normalize(text):
+    """괄호 안 규격 · 공백 · 기호 제거 후 소문자 (조회 · 자동완성 키)"""
+    return re.sub(r"[\s\W_]+", "", re.sub(r"\(.*?\)", "", str(text or "")).lower())
+
+
+@contextmanager
+def _connect():
+    """마스터 연결 (스키마 보장 · 비어 있으면 초기 등록, 종료 시 커밋·닫기)"""
+    os.makedirs(os.path.dirname(MASTER_PATH) or ".", exist_ok=True)
+    con = sqlite3.connect(MASTER_PATH, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    cols = ", ".join(f'"{c}" REAL' if c in NUM_COLS else f'"{c}" TEXT' for c in MASTER_COLS[1:])
+    con.execute(f'CREATE TABLE IF NOT EXISTS ingredient ("원료명" TEXT PRIMARY KEY, {cols})')
+    con.execute('CREATE TABLE IF NOT EXISTS alias ("별칭" TEXT PRIMARY KEY, "원료명" TEXT)')
+    if con.execute("SELECT COUNT(*) FROM ingredient").fetchone()[0] == 0:
+        _seed(con)
+    try:
+        yield con
+        con.commit()
+    finally:
+        con.close()
+
+
+def _seed(con):
+    rows, aliases = [], []
+    for name, (spec, cost, cv, allergen, names) in SEED.items():
+        props = _EXTRA_PROPS.get(name) or engine_props.DEFAULT_PROPS.get(name, (0.0,) * len(engine_props.PROP_COLS))
+        rows.append((name, spec, cost, cv, *props, allergen, ""))
+        aliases += [(a, name) for a in names]
+    marks = ", ".join("?" * len(MASTER_COLS))
+    con.executemany(f"INSERT OR IGNORE INTO ingredient VALUES ({marks})", rows)
+    con.executemany("INSERT OR IGNORE INTO alias VALUES (?, ?)", aliases)
+
+
+class Master:
+    """원료 마스터 메모리 스냅숏 (조회 · 자동완성 · 결합)"""
+
+    def __init__(self, df, aliases):
+        self.df = df.set_index("원료명", drop=False)
+        self.keys = {normalize(n): n for n in df["원료명"]}
+        for alias, name in aliases:
+            if name in self.df.index:
+                self.keys.setdefault(normalize(alias), name)
+        self.keys.pop("", None)
+        self.sorted = sorted(self.keys)                          # 접두어 자동완성용
+        self.by_len = sorted(self.keys, key=len, reverse=True)   # 부분 일치용 (긴 키 우선)
+        self._props = None
+
+    def resolve(self, name):
+        """원료명·별칭 → 표준 원료명 (정확 일치 → 표준명/별칭을 포함하는 가장 긴 이름 순, 없으면 None)"""
+        key = normalize(name)
+        if not key:
+            return None
+        if key in self.keys:
+            return self.keys[key]
+        return next((self.keys[k] for k in self.by_len if len(k) >= 2 and k in key), None)
+
+    def complete(self, prefix, limit=10):
+        """접두어로 시작하는 원료명·별칭 → 표준 원료명 목록 (중복 제거, 사전순)"""
+        key = normalize(prefix)
+        out, i = [], bisect.bisect_left(self.sorted, key)
+        while i < len(self.sorted) and self.sorted[i].startswith(key) and len(out) < limit:
+            name = self.keys[self.sorted[i]]
+            if name not in out:
+                out.append(name)
+            i += 1
+        return out
+
+    def get(self, name):
+        canon = self.resolve(name)
+        return None if canon is None else self.df.loc[canon].to_dict()
+
+    def props_table(self):
+        """engine_props.lookup(table=...)용 {원료명·별칭: 물성 튜플}"""
+        if self._props is None:
+            props = {n: tuple(float(v) for v in r) for n, r in
+                     zip(self.df.index, self.df[engine_props.PROP_COLS].to_numpy())}
+            self._props = {**{alias: props[name] for alias, name in self.keys.items()}, **props}
+        return self._props
+
+    def join(self, df, name_col="원료명", cols=None, overwrite=False):
+        """
+        배합표에 마스터 컬럼 결합 (원료명은 별칭·부분 일치로 해석, 표준 원료명은 "표준원료명" 컬럼).
+        이미 있는 컬럼은 비어 있는 칸만 채우고, overwrite=True면 마스터 값으로 덮어쓴다.
+        """
+        cols = cols or [c for c in MASTER_COLS if c != "원료명"]
+        out = df.copy()
+        canon = out[name_col].map(self.resolve)
+        out["표준원료명"] = canon
+        ref = self.df.reindex(canon.fillna("").tolist())
+        for c in cols:
+            vals = pd.Series(ref[c].to_numpy(), index=out.index)
+            if c in out.columns and not overwrite:
+                blank = out[c].isna() | (out[c].astype(str).str.strip() == "")
+                out[c] = out[c].where(~blank, vals)
+            else:
+                out[c] = vals
+        return out
+
+
+def _mtime():
+    """DB · WAL 파일 수정 시각 (WAL 모드에서는 체크포인트 전까지 본 파일이 그대로일 수 있음)"""
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (MASTER_PATH, MASTER_PATH + "-wal"))
+
+
+def load():
+    """현재 마스터 스냅숏 (DB 파일이 바뀌었을 때만 다시 읽음)"""
+    with _lock:
+        if _loaded["master"] is None or _mtime() != _loaded["mtime"]:
+            with _connect() as con:
+                df = pd.read_sql_query('SELECT * FROM ingredient ORDER BY "원료명"', con)
+                aliases = con.execute("SELECT * FROM alias").fetchall()
+            _loaded.update(mtime=_mtime(), master=Master(df, aliases))
+        return _loaded["master"]
+
+
+def _invalidate():
+    with _lock:
+        _loaded["master"] = None
+
+
+def upsert(rows):
+    """원료 행(dict 목록 또는 DataFrame) 추가·갱신 (원료명 기준, 빠진 컬럼은 기존 값 유지) → 반영 건수"""
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict("records")
+    rows = [r for r in rows if str(r.get("원료명") or "").strip()]
+    with _connect() as con:
+        for r in rows:
+            name = str(r["원료명"]).strip()
+            con.execute('INSERT OR IGNORE INTO ingredient ("원료명") VALUES (?)', (name,))
+            fields = [c for c in MASTER_COLS[1:] if c in r and not pd.isna(r[c])]
+            if fields:
+                sets = ", ".join(f'"{c}" = ?' for c in fields)
+                con.execute(f'UPDATE ingredient SET {sets} WHERE "원료명" = ?', [r[c] for c in fields] + [name])
+    _invalidate()
+    return len(rows)
+
+
+def add_alias(alias, name):
+    with _connect() as con:
+        con.execute("INSERT OR REPLACE INTO alias VALUES (?, ?)", (str(alias).strip(), str(name).strip()))
+    _invalidate()
+
+
+def delete(name):
+    with _connect() as con:
+        con.execute('DELETE FROM ingredient WHERE "원료명" = ?', (name,))
+        con.execute('DELETE FROM alias WHERE "원료명" = ?', (name,))
+    _invalidate()
+
+
+# 스냅숏 바로가기
+def resolve(name):
+    return load().resolve(name)
+
+
+def complete(prefix, limit=10):
+    return load().complete(prefix, limit)
+
+
+def get(name):
+    return load().get(name)
+
+
+def props_table():
+    return load().props_table()
+
+
+def join(df, name_col="원료명", cols=None, overwrite=False):
+    return load().join(df, name_col, cols, overwrite)
+
+
+def requirements(formula_df, volume_l, ratio_col="함량(%)"):
+    """
+    배합표 × 생산량(L) → 원료 소요량 표 [원부자재, 규격, 단위, 소요량, 단가(원/kg), 금액(원), 공급사].
+    소요량(kg) = 생산량 × 제품 비중 × 배합비, 규격·단가·공급사는 마스터 기준.
+    """
+    m = load()
+    df = formula_df.dropna(subset=["원료명"])
+    ratios = pd.to_numeric(df[ratio_col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    props, _ = engine_props.lookup(df["원료명"].tolist(), m.props_table())
+    density = float(engine_props.evaluate(ratios, props, ratios * 0)["density"])
+    out = m.join(df[["원료명"]], cols=["규격", "원가(원/kg)", "공급사"])
+    out["소요량"] = (volume_l * density * ratios / 100.0).round(3)
+    out["금액(원)"] = (out["소요량"] * out["원가(원/kg)"]).round(0)
+    return out.rename(columns={"원료명": "원부자재", "원가(원/kg)": "단가(원/kg)"}).assign(단위="kg")[
+        ["원부자재", "규격", "단위", "소요량", "단가(원/kg)", "금액(원)", "공급사"]].reset_index(drop=True)
+
+
+def frame(names=None):
+    """마스터 표 (names를 주면 해당 원료만, 그 순서대로)"""
+    df = load().df.reset_index(drop=True)
+    if names is None:
+        return df
+    canon = [resolve(n) for n in names]
+    return df.set_index("원료명").reindex([c for c in canon if c]).reset_index()
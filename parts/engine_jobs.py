@@ -0,0 +1,182 @@
+# engine_jobs.py
+# 백그라운드 작업 큐 (프로세스 공용 워커 풀 · 작업 ID · 진행률/중간 결과 · 세션별 작업 목록 · 자동 새로고침 패널)
+#
+# 작업 함수는 워커 스레드에서 실행되므로 st.session_state·위젯을 만지면 안 된다.
+# 세션마다 다른 값(재생 모드 토글 등)과 API 키는 제출할 때 인자로 넘기고, 진행 상황은 job.update(...)로 알린다.
+# 엔드포인트·모델명 같은 공용 설정은 engine_llm이 환경변수/st.secrets(읽기 전용)에서 직접 읽는다.
+
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+MAX_WORKERS = 8
+KEEP_SECONDS = 6 * 3600        # 끝난 작업 보관 시간
+SESSION_KEY = "jobs"           # st.session_state[SESSION_KEY] = {이름: 작업 ID}
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="npd-job")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    """작업 함수가 job.check()에서 취소 요청을 감지한 경우"""
+
+
+class Job:
+    def __init__(self, kind, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind, self.label = kind, label
+        self.status = "queued"            # queued → running → done | failed | cancelled
+        self.progress, self.message, self.partial = 0.0, "", None
+        self.result, self.error = None, None
+        self.created, self.started, self.finished = time.time(), None, None
+        self.cancel_requested = False
+        self.future = None
+
+    def update(self, progress=None, message=None, partial=None):
+        """작업 함수에서 진행률(0~1) · 상태 문구 · 중간 결과 갱신"""
+        if progress is not None:
+            self.progress = float(min(max(progress, 0.0), 1.0))
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    def check(self):
+        """협조적 취소 지점 — 취소 요청이 있으면 Cancelled 발생"""
+        if self.cancel_requested:
+            raise Cancelled()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+def _run(job, fn, args, kwargs):
+    job.status, job.started = "running", time.time()
+    try:
+        job.result = fn(job, *args, **kwargs)
+        job.status, job.progress = "done", 1.0
+    except Cancelled:
+        job.status = "cancelled"
+    except Exception as e:
+        job.status, job.error = "failed", f"{e}"
+        job.message = traceback.format_exc(limit=3)
+    finally:
+        job.finished = time.time()
+
+
+def submit(kind, fn, *args, label="", **kwargs):
+    """fn(job, *args, **kwargs)를 워커 풀에 넣고 작업 ID 반환"""
+    prune()
+    job = Job(kind, label or kind)
+    with _lock:
+        _jobs[job.id] = job
+    job.future = _pool.submit(_run, job, fn, args, kwargs)
+    return job.id
+
+
+def get(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def cancel(job_id):
+    """대기 중이면 바로 취소, 실행 중이면 취소 요청만 (작업 함수의 job.check()에서 중단)"""
+    job = get(job_id)
+    if job is None or job.done:
+        return False
+    job.cancel_requested = True
+    if job.future is not None and job.future.cancel():
+        job.status, job.finished = "cancelled", time.time()
+    return True
+
+
+def prune(keep_seconds=KEEP_SECONDS):
+    """오래된 완료 작업 정리"""
+    now = time.time()
+    with _lock:
+        for jid in [j.id for j in _jobs.values() if j.done and now - j.finished > keep_seconds]:
+            del _jobs[jid]
+
+
+def snapshot():
+    """전체 작업 상태 목록 (최근 순)"""
+    with _lock:
+        jobs = sorted(_jobs.values(), key=lambda j: -j.created)
+    return [{"id": j.id, "종류": j.kind, "작업": j.label, "상태": j.status,
+             "진행률": round(j.progress * 100), "경과(s)": round(j.elapsed, 1)} for j in jobs]
+
+
+# ─────────────────────────────────────────────
+# Streamlit 세션 연동
+# ─────────────────────────────────────────────
+def start(name, kind, fn, *args, label="", **kwargs):
+    """작업 제출 후 세션에 이름으로 기록 (같은 이름의 이전 작업은 대체) → 작업 ID"""
+    job_id = submit(kind, fn, *args, label=label, **kwargs)
+    st.session_state.setdefault(SESSION_KEY, {})[name] = job_id
+    return job_id
+
+
+def current(name):
+    """세션에 기록된 이름의 작업 (없거나 정리됐으면 None)"""
+    job_id = st.session_state.get(SESSION_KEY, {}).get(name)
+    return get(job_id) if job_id else None
+
+
+def collect(name):
+    """끝난 작업을 세션에서 떼어내 반환 (결과를 한 번만 반영할 때) — 진행 중이거나 없으면 None"""
+    job = current(name)
+    if job is None or not job.done:
+        return None
+    st.session_state[SESSION_KEY].pop(name, None)
+    return job
+
+
+def running(name):
+    job = current(name)
+    return job is not None and not job.done
+
+
+def watch(name, render=None, interval=0.7, tick=0.05):
+    """
+    진행 중인 작업의 상태 패널 (fragment로 interval초마다 자체 갱신).
+    render(job)가 있으면 중간 결과 표시에 사용한다 — 갱신 사이에도 tick초마다 job.partial 변화를 확인해
+    바뀐 즉시 다시 그리므로 스트리밍 응답이 조각 단위로 보인다. 작업이 끝나면 전체 화면을 다시 실행해 결과를 반영한다.
+    """
+    if not running(name):
+        return
+
+    @st.fragment(run_every=interval)
+    def _panel():
+        job = current(name)
+        if job is None or job.done:
+            st.rerun()
+        c1, c2 = st.columns([5, 1])
+        c1.progress(job.progress, text=f"⏳ {job.label} · {job.message or job.status} · {job.elapsed:.0f}s")
+        if c2.button("중지", key=f"job_cancel_{job.id}"):
+            cancel(job.id)
+        if render is None:
+            return
+        box, shown = st.empty(), object()
+        deadline = time.time() + interval
+        while True:
+            if job.partial is not shown:
+                shown = job.partial
+                with box.container():
+                    render(job)
+            if job.done or time.time() >= deadline:
+                break
+            time.sleep(tick)
+
+    _panel()
@@ -0,0 +1,395 @@
+# engine_llm.py
+# LLM 호출 공용 창구 (백엔드 설정 · 클라이언트 재사용 · 지연/토큰 집계 · 프롬프트 해시 캐시 · 재생 모드
+#                      · 동일 요청 동시 호출 합치기)
+#
+# 백엔드 설정 (환경변수 NPD_LLM_* 우선, 없으면 secrets [openai] 섹션):
+#   BASE_URL      OpenAI 호환 엔드포인트 (예: 로컬 스텁 http://127.0.0.1:8765/v1)
+#   MODEL_FORMULA 배합비 생성·수정 모델 (기본 gpt-4o)
+#   MODEL_REPORT  보고서·전략 문안 모델 (기본 gpt-4o-mini)
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import streamlit as st
+
+try:
+    from openai import OpenAI, AsyncOpenAI
+except Exception:
+    OpenAI = AsyncOpenAI = None
+
+try:
+    from parts.engine_data import DATA_DIR
+    from parts import engine_sched
+except ImportError:
+    from engine_data import DATA_DIR
+    import engine_sched
+
+CACHE_PATH        = os.path.join(DATA_DIR, "llm_cache.sqlite")
+CACHE_MAX_ENTRIES = int(os.environ.get("NPD_LLM_CACHE_MAX", "5000"))   # 초과 시 최근 사용이 오래된 것부터 삭제
+
+# 재생 전용 모드: 기록된 응답만 사용, 네트워크 호출 없음 (부하·성능 시험용)
+# 프로세스 기본값은 환경변수로만 정하고, 화면 토글은 세션별(st.session_state[REPLAY_KEY])로 호출마다 넘긴다.
+REPLAY_DEFAULT = os.environ.get("NPD_LLM_REPLAY", "") == "1"
+REPLAY_KEY     = "llm_replay"
+_counters = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "replay_misses": 0, "coalesced": 0}
+_usage = {}
+_lock = threading.Lock()
+_clients = {}
+_inflight = {}
+
+MODELS = {"formula": "gpt-4o", "report": "gpt-4o-mini"}   # 용도 → 기본 모델
+
+
+class ReplayMiss(RuntimeError):
+    """재생 전용 모드에서 기록되지 않은 프롬프트를 요청한 경우"""
+
+
+class _Flight:
+    """진행 중인 호출 1건 — 먼저 온 요청(leader)이 조각을 쌓고, 같은 요청들은 그 조각을 따라 읽는다"""
+
+    def __init__(self):
+        self.chunks, self.done, self.error = [], False, None
+        self.cond = threading.Condition()
+
+    def push(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done, self.error = True, error
+            self.cond.notify_all()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new, i = self.chunks[i:], len(self.chunks)
+                done, error = self.done, self.error
+            yield from new
+            if done and i >= len(self.chunks):
+                if error is not None:
+                    raise RuntimeError(f"동일 요청 처리 실패: {error}")
+                return
+
+
+def _join(key):
+    """single-flight 등록 → (flight, leader 여부)"""
+    with _lock:
+        flight = _inflight.get(key)
+        if flight is not None:
+            _counters["coalesced"] += 1
+            return flight, False
+        flight = _inflight[key] = _Flight()
+        return flight, True
+
+
+def _land(key, flight, error=None):
+    flight.finish(error)
+    with _lock:
+        _inflight.pop(key, None)
+
+
+@contextmanager
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+    con = sqlite3.connect(CACHE_PATH, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY, model TEXT, content TEXT,
+        created REAL, last_used REAL, hits INTEGER DEFAULT 0)""")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+    try:
+        yield con
+        con.commit()
+    finally:
+        con.close()
+
+
+def _count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def session_replay():
+    """현재 세션의 재생 전용 모드 (스크립트 스레드에서만 호출 — 작업 함수에는 이 값을 인자로 넘긴다)"""
+    try:
+        return bool(st.session_state.get(REPLAY_KEY, REPLAY_DEFAULT))
+    except Exception:
+        return REPLAY_DEFAULT
+
+
+def is_replay(replay=None):
+    """호출별 재생 여부 (replay 미지정 시 환경변수 기본값)"""
+    return REPLAY_DEFAULT if replay is None else bool(replay)
+
+
+def _setting(name, default=None):
+    """환경변수 NPD_LLM_{name} → secrets [openai] {name} → default"""
+    if os.environ.get(f"NPD_LLM_{name}"):
+        return os.environ[f"NPD_LLM_{name}"]
+    try:
+        if "openai" in st.secrets and st.secrets["openai"].get(name):
+            return st.secrets["openai"][name]
+    except Exception:
+        pass
+    return default
+
+
+def api_key():
+    """OpenAI 키 조회 — secrets의 [openai] 섹션 → 최상위 키 → 환경변수 순"""
+    try:
+        if "openai" in st.secrets and st.secrets["openai"].get("OPENAI_API_KEY"):
+            return st.secrets["openai"]["OPENAI_API_KEY"]
+        if st.secrets.get("OPENAI_API_KEY"):
+            return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        pass
+    return os.environ.get("OPENAI_API_KEY")
+
+
+def base_url():
+    return _setting("BASE_URL")
+
+
+def model_for(role):
+    """용도별 모델명 (MODEL_FORMULA · MODEL_REPORT 설정으로 교체 가능)"""
+    return _setting(f"MODEL_{role.upper()}", MODELS[role])
+
+
+def available(replay=None):
+    """AI 기능 사용 가능 여부 (키 또는 사용자 지정 엔드포인트가 있거나 재생 전용 모드)"""
+    return is_replay(replay) or (OpenAI is not None and bool(api_key() or base_url()))
+
+
+def _client(key=None):
+    """백엔드별 동기 클라이언트 1개를 만들어 재사용 (연결 풀 공유)"""
+    url = base_url()
+    key = key or api_key() or "local"   # 로컬 스텁 등 키가 필요 없는 엔드포인트
+    with _lock:
+        if (key, url) not in _clients:
+            _clients[(key, url)] = OpenAI(api_key=key, base_url=url)
+        return _clients[(key, url)]
+
+
+def async_client(key=None, **kwargs):
+    """비동기 클라이언트 (이벤트 루프마다 새로 생성 — 호출 측에서 close)"""
+    return AsyncOpenAI(api_key=key or api_key() or "local", base_url=base_url(), **kwargs)
+
+
+def record(model_name, elapsed, usage=None, ok=True, ttft=None):
+    """모델별 호출 수 · 오류 · 지연(ms) · 첫 토큰 지연 · 토큰 사용량 누적"""
+    with _lock:
+        u = _usage.setdefault(model_name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                           "streams": 0, "ttft_ms": 0.0,
+                                           "prompt_tokens": 0, "completion_tokens": 0})
+        u["calls"] += 1
+        u["errors"] += 0 if ok else 1
+        u["total_ms"] += elapsed * 1000
+        u["max_ms"] = max(u["max_ms"], elapsed * 1000)
+        if ttft is not None:
+            u["streams"] += 1
+            u["ttft_ms"] += ttft * 1000
+        if usage is not None:
+            u["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            u["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def usage_stats():
+    """모델별 호출 통계 → {model: {calls, errors, avg_ms, max_ms, avg_ttft_ms, prompt_tokens, completion_tokens}}"""
+    with _lock:
+        return {
+            m: {"calls": u["calls"], "errors": u["errors"],
+                "avg_ms": round(u["total_ms"] / max(u["calls"], 1), 1), "max_ms": round(u["max_ms"], 1),
+                "avg_ttft_ms": round(u["ttft_ms"] / u["streams"], 1) if u["streams"] else None,
+                "prompt_tokens": u["prompt_tokens"], "completion_tokens": u["completion_tokens"]}
+            for m, u in _usage.items()
+        }
+
+
+def cache_key(model, messages, response_format=None, **params):
+    """
+    캐시 키 = (model, messages, response_format, 샘플링 인자) 해시.
+    temperature · max_tokens · seed 같은 추가 인자가 다르면 다른 응답이므로 키에 넣는다 (없으면 기존 키와 같음).
+    """
+    body = [model, messages, response_format] + ([params] if params else [])
+    raw = json.dumps(body, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(key):
+    """캐시 조회 (적중 시 사용 시각·적중 수 갱신) → 응답 문자열 또는 None"""
+    with _connect() as con:
+        row = con.execute("SELECT content FROM llm_cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            _count("misses")
+            return None
+        con.execute("UPDATE llm_cache SET last_used=?, hits=hits+1 WHERE key=?", (time.time(), key))
+    _count("hits")
+    return row[0]
+
+
+def store(key, model, content):
+    """응답 저장 후 CACHE_MAX_ENTRIES를 넘은 만큼 LRU 순으로 삭제"""
+    now = time.time()
+    with _connect() as con:
+        con.execute("INSERT OR REPLACE INTO llm_cache (key, model, content, created, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)", (key, model, content, now, now))
+        over = con.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - CACHE_MAX_ENTRIES
+        if over > 0:
+            con.execute("DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)", (over,))
+    _count("stored")
+    if over > 0:
+        _count("evicted", over)
+
+
+def _total_tokens(usage):
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def chat(messages, model=None, response_format=None, use_cache=True, refresh=False,
+         is_valid=lambda content: True, key=None, priority=engine_sched.NORMAL, replay=None, **kwargs):
+    """
+    chat.completions 호출 → 응답 문자열.
+    (model, messages, response_format, 추가 인자) 해시로 캐시를 먼저 찾고, 없으면 호출 후 is_valid 통과 시 저장.
+    refresh=True면 캐시를 읽지 않고 새로 호출한 뒤 그 결과로 캐시를 갱신한다 ("다시 생성").
+    재생 전용 모드(replay, 미지정 시 환경변수 기본값)에서 캐시에 없으면 ReplayMiss를 발생시킨다.
+    model 미지정 시 보고서용 모델. 실제 호출은 스케줄러(engine_sched)의 priority 대기열을 거친다.
+    """
+    model = model or model_for("report")
+    k = cache_key(model, messages, response_format, **kwargs)
+    replay = is_replay(replay)
+    if (use_cache and not refresh) or replay:
+        content = lookup(k)
+        if content is not None:
+            return content
+    if replay:
+        _count("replay_misses")
+        raise ReplayMiss(f"재생 모드: 기록된 응답 없음 ({model}, {k[:12]})")
+
+    # 같은 요청이 이미 진행 중이면 그 결과를 함께 받음
+    flight, leader = _join(k)
+    if not leader:
+        return "".join(flight.follow())
+
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    try:
+        with engine_sched.scheduler.slot(model, engine_sched.estimate_tokens(messages), priority) as slot:
+            t0 = time.perf_counter()
+            try:
+                resp = _client(key).chat.completions.create(model=model, messages=messages, **kwargs)
+            except Exception:
+                record(model, time.perf_counter() - t0, ok=False)
+                raise
+            record(model, time.perf_counter() - t0, getattr(resp, "usage", None))
+            slot["tokens"] = _total_tokens(getattr(resp, "usage", None))
+        content = resp.choices[0].message.content
+        if use_cache and is_valid(content):
+            store(k, model, content)
+    except Exception as e:
+        _land(k, flight, e)
+        raise
+    flight.push(content)
+    _land(k, flight)
+    return content
+
+
+def render_stream(box, chunks, template="{}"):
+    """스트림 조각을 placeholder(st.empty())에 누적 출력 → 완성된 전체 문자열"""
+    text = ""
+    for delta in chunks:
+        text += delta
+        box.markdown(template.format(text + "▌"), unsafe_allow_html=True)
+    box.markdown(template.format(text), unsafe_allow_html=True)
+    return text
+
+
+def chat_stream(messages, model=None, use_cache=True, refresh=False, key=None, priority=engine_sched.NORMAL,
+                replay=None, **kwargs):
+    """
+    chat()의 스트리밍판 — 응답 조각(str)을 생성 즉시 내보내는 제너레이터.
+    캐시 적중 시 저장된 응답을 한 번에 내보내고, 끝까지 받은 응답만 캐시에 저장한다.
+    """
+    model = model or model_for("report")
+    k = cache_key(model, messages, **kwargs)
+    replay = is_replay(replay)
+    if (use_cache and not refresh) or replay:
+        content = lookup(k)
+        if content is not None:
+            yield content
+            return
+    if replay:
+        _count("replay_misses")
+        raise ReplayMiss(f"재생 모드: 기록된 응답 없음 ({model}, {k[:12]})")
+
+    # 같은 요청이 이미 스트리밍 중이면 그 조각을 따라 읽음
+    flight, leader = _join(k)
+    if not leader:
+        yield from flight.follow()
+        return
+
+    parts, usage, ttft = [], None, None
+    t0 = time.perf_counter()
+    try:
+        with engine_sched.scheduler.slot(model, engine_sched.estimate_tokens(messages), priority) as slot:
+            t0 = time.perf_counter()
+            stream = _client(key).chat.completions.create(model=model, messages=messages, stream=True,
+                                                          stream_options={"include_usage": True}, **kwargs)
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage   # 마지막 조각에 사용량 포함
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    parts.append(delta)
+                    flight.push(delta)
+                    yield delta
+            slot["tokens"] = _total_tokens(usage)
+        record(model, time.perf_counter() - t0, usage, ttft=ttft or 0.0)
+        if use_cache and parts:
+            store(k, model, "".join(parts))
+    except BaseException as e:   # 화면 이탈(GeneratorExit) 포함 — 따라 읽던 요청에도 알림
+        if not isinstance(e, GeneratorExit):
+            record(model, time.perf_counter() - t0, ok=False)
+        _land(k, flight, e if isinstance(e, Exception) else RuntimeError("스트림 중단"))
+        raise
+    _land(k, flight)
+
+
+def is_json(content):
+    try:
+        json.loads(content)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_stats(replay=None):
+    """캐시 건수 · 누적 적중 + 이번 프로세스의 적중/미스/저장/제거 수"""
+    with _connect() as con:
+        entries, hits = con.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM llm_cache").fetchone()
+    with _lock:
+        c = dict(_counters)
+    lookups = c["hits"] + c["misses"]
+    return {"entries": entries, "max_entries": CACHE_MAX_ENTRIES, "total_hits": hits,
+            **c, "hit_rate": round(c["hits"] / lookups, 3) if lookups else 0.0, "replay": is_replay(replay)}
+
+
+def clear_cache(model=None):
+    """캐시 삭제 (model 지정 시 해당 모델만) → 삭제 건수"""
+    with _connect() as con:
+        if model is None:
+            n = con.execute("DELETE FROM llm_cache").rowcount
+        else:
+            n = con.execute("DELETE FROM llm_cache WHERE model=?", (model,)).rowcount
+    return n
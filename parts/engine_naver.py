@@ -0,0 +1,255 @@
+# engine_naver.py
+# 네이버 쇼핑 검색 · 데이터랩 수집 엔진
+
+import re
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+try:
+    from parts import engine_http
+except ImportError:
+    import engine_http
+
+SHOP_URL         = "https://openapi.naver.com/v1/search/shop.json"
+SHOP_DISPLAY_MAX = 100    # 1회 최대 display
+SHOP_START_MAX   = 1000   # start 최대값 → 키워드당 최대 1,000건
+
+DATALAB_URL        = "https://openapi.naver.com/v1/datalab/search"
+DATALAB_MAX_GROUPS = 5    # 1회 호출당 keywordGroups 최대 수
+DATALAB_ANCHOR     = {"groupName": "음료", "keywords": ["음료"]}   # 호출 간 비율 환산 기준
+
+
+def strip_html(text):
+    return re.sub(r"<[^>]+>", "", text or "")
+
+
+def _shop_page(headers, keyword, start, display, sort):
+    resp = engine_http.get(SHOP_URL, headers=headers,
+                           params={"query": keyword, "display": display, "start": start, "sort": sort})
+    if resp.status_code != 200:
+        raise RuntimeError(f"API 오류: {resp.status_code}")
+    return resp.json()
+
+
+def _collect_keyword(pool, headers, keyword, max_items, sort, keep=None):
+    """
+    키워드 1개: 첫 페이지로 total 확인 → 나머지 start 오프셋 동시 호출.
+    keep(item)이 있으면 거른 뒤의 건수로 max_items를 채운다 — 모자라면 지금까지의 통과 비율로
+    필요한 페이지 수를 어림해 다음 묶음을 더 받는다 (start 최대 SHOP_START_MAX까지).
+    반환: (items, 실패한 start 오프셋 목록) — 첫 페이지 실패만 예외로 올린다.
+    """
+    display = SHOP_DISPLAY_MAX if keep else min(SHOP_DISPLAY_MAX, max_items)
+    first = _shop_page(headers, keyword, 1, display, sort)
+    total = min(int(first.get("total", 0) or 0), SHOP_START_MAX)
+    items = [it for it in first.get("items", []) if keep is None or keep(it)]
+    failed, seen = [], display
+    while len(items) < max_items and seen < total:
+        pass_rate = max(len(items), 1) / seen if keep else 1.0
+        pages = max(1, math.ceil((max_items - len(items)) / pass_rate / display))
+        starts = range(seen + 1, min(total, seen + pages * display) + 1, display)
+        for s, fut in [(s, pool.submit(_shop_page, headers, keyword, s, display, sort)) for s in starts]:
+            try:
+                items.extend(it for it in fut.result().get("items", []) if keep is None or keep(it))
+            except Exception:
+                failed.append(s)
+        seen = starts[-1] - 1 + display
+    return items[:max_items], failed
+
+
+def collect_shopping(keywords, client_id, client_secret, max_items=1000, sort="sim",
+                     food_only=False, max_workers=8):
+    """
+    네이버 쇼핑 다중 페이지 수집. 키워드별로 start 오프셋을 동시에 돌며 키워드당 최대 max_items건을 모은다.
+    food_only면 category1 == "식품"인 상품만 세어 max_items를 채운다 (거르기 전에 자르지 않음).
+    중복은 전체를 합친 뒤 productId 기준으로 한 번만 제거하고, 그 상품이 나온 키워드를 모두 keywords에 남긴다.
+    반환: (DataFrame (원본 필드 + keyword(처음 찾은 키워드) · keywords, title은 태그 제거, lprice는 숫자),
+           실패한 페이지 [(keyword, start), ...]) — 실패가 있으면 표본이 일부만 모인 것이다.
+    """
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    headers = {"X-Naver-Client-Id": client_id, "X-Naver-Client-Secret": client_secret}
+    keep = (lambda it: it.get("category1") == "식품") if food_only else None
+
+    frames, failed = [], []
+    # 키워드는 별도 풀에서 병렬로, 각 키워드의 페이지 호출은 공용 페이지 풀에서 처리
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+         ThreadPoolExecutor(max_workers=min(len(keywords), 4) or 1) as kw_pool:
+        results = kw_pool.map(lambda kw: _collect_keyword(pool, headers, kw, max_items, sort, keep), keywords)
+        for kw, (items, kw_failed) in zip(keywords, results):
+            failed += [(kw, s) for s in kw_failed]
+            if items:
+                frames.append(pd.DataFrame(items).assign(keyword=kw))
+
+    if not frames:
+        return pd.DataFrame(), failed
+    df = pd.concat(frames, ignore_index=True)
+    if "productId" in df.columns:
+        df["keywords"] = df.groupby("productId", sort=False)["keyword"].transform(lambda s: ", ".join(dict.fromkeys(s)))
+        df = df.drop_duplicates("productId").reset_index(drop=True)
+    else:
+        df["keywords"] = df["keyword"]
+    df["title"]  = df["title"].map(strip_html)
+    df["lprice"] = pd.to_numeric(df["lprice"], errors="coerce")
+    return df, failed
+
+
+# ─────────────────────────────────────────────
+# 데이터랩 배치 트렌드 매트릭스
+# ─────────────────────────────────────────────
+def plan_datalab_batches(groups, anchor=DATALAB_ANCHOR, per_call=DATALAB_MAX_GROUPS):
+    """키워드 그룹을 호출 단위로 묶음 — 모든 배치에 기준(anchor) 그룹을 함께 넣는다"""
+    others = [g for g in groups if g["groupName"] != anchor["groupName"]]
+    step = per_call - 1
+    return [[anchor] + others[i:i + step] for i in range(0, len(others), step)]
+
+
+def _datalab_call(headers, body):
+    resp = engine_http.post(DATALAB_URL, headers=headers, data=json.dumps(body))
+    if resp.status_code != 200:
+        raise RuntimeError(f"DataLab 오류: {resp.status_code}")
+    frame = {}
+    for res in resp.json().get("results", []):
+        df = pd.DataFrame(res["data"])
+        if not df.empty:
+            frame[res["title"]] = df.set_index("period")["ratio"]
+    return pd.DataFrame(frame)
+
+
+def datalab_trend_matrix(groups, start_date, end_date, time_unit, client_id, client_secret,
+                         anchor=DATALAB_ANCHOR, max_workers=4):
+    """
+    여러 키워드 그룹의 검색 트렌드를 하나의 공통 척도로 합침.
+    호출마다 비율(최대 100)이 따로 매겨지므로, 모든 호출에 포함된 기준 그룹의
+    합계가 첫 호출과 같아지도록 배치별 배율을 맞춘 뒤 전체 최대값을 100으로 재정규화한다.
+    반환: (기간 × 그룹 wide DataFrame, 실패한 그룹명 목록)
+    """
+    headers = {"X-Naver-Client-Id": client_id, "X-Naver-Client-Secret": client_secret,
+               "Content-Type": "application/json"}
+    batches = plan_datalab_batches(groups, anchor)
+    body = {"startDate": str(start_date), "endDate": str(end_date), "timeUnit": time_unit}
+
+    results, failed = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_datalab_call, headers, {**body, "keywordGroups": b}): i
+                   for i, b in enumerate(batches)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception:
+                failed += [g["groupName"] for g in batches[i][1:]]
+
+    name = anchor["groupName"]
+    ref = None
+    cols = []
+    for i in sorted(results):
+        df = results[i]
+        if name not in df or df[name].sum() == 0:
+            failed += [c for c in df.columns if c != name]
+            continue
+        if ref is None:
+            ref = df[name]
+            cols.append(ref.rename(name))
+        scale = ref.sum() / df[name].sum()
+        cols += [(df[c] * scale).rename(c) for c in df.columns if c != name]
+
+    if not cols:
+        return pd.DataFrame(), failed
+    matrix = pd.concat(cols, axis=1).sort_index()
+    matrix.index = pd.to_datetime(matrix.index)
+    matrix = matrix * (100 / matrix.max().max())
+    return matrix.round(2), failed
+
+
+# ─────────────────────────────────────────────
+# LLM 프롬프트용 시장 요약 (고정 크기 · 토큰 예산)
+# ─────────────────────────────────────────────
+def approx_tokens(text):
+    """토큰 수 근사 (한글 1자 ≈ 1토큰, 그 외 4자 ≈ 1토큰)"""
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    """approx_tokens 기준 max_tokens 이내가 되는 가장 긴 앞부분 (이분 탐색)"""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if approx_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+# 분석 단위별 1년 전 시점까지의 간격 (기간 수)
+YOY_LAG = {"month": 12, "week": 52, "date": 365}
+
+
+def _pct(a, b):
+    return (a / b - 1) * 100 if b else float("nan")
+
+
+def trend_digest(trend_df, window=3, time_unit="month"):
+    """
+    그룹별 트렌드 요약 한 줄: 최근값 · 최근 window 평균 대비 직전 window 증감 · 전년 대비 · 최고 시점.
+    전년 대비는 time_unit(month/week/date)에 맞는 간격(YOY_LAG)만큼 앞선 값과 비교한다.
+    """
+    lag = YOY_LAG.get(time_unit)
+    lines = []
+    for g, d in trend_df.sort_values("period", kind="stable").groupby("group", sort=False):
+        r = d["ratio"].to_numpy(dtype=float)
+        if not len(r):
+            continue
+        parts = [f"최근 {r[-1]:.1f}"]
+        if len(r) >= 2 * window:
+            parts.append(f"{window}기간 {_pct(r[-window:].mean(), r[-2 * window:-window].mean()):+.0f}%")
+        if lag and len(r) > lag:
+            parts.append(f"전년比 {_pct(r[-1], r[-1 - lag]):+.0f}%")
+        peak = d["period"].iloc[int(r.argmax())]
+        parts.append(f"최고 {pd.Timestamp(peak):%Y-%m}")
+        lines.append(f"- {g}: " + ", ".join(parts))
+    return lines
+
+
+def shopping_digest(df_shop, top_n=8):
+    """쇼핑 요약 줄: 표본 수 · 가격 분위수 · 상위 브랜드 점유율/중앙가 · 상위 몰 집중도"""
+    if df_shop is None or df_shop.empty:
+        return []
+    price = df_shop["lprice"].dropna()
+    q = price.quantile([0.1, 0.25, 0.5, 0.75, 0.9]).round(-1).astype(int).tolist() if len(price) else []
+    lines = [f"- 상품 {len(df_shop):,}건"]
+    if q:
+        lines.append("- 가격 분위(10/25/50/75/90%): " + "/".join(f"{v:,}" for v in q) + "원")
+    if "brand" in df_shop:
+        brand = df_shop["brand"].replace("", "기타").fillna("기타")
+        share = brand.value_counts(normalize=True).head(top_n)
+        med = df_shop.groupby(brand)["lprice"].median()
+        lines.append("- 브랜드(점유·중앙가): " + ", ".join(
+            f"{b} {s * 100:.0f}%·{med[b]:,.0f}원" for b, s in share.items()))
+    if "mallName" in df_shop:
+        top3 = df_shop["mallName"].value_counts(normalize=True).head(3)
+        lines.append(f"- 상위 3개 몰 비중 {top3.sum() * 100:.0f}% ({', '.join(top3.index)})")
+    return lines
+
+
+def market_digest(trend_df, df_shop, max_tokens=400, top_n=8, time_unit="month"):
+    """
+    트렌드·쇼핑 수집 결과 → 고정 크기 요약 문자열 (수집량과 무관하게 max_tokens 이내).
+    예산을 넘으면 브랜드 수를 줄이고, 그래도 넘으면 트렌드 그룹을 뒤에서부터 뺀다.
+    """
+    trend = trend_digest(trend_df, time_unit=time_unit) if trend_df is not None and not trend_df.empty else []
+    while True:
+        shop = shopping_digest(df_shop, top_n)
+        text = "\n".join(["[검색 트렌드]", *(trend or ["- 없음"]), "[쇼핑]", *(shop or ["- 없음"])])
+        if approx_tokens(text) <= max_tokens:
+            return text
+        if top_n > 3:
+            top_n -= 1
+        elif len(trend) > 1:
+            trend = trend[:-1]
+        else:
+            return truncate_tokens(text, max_tokens)   # 최후 수단: 예산과 같은 토큰 추정으로 절단
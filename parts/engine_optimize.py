@@ -0,0 +1,191 @@
+# engine_optimize.py
+# 최소원가 배합 최적화 (LP · 원료별 최소/최대 · 합계 100% · 목표 Brix/산도/pH · 시나리오 일괄 계산)
+#
+#   최소화  원가 + closeness·Σ|x − 기준 배합|
+#   제약    Σx = 100,  최소 ≤ x ≤ 최대,  |Brix − 목표| ≤ TOL_BRIX,  |산도 − 목표| ≤ TOL_ACID,  |pH − 목표| ≤ TOL_PH
+#
+# 기준 배합과의 편차는 보조 변수 t ≥ |x − 기준|로 선형화해 전체를 LP 하나로 풀고,
+# 시나리오마다 scipy HiGHS(linprog)를 호출한다.
+# pH 제약은 engine_props의 전하 균형 f(H)가 H에 대해 단조 감소한다는 점을 써서
+#   pH ≤ 목표 + tol ⇔ f(10^-(목표+tol)) ≥ 0,   pH ≥ 목표 − tol ⇔ f(10^-(목표−tol)) ≤ 0
+# 로 바꾼다. f는 산·염기 몰농도에 선형이라 비중(Brix)만 고정하면 배합비에 대한 선형 제약이 되고,
+# 구연산염 같은 완충염도 evaluate()와 똑같이 반영된다. 비중은 목표 Brix로 먼저 풀고,
+# 풀이를 evaluate()로 검산해 벗어나면 해의 실제 비중으로 다시 푼다 (끝까지 벗어나면 "infeasible").
+#
+# 허용오차
+#   TOL_BRIX · TOL_ACID · TOL_PH : 목표를 맞췄다고 보는 폭 (제약 범위의 반폭, 원래 단위)
+#   FEAS_TOL                      : HiGHS 원시·쌍대 허용오차 (배합 분율 단위 → 배합비 기준 약 1e-7%)
+#   CHECK_SLACK                   : evaluate() 검산 때 허용폭에 더하는 여유 (수치 오차 흡수용)
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+
+try:
+    from parts import engine_props
+except ImportError:
+    import engine_props
+
+TOL_BRIX = 0.2      # °Bx
+TOL_ACID = 0.01     # % (구연산 환산)
+TOL_PH   = 0.05
+FEAS_TOL = 1e-9
+CHECK_SLACK = 1e-3
+MAX_ITER = 4000
+PASSES   = 3        # 비중 갱신 후 다시 푸는 최대 횟수
+ACIDULANT_MIN = 0.5 # 산 당량(g/g)이 이 이상이면 산미료로 보고 현재 함량 아래로 줄이지 않음
+
+
+def _batch(value, size):
+    return None if value is None else np.broadcast_to(np.asarray(value, dtype=float), (size,))
+
+
+def _ph_rows(p, ph, tol_ph, density):
+    """
+    목표 pH ± tol을 (A_ub 행 2개, b_ub 2개)로 — 변수는 배합 분율.
+    몰농도 = 배합 분율 · 물성 · 1000 · 비중 / 분자량, 양변을 H로 나눠 계수 크기를 맞춘다.
+    """
+    rows, rhs = [], []
+    for sign, h in ((-1.0, 10.0 ** -(ph + tol_ph)), (1.0, 10.0 ** -(ph - tol_ph))):
+        d = engine_props.citrate_charge(h)
+        coef = 1000.0 * density / engine_props.ACID_MW * (p[:, 2] * d + p[:, 3] * (d - engine_props.BASE_NA))
+        rows.append(sign * coef / h)
+        rhs.append(sign * (h - engine_props.KW / h) / h)
+    return rows, rhs
+
+
+def _misses(check, k, brix, acidity, ph, tol_brix, tol_acid, tol_ph):
+    """evaluate() 검산: 해 1개의 물성(check)이 시나리오 k의 목표 범위를 벗어났는지"""
+    return (brix is not None and abs(check["brix"][0] - brix[k]) > tol_brix + CHECK_SLACK) or \
+           (acidity is not None and abs(check["acidity"][0] - acidity[k]) > tol_acid + CHECK_SLACK) or \
+           (ph is not None and abs(check["ph"][0] - ph[k]) > tol_ph + CHECK_SLACK)
+
+
+def optimize(props, prices, lower, upper, brix=None, acidity=None, ph=None,
+             tol_brix=TOL_BRIX, tol_acid=TOL_ACID, tol_ph=TOL_PH, reference=None, closeness=0.0,
+             unit_ml=engine_props.UNIT_ML, max_iter=MAX_ITER):
+    """
+    최소원가 배합 계산.
+      props, prices : engine_props.lookup() 물성 행렬 (원료 수, 4) · 원가(원/kg)
+      lower, upper  : 원료별 최소/최대 배합비(%)
+      brix, acidity : 목표 Brix · 적정산도(% w/v 구연산 환산). 스칼라 또는 (시나리오 수,) 배열
+      ph            : 목표 pH — 산 · 염기(완충염) 당량의 전하 균형으로 제약 (acidity와 함께 줄 수 있음)
+      reference     : 기준 배합비(%) — closeness > 0이면 기준에서 벗어난 양(절대값 합)에 벌점
+    반환: {"ratios": (시나리오 수, 원료 수) 배합비(%), "status": 시나리오별 "optimal"|"infeasible"|"inaccurate",
+           "iterations": 최대 반복 수, **engine_props.evaluate() 물성}
+    원료가 하나도 없거나 최소 > 최대인 원료가 있거나, 해가 evaluate() 검산을 통과하지 못하면 "infeasible"이다.
+    """
+    p = np.asarray(props, dtype=float).reshape(-1, len(engine_props.PROP_COLS))
+    c = np.asarray(prices, dtype=float)
+    n = len(c)
+    lb = np.asarray(lower, dtype=float) / 100.0
+    ub = np.asarray(upper, dtype=float) / 100.0
+    size = max(np.size(v) for v in (brix, acidity, ph, 1) if v is not None)
+    brix, acidity, ph = _batch(brix, size), _batch(acidity, size), _batch(ph, size)
+
+    ratios = np.zeros((size, n))
+    status = np.full(size, "infeasible", dtype=object)
+    iterations = 0
+    if not n or (lb > ub).any():     # 최소 > 최대인 원료가 있으면 풀 필요 없이 실행 불가
+        out = engine_props.evaluate(ratios, p, c, unit_ml)
+        return {"ratios": ratios, "status": status.astype(str), "iterations": iterations, **out}
+
+    q = c / max(np.abs(c).max(), 1e-12)            # 원가 규모와 무관하게 closeness가 같은 의미를 갖도록
+    ref = None if reference is None or not closeness else np.asarray(reference, dtype=float) / 100.0
+    m = n if ref is not None else 0                # 변수 [x, t] — t는 |x − 기준| 상한 (closeness가 없으면 x만)
+    cost = np.concatenate([q, np.full(m, float(closeness))])
+    A_eq = np.hstack([np.ones((1, n)), np.zeros((1, m))])
+    bounds = list(zip(lb, ub)) + [(0, None)] * m
+    options = {"maxiter": int(max_iter), "primal_feasibility_tolerance": FEAS_TOL,
+               "dual_feasibility_tolerance": FEAS_TOL}
+    density = 1.0 + 0.004 * (brix if brix is not None else np.zeros(size))   # 첫 풀이는 목표 Brix의 비중
+
+    for k in range(size):
+        dens = density[k]
+        for _ in range(PASSES):
+            rows, rhs = [], []
+            if brix is not None:
+                rows += [100.0 * p[:, 1], -100.0 * p[:, 1]]
+                rhs += [brix[k] + tol_brix, -(brix[k] - tol_brix)]
+            if acidity is not None:                # 적정산도(w/v) = 산(w/w) · 비중
+                rows += [100.0 * p[:, 2] * dens, -100.0 * p[:, 2] * dens]
+                rhs += [acidity[k] + tol_acid, -(acidity[k] - tol_acid)]
+            if ph is not None:
+                r, b = _ph_rows(p, ph[k], tol_ph, dens)
+                rows, rhs = rows + r, rhs + b
+            A_ub = np.hstack([np.array(rows).reshape(-1, n), np.zeros((len(rows), m))])
+            b_ub = np.array(rhs, dtype=float)
+            if ref is not None:
+                eye = np.eye(n)
+                A_ub = np.vstack([A_ub, np.hstack([eye, -eye]), np.hstack([-eye, -eye])])
+                b_ub = np.concatenate([b_ub, ref, -ref])
+            res = linprog(cost, A_ub=A_ub if len(A_ub) else None, b_ub=b_ub if len(A_ub) else None,
+                          A_eq=A_eq, b_eq=[1.0], bounds=bounds, method="highs", options=options)
+            iterations = max(iterations, int(getattr(res, "nit", 0) or 0))
+            if res.x is None:
+                status[k] = "infeasible"
+                break
+            ratios[k] = np.clip(res.x[:n], lb, ub) * 100.0
+            check = engine_props.evaluate(ratios[k:k + 1], p, c, unit_ml)
+            if not _misses(check, k, brix, acidity, ph, tol_brix, tol_acid, tol_ph):
+                status[k] = "optimal" if res.status == 0 else "inaccurate"
+                break
+            status[k] = "infeasible"               # 검산 실패 — 해의 실제 비중으로 다시 풀어 본다
+            dens = float(check["density"][0])
+    out = engine_props.evaluate(ratios, p, c, unit_ml)
+    return {"ratios": ratios, "status": status.astype(str), "iterations": iterations, **out}
+
+
+def _pin_acidulants(props, current, lower, upper):
+    """
+    현재 배합의 산미료(산 당량 ≥ ACIDULANT_MIN)는 최소 함량을 현재 함량으로 올린다 (최대를 넘지 않게).
+    원가만 보면 비타민C처럼 다른 목적으로 넣은 산성 원료가 산미료를 대신해 신맛 설계가 무너지기 때문.
+    """
+    acidulant = (np.asarray(props)[:, 2] >= ACIDULANT_MIN) & (current > 0)
+    return np.where(acidulant, np.maximum(lower, np.minimum(current, upper)), lower)
+
+
+def _inputs(df, ratio_col, price_col, min_col, max_col, table):
+    df = df.dropna(subset=["원료명"]).reset_index(drop=True)
+    props, _ = engine_props.lookup(df["원료명"].tolist(), table)
+
+    def col(name, default):
+        if name not in df.columns:
+            return np.full(len(df), default)
+        return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+    return df, props, col(ratio_col, 0.0), col(price_col, 0.0), col(min_col, 0.0), col(max_col, 100.0)
+
+
+def optimize_df(df, targets, ratio_col="함량(%)", price_col="원가(원/kg)", min_col="최소(%)", max_col="최대(%)",
+                closeness=0.0, unit_ml=engine_props.UNIT_ML, table=None, keep_acid=True):
+    """
+    원료 구성표 1개 최소원가 배합 → (결과 DataFrame [원료명, 현재(%), 최적(%), 원가(원/kg)], 물성 dict, 상태).
+    targets: {"brix", "ph", "acidity"} 중 일부 — 최소/최대 컬럼이 없으면 0~100%
+    keep_acid: 현재 산미료 함량을 최소로 고정 (_pin_acidulants)
+    """
+    df, props, current, prices, lower, upper = _inputs(df, ratio_col, price_col, min_col, max_col, table)
+    if keep_acid:
+        lower = _pin_acidulants(props, current, lower, upper)
+    res = optimize(props, prices, lower, upper,
+                   brix=targets.get("brix"), acidity=targets.get("acidity"), ph=targets.get("ph"),
+                   reference=current, closeness=closeness, unit_ml=unit_ml)
+    table_df = df[["원료명"]].assign(**{"현재(%)": current, "최적(%)": res["ratios"][0].round(3), "원가(원/kg)": prices})
+    props_out = {k: float(v[0]) for k, v in res.items() if k not in ("ratios", "status", "iterations")}
+    return table_df, props_out, str(res["status"][0])
+
+
+def scenario_grid(df, brix_values, ph_values, ratio_col="함량(%)", price_col="원가(원/kg)",
+                  min_col="최소(%)", max_col="최대(%)", table=None, keep_acid=True):
+    """
+    목표 Brix × pH 격자 전체를 풀어 L당 최소원가 표 반환 (행 Brix, 열 pH, 실행 불가·검산 실패는 NaN).
+    산미료 고정과 evaluate() 검산은 optimize_df와 같다.
+    """
+    _, props, current, prices, lower, upper = _inputs(df, ratio_col, price_col, min_col, max_col, table)
+    if keep_acid:
+        lower = _pin_acidulants(props, current, lower, upper)
+    bb, pp = np.meshgrid(np.asarray(brix_values, dtype=float), np.asarray(ph_values, dtype=float), indexing="ij")
+    res = optimize(props, prices, lower, upper, brix=bb.ravel(), ph=pp.ravel())
+    cost = np.where(res["status"] == "infeasible", np.nan, res["cost_l"]).reshape(bb.shape)
+    return pd.DataFrame(cost, index=pd.Index(np.round(brix_values, 2), name="Brix"),
+                        columns=pd.Index(np.round(ph_values, 2), name="pH"))
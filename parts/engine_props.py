@@ -0,0 +1,163 @@
+# engine_props.py
+# 배합 물성 계산 엔진 (총고형분 · 추정 Brix · 적정산도 · 근사 pH · L당/개당 원가 · 목표 편차)
+#
+# 배합비는 (원료 수,) 또는 (후보 수, 원료 수) 배열로 받아 한 번의 벡터 연산으로 계산한다.
+# 배합안 1개든 최적화·시뮬레이션 후보 수천 개든 같은 함수를 쓴다.
+
+from functools import lru_cache
+import re
+
+import numpy as np
+
+# 원료 물성 열: 고형분(g/g) · Brix 기여(°Bx / 배합비 1%) · 산 당량(구연산 환산 g/g) · 염기 당량(구연산염 환산 g/g)
+PROP_COLS = ["고형분", "Brix기여", "산당량", "염기당량"]
+
+DEFAULT_PROPS = {
+    "정제수":       (0.00, 0.00, 0.000, 0.000),
+    "탄산가스":     (0.00, 0.00, 0.000, 0.000),
+    "설탕":         (1.00, 1.00, 0.000, 0.000),
+    "백설탕":       (1.00, 1.00, 0.000, 0.000),
+    "과당":         (1.00, 1.00, 0.000, 0.000),
+    "액상과당":     (0.77, 0.77, 0.000, 0.000),
+    "포도당":       (0.91, 0.91, 0.000, 0.000),
+    "올리고당":     (0.75, 0.75, 0.000, 0.000),
+    "알룰로스":     (1.00, 1.00, 0.000, 0.000),
+    "에리스리톨":   (1.00, 1.00, 0.000, 0.000),
+    "스테비올배당체": (1.00, 1.00, 0.000, 0.000),
+    "수크랄로스":   (1.00, 1.00, 0.000, 0.000),
+    "과즙농축액":   (0.65, 0.65, 0.030, 0.000),
+    "구연산":       (1.00, 1.00, 1.000, 0.000),
+    "사과산":       (1.00, 1.00, 0.955, 0.000),
+    "주석산":       (1.00, 1.00, 0.853, 0.000),
+    "젖산":         (0.88, 0.88, 0.626, 0.000),
+    "인산":         (0.85, 0.85, 1.110, 0.000),
+    "비타민C":      (1.00, 1.00, 0.364, 0.000),
+    "구연산삼나트륨": (1.00, 1.00, 0.000, 0.653),
+    "향료":         (0.10, 0.10, 0.000, 0.000),
+}
+
+ACID_MW = 192.13                # 구연산 분자량 (산·염기 당량 환산 기준)
+ACID_PKAS = (3.13, 4.76, 6.40)  # 구연산 3단계 해리 상수 (25°C)
+BASE_NA = 3.0                   # 염기 당량 1몰(구연산삼나트륨 기준)이 내놓는 Na⁺ 몰수
+KW = 1e-14
+UNIT_ML = 355
+
+
+def _norm(name):
+    """공백 · 괄호 안 규격 제거 후 소문자"""
+    return re.sub(r"\(.*?\)|\s+", "", str(name or "")).lower()
+
+
+@lru_cache(maxsize=256)
+def _lookup(names, table_items):
+    table = {_norm(k): v for k, v in table_items}
+    keys = sorted(table, key=len, reverse=True)
+    props, unknown = np.zeros((len(names), len(PROP_COLS))), []
+    for i, name in enumerate(names):
+        key = _norm(name)
+        hit = table.get(key) or next((table[k] for k in keys if len(k) >= 2 and k in key), None)
+        if hit is None:
+            unknown.append(name)
+        else:
+            props[i] = hit
+    props.setflags(write=False)
+    return props, tuple(unknown)
+
+
+def lookup(names, table=None):
+    """
+    원료명 목록 → (물성 행렬 (원료 수, 4), 물성을 모르는 원료명 목록).
+    정확히 일치하지 않으면 표의 원료명을 포함하는 가장 긴 이름으로 찾는다 ('유기농 설탕' → 설탕).
+    부분 일치에는 2자 이상 이름만 쓴다 (1자 별칭 '물'이 '물엿'에 걸리지 않도록 — Master.resolve와 같은 기준).
+    모르는 원료는 물성 0으로 계산한다.
+    """
+    table = DEFAULT_PROPS if table is None else table
+    props, unknown = _lookup(tuple(str(n) for n in names), tuple(table.items()))
+    return props, list(unknown)
+
+
+def citrate_charge(h):
+    """
+    [H⁺](mol/L) → 구연산 1몰당 평균 음전하 D(H) = α1 + 2·α2 + 3·α3 (0~3, H가 클수록 작음).
+    전하 균형  H + Na = OH + (산 + 염기)·D  를 만드는 기본 함수로, pH 계산과 최적화 pH 제약이 같이 쓴다.
+    """
+    k1, k2, k3 = (10.0 ** -pk for pk in ACID_PKAS)
+    h = np.asarray(h, dtype=float)
+    t1, t2, t3 = k1 * h * h, k1 * k2 * h, k1 * k2 * k3
+    return (t1 + 2.0 * t2 + 3.0 * t3) / (h ** 3 + t1 + t2 + t3)
+
+
+def charge_balance(h, ca, cb):
+    """
+    전하 불균형 f(H) = 산·D + 염기·(D − 3) + OH − H  (ca, cb: 구연산·구연산염 mol/L).
+    H에 대해 단조 감소하고 실제 pH에서 0이다 → f(10^-pH) ≥ 0 ⇔ 실제 pH ≤ pH.
+    """
+    d = citrate_charge(h)
+    return ca * d + cb * (d - BASE_NA) + KW / h - h
+
+
+def solve_ph(ca, cb, iters=48):
+    """구연산(ca) · 구연산염(cb) 몰농도 → 전하 균형 pH (pH 0~14 구간 이분법, 배열 일괄)"""
+    ca, cb = np.broadcast_arrays(np.asarray(ca, dtype=float), np.asarray(cb, dtype=float))
+    lo, hi = np.zeros(ca.shape), np.full(ca.shape, 14.0)
+    for _ in range(iters):
+        mid = (lo + hi) / 2.0
+        below = charge_balance(10.0 ** -mid, ca, cb) >= 0     # 실제 pH ≤ mid
+        hi, lo = np.where(below, mid, hi), np.where(below, lo, mid)
+    return (lo + hi) / 2.0
+
+
+def evaluate(ratios, props, prices, unit_ml=UNIT_ML, targets=None):
+    """
+    배합 물성 벡터 계산.
+      ratios : (원료 수,) 또는 (후보 수, 원료 수) 배합비(%)
+      props  : (원료 수, 4) lookup() 물성 행렬
+      prices : (원료 수,) 원가(원/kg)
+      targets: {"brix", "ph", "cost"(원/L)} 중 일부 — 있으면 편차(dev_*) 추가
+    반환: 각 값이 ratios의 후보 축 모양인 배열 dict
+      total(%) · solids(%) · brix(°Bx) · acidity(% 구연산) · ph · density(kg/L) · cost_kg · cost_l · cost_unit
+    pH는 산 당량을 구연산, 염기 당량을 구연산삼나트륨으로 보고 3단계 해리 + 전하 균형으로 푼 추정값이다.
+    구연산염 같은 완충염은 반영하지만 과즙·단백질 등 다른 완충 성분은 모르므로 실측으로 확인한다.
+    """
+    r = np.asarray(ratios, dtype=float)
+    p = np.asarray(props, dtype=float)
+    w = r @ p                                        # 배합비 가중 물성 합 (%)
+    solids, brix, acid, base = w[..., 0], w[..., 1], w[..., 2], w[..., 3]
+    density = 1.0 + 0.004 * brix                     # 당 수용액 근사 비중
+    acidity = acid * density                         # % w/w → % w/v
+
+    ca = acid * 10.0 * density / ACID_MW             # mol/L
+    cb = base * 10.0 * density / ACID_MW
+    ph = solve_ph(ca, cb)
+
+    cost_kg = r @ np.asarray(prices, dtype=float) / 100.0
+    cost_l = cost_kg * density
+    out = {"total": r.sum(axis=-1), "solids": solids, "brix": brix, "acidity": acidity, "ph": ph,
+           "density": density, "cost_kg": cost_kg, "cost_l": cost_l, "cost_unit": cost_l * unit_ml / 1000.0}
+    for key, col in (("brix", "brix"), ("ph", "ph"), ("cost", "cost_l")):
+        if targets and targets.get(key) is not None:
+            out[f"dev_{key}"] = out[col] - float(targets[key])
+    return out
+
+
+def acid_for_ph(ph, base=0.0):
+    """
+    evaluate()의 전하 균형을 거꾸로 풀어, 목표 pH에 필요한 적정산도(% w/v 구연산 환산) 반환.
+    base: 함께 넣는 염기 당량(% w/v 구연산염 환산). 목표 pH가 염기만으로도 이미 낮으면 0.
+    """
+    h = 10.0 ** -np.asarray(ph, dtype=float)
+    d = citrate_charge(h)
+    cb = np.asarray(base, dtype=float) * 10.0 / ACID_MW
+    ca = (h - KW / h - cb * (d - BASE_NA)) / d      # mol/L
+    return np.maximum(ca, 0.0) * ACID_MW / 10.0
+
+
+def evaluate_df(df, ratio_col="함량(%)", price_col="원가(원/kg)", unit_ml=UNIT_ML, targets=None, table=None):
+    """원료 구성표 DataFrame 1개 → 물성 dict (float) + "unknown"(물성 미등록 원료명)"""
+    df = df.dropna(subset=["원료명"])
+    props, unknown = lookup(df["원료명"].tolist(), table)
+    ratios = np.nan_to_num(df[ratio_col].to_numpy(dtype=float, na_value=np.nan))
+    prices = np.nan_to_num(df[price_col].to_numpy(dtype=float, na_value=np.nan))
+    out = {k: float(v) for k, v in evaluate(ratios, props, prices, unit_ml, targets).items()}
+    out["unknown"] = unknown
+    return out
@@ -0,0 +1,230 @@
+# engine_sched.py
+# LLM 호출 스케줄러 (모델별 요청·토큰 버킷 · 우선순위 대기열 · 동시 실행 상한 · 일일 토큰 예산 · 대기 지표)
+
+import os
+import json
+import time
+import heapq
+import atexit
+import asyncio
+import itertools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+try:
+    from parts.engine_data import DATA_DIR
+    from parts.engine_http import TokenBucket
+except ImportError:
+    from engine_data import DATA_DIR
+    from engine_http import TokenBucket
+
+# 우선순위 (작을수록 먼저)
+INTERACTIVE, NORMAL, BATCH = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+# 모델별 (분당 요청 수, 분당 토큰 수, 동시 실행 수) — 계정 등급에 맞춰 조정
+LIMITS = {
+    "gpt-4o":      (500, 30000, 16),
+    "gpt-4o-mini": (500, 200000, 32),
+}
+DEFAULT_LIMIT = (60, 40000, 8)
+
+DAILY_TOKEN_CAP = int(os.environ.get("NPD_LLM_DAILY_TOKENS", "0"))   # 0 = 무제한
+BATCH_SHARE     = 0.9   # 배치 작업은 일일 예산의 90%까지만 → 대화형 요청 여유분 확보
+BUDGET_PATH     = os.path.join(DATA_DIR, "llm_budget.json")
+BUDGET_SAVE_SEC = 2.0   # 예산 파일은 호출마다가 아니라 최대 이 간격으로만 기록 (종료 시 마지막 값 기록)
+
+
+class BudgetExceeded(RuntimeError):
+    """일일 토큰 예산 초과"""
+
+
+def estimate_tokens(messages, max_output=1000):
+    """요청 토큰 추정 (한글 1자 ≈ 1토큰, 그 외 4자 ≈ 1토큰) + 예상 출력"""
+    text = "".join(str(m.get("content", "")) for m in messages)
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul) // 4 + max_output
+
+
+class _Lane:
+    """모델 1개의 버킷 · 대기열 · 지표"""
+
+    def __init__(self, rpm, tpm, concurrency):
+        self.requests = TokenBucket(rpm / 60.0, max(1, rpm // 10))
+        self.tokens = TokenBucket(tpm / 60.0, tpm)
+        self.concurrency, self.active = concurrency, 0
+        self.heap = []
+        self.m = {"admitted": 0, "max_depth": 0, "wait_ms": 0.0, "max_wait_ms": 0.0,
+                  "by_priority": {name: 0 for name in PRIORITY_NAMES.values()}}
+
+
+class Scheduler:
+    def __init__(self, limits=LIMITS, daily_cap=DAILY_TOKEN_CAP, budget_path=BUDGET_PATH):
+        self.limits, self.daily_cap, self.budget_path = limits, daily_cap, budget_path
+        self.cond = threading.Condition()
+        self.lanes = {}
+        self.seq = itertools.count()
+        self.budget = self._load_budget()
+        self._dirty, self._saved_at = False, 0.0
+        self._io_lock = threading.Lock()
+
+    # ── 일일 예산 ──
+    def _load_budget(self):
+        try:
+            with open(self.budget_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        return data if data.get("date") == time.strftime("%Y-%m-%d") else {"date": time.strftime("%Y-%m-%d"), "models": {}}
+
+    def flush_budget(self):
+        """바뀐 사용량을 파일에 기록 (스케줄러 잠금 밖에서 파일 쓰기)"""
+        with self.cond:
+            if not self._dirty:
+                return
+            body = json.dumps(self.budget)
+            self._dirty, self._saved_at = False, time.monotonic()
+        with self._io_lock:
+            os.makedirs(os.path.dirname(self.budget_path) or ".", exist_ok=True)
+            tmp = self.budget_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp, self.budget_path)
+
+    def used_today(self):
+        if self.budget["date"] != time.strftime("%Y-%m-%d"):   # 날짜가 바뀌면 초기화
+            self.budget = {"date": time.strftime("%Y-%m-%d"), "models": {}}
+        return sum(self.budget["models"].values())
+
+    def _check_budget(self, est, priority):
+        if not self.daily_cap:
+            return
+        cap = self.daily_cap * (BATCH_SHARE if priority >= BATCH else 1.0)
+        if self.used_today() + est > cap:
+            raise BudgetExceeded(f"일일 토큰 예산 초과 ({self.used_today():,} / {self.daily_cap:,})")
+
+    # ── 대기열 ──
+    def _lane(self, model):
+        if model not in self.lanes:
+            self.lanes[model] = _Lane(*self.limits.get(model, DEFAULT_LIMIT))
+        return self.lanes[model]
+
+    def _admit(self, lane, model, est, priority):
+        entry = (priority, next(self.seq))
+        t0 = time.monotonic()
+        with self.cond:
+            self._check_budget(est, priority)
+            heapq.heappush(lane.heap, entry)
+            lane.m["max_depth"] = max(lane.m["max_depth"], len(lane.heap))
+            try:
+                while True:
+                    wait = None
+                    if lane.heap[0] == entry and lane.active < lane.concurrency:
+                        wait = lane.tokens.try_take(est)
+                        if not wait:
+                            wait = lane.requests.try_take(1)
+                            if wait:
+                                lane.tokens.refund(est)
+                            else:
+                                break
+                    self.cond.wait(timeout=wait)
+            except BaseException:
+                lane.heap.remove(entry)
+                heapq.heapify(lane.heap)
+                self.cond.notify_all()
+                raise
+            heapq.heappop(lane.heap)
+            lane.active += 1
+            waited = (time.monotonic() - t0) * 1000
+            lane.m["admitted"] += 1
+            lane.m["wait_ms"] += waited
+            lane.m["max_wait_ms"] = max(lane.m["max_wait_ms"], waited)
+            lane.m["by_priority"][PRIORITY_NAMES[priority]] += 1
+            self.cond.notify_all()
+
+    def _release(self, lane, model, est, used):
+        with self.cond:
+            lane.active -= 1
+            lane.tokens.refund(est - used)   # 추정과 실제 사용량 차이 보정
+            self.used_today()
+            if used:
+                self.budget["models"][model] = self.budget["models"].get(model, 0) + used
+                self._dirty = True
+            due = self._dirty and time.monotonic() - self._saved_at >= BUDGET_SAVE_SEC
+            self.cond.notify_all()
+        if due:
+            self.flush_budget()
+
+    @contextmanager
+    def slot(self, model, est_tokens, priority=NORMAL):
+        """
+        호출 허가를 받을 때까지 대기 (우선순위 → 도착 순).
+        블록 안에서 실제 사용 토큰을 usage["tokens"]에 넣으면 버킷·예산을 실사용량으로 보정한다.
+        """
+        with self.cond:
+            lane = self._lane(model)
+        self._admit(lane, model, est_tokens, priority)
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            used = usage["tokens"] if usage["tokens"] is not None else est_tokens
+            self._release(lane, model, est_tokens, used)
+
+    @asynccontextmanager
+    async def aslot(self, model, est_tokens, priority=BATCH):
+        """
+        slot()의 asyncio판 (대기는 별도 스레드에서).
+        대기 중 태스크가 취소돼도 대기 스레드는 멈추지 않으므로, 허가가 나는 즉시 그 자리를 반납한다.
+        """
+        with self.cond:
+            lane = self._lane(model)
+        state = {"admitted": False, "abandoned": False}
+
+        def admit():
+            self._admit(lane, model, est_tokens, priority)
+            with self.cond:
+                state["admitted"] = not state["abandoned"]
+                give_back = state["abandoned"]
+            if give_back:
+                self._release(lane, model, est_tokens, 0)
+
+        try:
+            await asyncio.to_thread(admit)
+        except asyncio.CancelledError:
+            with self.cond:
+                state["abandoned"] = True
+                give_back = state["admitted"]
+            if give_back:
+                self._release(lane, model, est_tokens, 0)
+            raise
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            used = usage["tokens"] if usage["tokens"] is not None else est_tokens
+            self._release(lane, model, est_tokens, used)
+
+    def stats(self):
+        """모델별 대기열 지표 + 오늘 사용 토큰"""
+        with self.cond:
+            out = {}
+            for model, lane in self.lanes.items():
+                m = lane.m
+                out[model] = {"queued": len(lane.heap), "active": lane.active, "max_depth": m["max_depth"],
+                              "admitted": m["admitted"],
+                              "avg_wait_ms": round(m["wait_ms"] / max(m["admitted"], 1), 1),
+                              "max_wait_ms": round(m["max_wait_ms"], 1),
+                              **{f"n_{k}": v for k, v in m["by_priority"].items()},
+                              "tokens_today": self.budget["models"].get(model, 0)}
+            return out
+
+    def budget_status(self):
+        with self.cond:
+            used = self.used_today()
+        return {"date": self.budget["date"], "used": used, "cap": self.daily_cap or None,
+                "remaining": (self.daily_cap - used) if self.daily_cap else None}
+
+
+scheduler = Scheduler()
+atexit.register(scheduler.flush_budget)
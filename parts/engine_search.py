@@ -0,0 +1,172 @@
+# engine_search.py
+# I1250 제품명·업체명 한글 n-gram 역색인 (부분일치 · 다중어 AND · 순위)
+
+import os
+import re
+import numpy as np
+
+try:
+    from parts.engine_data import DATA_DIR
+    from parts import engine_i1250
+except ImportError:
+    from engine_data import DATA_DIR
+    import engine_i1250
+
+INDEX_DIR = os.path.join(DATA_DIR, "i1250_index")
+FIELDS    = {"p": "제품명", "b": "업체명"}   # 색인 키 접두어 → 미러 컬럼
+_FILES    = ["keys", "offsets", "postings", "dates", "plen", "docs"]   # docs.npy는 갱신 표식 → 마지막 교체
+
+_loaded = {"mtime": None, "index": None}
+
+
+def normalize(text):
+    """소문자화 + 공백·기호 제거 (부분일치 기준 문자열)"""
+    return re.sub(r"[\s\W_]+", "", str(text or "").lower())
+
+
+def ngrams(text, sizes=(2, 3)):
+    t = normalize(text)
+    return {t[i:i + n] for n in sizes for i in range(len(t) - n + 1)}
+
+
+def _query_grams(term):
+    """검색어 → 필수 gram 목록 (3글자 이상은 trigram, 2글자는 bigram)"""
+    t = normalize(term)
+    n = 3 if len(t) >= 3 else 2
+    return [t[i:i + n] for i in range(len(t) - n + 1)]
+
+
+def build_index(index_dir=INDEX_DIR):
+    """미러 전체로 bigram·trigram 역색인 생성 후 .npy로 저장 → 문서 수"""
+    with engine_i1250._connect() as con:
+        rows = con.execute('SELECT "품목보고번호", "제품명", "업체명", "신고일자" FROM i1250').fetchall()
+
+    postings = {}
+    for doc, (_, prd, bssh, _) in enumerate(rows):
+        for prefix, text in (("p", prd), ("b", bssh)):
+            for g in ngrams(text):
+                postings.setdefault(prefix + g, []).append(doc)
+
+    keys = sorted(postings)
+    lens = np.fromiter((len(postings[k]) for k in keys), dtype=np.int64, count=len(keys))
+    arrays = {
+        "keys":     np.array(keys, dtype="<U4"),
+        "offsets":  np.concatenate([[0], np.cumsum(lens)]).astype(np.int64),
+        "postings": np.fromiter((d for k in keys for d in postings[k]), dtype=np.int32,
+                                count=int(lens.sum())),
+        "docs":     np.array([r[0] for r in rows], dtype="<U24"),
+        "dates":    np.array([int(re.sub(r"\D", "", r[3] or "")[:8] or 0) for r in rows], dtype=np.int32),
+        "plen":     np.array([len(normalize(r[1])) for r in rows], dtype=np.int16),
+    }
+    os.makedirs(index_dir, exist_ok=True)
+    for name in _FILES:
+        np.save(os.path.join(index_dir, f"{name}.tmp.npy"), arrays[name])
+    for name in _FILES:   # 저장 완료 후 일괄 교체 (읽는 쪽이 반쯤 쓰인 색인을 보지 않도록)
+        os.replace(os.path.join(index_dir, f"{name}.tmp.npy"), os.path.join(index_dir, f"{name}.npy"))
+    return len(rows)
+
+
+def load_index(index_dir=INDEX_DIR):
+    """색인 메모리 매핑 로드 (파일 갱신 시에만 다시 매핑) → dict 또는 None"""
+    path = os.path.join(index_dir, "docs.npy")
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    if _loaded["mtime"] != mtime:
+        _loaded["index"] = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+                            for name in _FILES}
+        _loaded["mtime"] = mtime
+    return _loaded["index"]
+
+
+def _postings(idx, key):
+    i = np.searchsorted(idx["keys"], key)
+    if i >= len(idx["keys"]) or idx["keys"][i] != key:
+        return np.empty(0, dtype=np.int32)
+    return idx["postings"][idx["offsets"][i]:idx["offsets"][i + 1]]
+
+
+def _candidates(idx, prefix, term):
+    """검색어의 모든 gram을 포함하는 문서 (gram 교집합)"""
+    grams = _query_grams(term)
+    if not grams:
+        return None   # 1글자 검색어 → 색인으로 좁힐 수 없음
+    lists = sorted((_postings(idx, prefix + g) for g in grams), key=len)
+    docs = lists[0]
+    for p in lists[1:]:
+        if not len(docs):
+            break
+        docs = np.intersect1d(docs, p, assume_unique=True)
+    return docs
+
+
+SCORE_CHUNK = 2000   # 원문 검증·점수 계산 단위 (SQLite IN 목록은 900개씩 나눠 조회)
+
+
+def _texts(report_nos):
+    """품목보고번호 목록 → {품목보고번호: (제품명, 업체명)} (검증용 두 컬럼만 조회)"""
+    out = {}
+    with engine_i1250._connect() as con:
+        for i in range(0, len(report_nos), 900):
+            chunk = report_nos[i:i + 900]
+            marks = ", ".join("?" * len(chunk))
+            out.update((r[0], (r[1], r[2])) for r in con.execute(
+                f'SELECT "품목보고번호", "제품명", "업체명" FROM i1250 WHERE "품목보고번호" IN ({marks})', chunk))
+    return out
+
+
+def _score(texts, terms):
+    """원문 검증 + 점수 (검색어가 실제로 없으면 None — gram 교집합의 오탐)"""
+    score = 0.0
+    for prefix, t in terms:
+        text = normalize(texts[0 if prefix == "p" else 1])
+        if t not in text:
+            return None
+        score += (2.0 if text.startswith(t) else 1.0) + len(t) / max(len(text), 1)
+    return score
+
+
+def search(prdnm="", bssh="", limit=500, report_no="", index_dir=INDEX_DIR):
+    """
+    제품명·업체명 부분일치 검색 (공백으로 나눈 검색어는 모두 포함해야 함, AND).
+    report_no가 있으면 그 품목보고번호만 (점수 계산 전에 거름 → 결과 수가 limit에서 깎이지 않음).
+    반환: 점수순 [(품목보고번호, 점수), ...] — 색인이 없거나 좁힐 수 없으면 None
+
+    gram 교집합 후보는 짧은 제품명 · 최근 신고 순으로 SCORE_CHUNK개씩 원문 검증한다.
+    남은 후보가 받을 수 있는 최고 점수(검색어마다 접두 일치 2 + 길이 비중 상한)가
+    지금까지의 limit번째 점수보다 낮아지면 멈추므로, 잘라낸 후보 중에 더 높은 점수는 없다.
+    """
+    idx = load_index(index_dir)
+    terms = [("p", t) for t in prdnm.split()] + [("b", t) for t in bssh.split()]
+    if idx is None or not terms:
+        return None
+
+    docs = None
+    for prefix, term in terms:
+        cand = _candidates(idx, prefix, term)
+        if cand is None:
+            return None
+        docs = cand if docs is None else np.intersect1d(docs, cand, assume_unique=True)
+    if report_no:
+        docs = docs[idx["docs"][docs] == report_no.strip()]
+    if not len(docs):
+        return []
+
+    terms = [(prefix, normalize(t)) for prefix, t in terms]
+    pre = docs[np.lexsort((-idx["dates"][docs], idx["plen"][docs]))]
+    plen = idx["plen"][pre]
+    ranked = []
+    for start in range(0, len(pre), SCORE_CHUNK):
+        if len(ranked) >= limit:
+            floor = sorted((s for _, s in ranked), reverse=True)[limit - 1]
+            bound = sum(2.0 + (len(t) / max(int(plen[start]), 1) if prefix == "p" else 1.0) for prefix, t in terms)
+            if bound < floor:
+                break
+        chunk = [str(d) for d in idx["docs"][pre[start:start + SCORE_CHUNK]]]
+        texts = _texts(chunk)
+        for rno in chunk:
+            score = _score(texts[rno], terms) if rno in texts else None
+            if score is not None:
+                ranked.append((rno, round(score, 3)))
+    ranked.sort(key=lambda x: -x[1])
+    return ranked[:limit]
@@ -0,0 +1,157 @@
+# engine_shelflife.py
+# 유통기한 예측 엔진 (Q10 · Arrhenius 온도 의존성 · pH/Aw/Brix 보정 · 시간에 따라 변하는 보관 온도 · SKU×온도 이력 일괄 계산)
+#
+# shelflife_simulator.html의 Q10 가속 계산을 서버 쪽에서 제품 포트폴리오 단위로 쓰기 위한 모듈.
+#   속도 배수 m(T) = Q10^((T − T기준)/10)            (Q10 모델)
+#                  = exp(Ea/R · (1/T기준 − 1/T))       (Arrhenius, 절대온도)
+#   품질 소모율    = m(T) · γ(pH, Aw) / 기준일수         → 누적 소모가 1이 되는 시점이 예측 유통기한
+# 기준일수는 "기준 온도 · 기준 pH/Aw에서의 유통기한"이다.
+
+import numpy as np
+import pandas as pd
+
+R_GAS   = 8.314      # J/(mol·K)
+PH_REF, AW_REF = 3.5, 0.98
+PH_MIN, PH_OPT = 2.0, 5.5     # 부패 미생물(효모) 카디널 pH
+AW_MIN  = 0.85                # 부패 미생물 최소 수분활성도
+FLOOR   = 0.1                 # 미생물이 자라지 못해도 남는 이화학·관능 변화 비율
+MAX_DAYS = 3650
+TAIL_DAYS = 1.0               # 온도 이력이 끝난 뒤에는 마지막 1일의 평균 속도로 외삽
+
+# 보관 조건별 기준 온도 · 표시 유통기한 안전계수 (shelflife_simulator.html과 동일)
+STORAGE = {"상온": (25.0, 0.7), "냉장": (5.0, 0.8), "냉동": (-18.0, 0.85)}
+
+STEP_DAYS = 0.25
+PROFILES = {   # 이름 → 6시간 간격 온도(°C)
+    "상온 25°C":              [25.0],
+    "냉장 5°C":               [5.0],
+    "하절기 유통 (35°C 3일 → 상온)": [35.0] * 12 + [25.0] * 4,
+    "일교차 상온 (18~32°C)":  list(25.0 + 7.0 * np.sin(np.arange(4) / 4 * 2 * np.pi)),
+    "냉장 유통 중 이탈 (25°C 1일)": [5.0] * 8 + [25.0] * 4 + [5.0] * 4,
+}
+
+
+def aw_from_brix(brix):
+    """당 수용액 수분활성도 근사 (Norrish 식, 자당 K=6.47)"""
+    b = np.clip(np.asarray(brix, dtype=float), 0.0, 85.0)
+    xs = (b / 342.3) / (b / 342.3 + (100.0 - b) / 18.015)
+    return (1.0 - xs) * np.exp(-6.47 * xs ** 2)
+
+
+def _gamma(ph, aw):
+    g_ph = np.clip((np.asarray(ph, dtype=float) - PH_MIN) / (PH_OPT - PH_MIN), 0.0, 1.0)
+    g_aw = np.clip((np.asarray(aw, dtype=float) - AW_MIN) / (1.0 - AW_MIN), 0.0, 1.0)
+    return g_ph * g_aw
+
+
+def condition_factor(ph, aw=None, brix=None):
+    """
+    pH · Aw에 따른 속도 보정 (기준 pH/Aw = 1, 카디널 모델 γ 비율).
+    Aw가 없으면(NaN) Brix로 추정한다. 낮을수록 변질이 느리고, 미생물 성장이 멈춰도 FLOOR는 남는다.
+    """
+    ph = np.asarray(ph, dtype=float)
+    aw = np.full(ph.shape, np.nan) if aw is None else np.asarray(aw, dtype=float)
+    if brix is not None:
+        aw = np.where(np.isnan(aw), aw_from_brix(brix), aw)
+    aw = np.where(np.isnan(aw), AW_REF, aw)
+    g = _gamma(ph, aw) / _gamma(PH_REF, AW_REF)
+    return FLOOR + (1.0 - FLOOR) * g
+
+
+def rate_multiplier(temps, t_ref, q10=None, ea=None):
+    """
+    기준 온도 대비 반응 속도 배수. temps와 t_ref · q10 · ea는 서로 브로드캐스트된다.
+    ea(kJ/mol)가 NaN이 아닌 항목은 Arrhenius, 그 외는 Q10.
+    """
+    T = np.asarray(temps, dtype=float)
+    t_ref = np.asarray(t_ref, dtype=float)
+    q10 = np.asarray(2.0 if q10 is None else q10, dtype=float)
+    ea = np.asarray(np.nan if ea is None else ea, dtype=float)
+    log_q10 = np.log(q10) * (T - t_ref) / 10.0
+    log_arr = np.nan_to_num(ea) * 1000.0 / R_GAS * (1.0 / (t_ref + 273.15) - 1.0 / (T + 273.15))
+    return np.exp(np.where(np.isnan(ea), log_q10, log_arr))
+
+
+def predict(base_days, t_ref, profiles, ph=PH_REF, aw=None, brix=None, q10=None, ea=None,
+            step_days=STEP_DAYS, max_days=MAX_DAYS):
+    """
+    SKU × 온도 이력 예측 유통기한(일) 일괄 계산.
+      base_days, t_ref, ph, aw, brix, q10, ea : (SKU 수,) 배열 또는 스칼라
+      profiles : (이력 수, 단계 수) 온도 배열 (step_days 간격, 길이가 다르면 마지막 값으로 채운 뒤 전달)
+    반환: (SKU 수, 이력 수) 예측 일수 — 이력이 끝날 때까지 다 소모되지 않으면 마지막 TAIL_DAYS의 평균 속도로 외삽.
+    메모리는 SKU 수 × 이력 수 × 단계 수에 비례하므로 매우 큰 포트폴리오는 SKU를 나눠 호출한다.
+    """
+    base = np.atleast_1d(np.asarray(base_days, dtype=float))
+    S = base.shape[0]
+    col = lambda v: np.broadcast_to(np.asarray(np.nan if v is None else v, dtype=float), (S,))[:, None, None]
+    temps = np.atleast_2d(np.asarray(profiles, dtype=float))[None]              # (1, P, N)
+    rate = rate_multiplier(temps, col(t_ref), None if q10 is None else col(q10), None if ea is None else col(ea))
+    gamma = condition_factor(col(ph)[..., 0, 0], None if aw is None else col(aw)[..., 0, 0],
+                             None if brix is None else col(brix)[..., 0, 0])
+    rate = rate * (gamma / np.maximum(base, 1e-9))[:, None, None]              # 일당 소모 분율 (S, P, N)
+
+    cum = np.cumsum(rate * step_days, axis=-1)
+    reached = cum >= 1.0
+    hit = reached.any(axis=-1)
+    idx = reached.argmax(axis=-1)
+    prev = np.where(idx > 0, np.take_along_axis(cum, np.maximum(idx - 1, 0)[..., None], -1)[..., 0], 0.0)
+    r_idx = np.take_along_axis(rate, idx[..., None], -1)[..., 0]
+    t_hit = idx * step_days + (1.0 - prev) / np.maximum(r_idx, 1e-12)
+
+    n_tail = max(1, int(round(TAIL_DAYS / step_days)))
+    r_tail = rate[..., -n_tail:].mean(axis=-1)
+    t_tail = temps.shape[-1] * step_days + (1.0 - cum[..., -1]) / np.maximum(r_tail, 1e-12)
+    return np.minimum(np.where(hit, t_hit, t_tail), max_days)
+
+
+def _positive(values, default):
+    """양수가 아닌 값 · NaN · inf → default (Q10 ≤ 0이나 기준일수 0은 계산이 성립하지 않음)"""
+    v = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(v) & (v > 0), v, default)
+
+
+def accelerated_plan(target_days, q10, base_temp, temps=None):
+    """
+    가속 시험 설계: 온도별 가속 계수와 목표 유통기한에 해당하는 시험 일수 (shelflife_simulator.html과 같은 식).
+    Q10 · 목표 일수가 양수가 아니면 기본값(2.0 · 365일)으로 계산한다.
+    """
+    target_days, q10 = float(_positive(target_days, 365.0)), float(_positive(q10, 2.0))
+    temps = np.asarray([base_temp + 10, base_temp + 20, base_temp + 30] if temps is None else temps, dtype=float)
+    factor = rate_multiplier(temps, base_temp, q10)
+    return pd.DataFrame({"시험 온도(°C)": temps, "가속 계수": factor.round(2),
+                         "시험 일수": np.round(target_days / factor).astype(int)})
+
+
+def _stack(profiles):
+    n = max(len(p) for p in profiles)
+    return np.array([list(p) + [p[-1]] * (n - len(p)) for p in profiles], dtype=float)
+
+
+def predict_df(sku_df, profiles=None, step_days=STEP_DAYS):
+    """
+    SKU 표 → 이력별 예측 유통기한 표 (행: 제품명, 열: 온도 이력 이름 + "표시 유통기한(일)").
+    sku_df 컬럼: 제품명, 보관(상온/냉장/냉동), 기준일수, pH, Brix, Aw(선택), Q10(선택), Ea(kJ/mol)(선택)
+    표시 유통기한은 SKU마다 자기 보관 조건의 기준 온도(상온 25 · 냉장 5 · 냉동 −18°C)에서의 예측값 × 안전계수
+    — 선택한 온도 이력과는 무관하다.
+    잘못된 입력은 기본값으로 계산한다: 기준일수·Q10이 비었거나 0 이하 → 365일·2.0, pH 없음 → PH_REF,
+    Ea가 0 이하 → Q10 식, Aw·Brix가 모두 없음 → AW_REF.
+    """
+    profiles = profiles or {k: PROFILES[k] for k in list(PROFILES)[:1]}
+    df = sku_df.dropna(subset=["제품명"]).reset_index(drop=True)
+    num = lambda c, d=np.nan: pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) if c in df.columns \
+        else np.full(len(df), d)
+    storage = df["보관"].map(STORAGE) if "보관" in df.columns else pd.Series([STORAGE["상온"]] * len(df))
+    storage = storage.apply(lambda v: v if isinstance(v, tuple) else STORAGE["상온"])
+    t_ref = np.array([s[0] for s in storage])
+    base, q10 = _positive(num("기준일수"), 365.0), _positive(num("Q10"), 2.0)
+    ph, aw, brix, ea = num("pH"), num("Aw"), num("Brix"), num("Ea(kJ/mol)")
+    ph = np.where(np.isfinite(ph), ph, PH_REF)
+    aw, brix = np.where(np.isfinite(aw), aw, np.nan), np.where(np.isfinite(brix), brix, np.nan)
+    ea = np.where(np.isfinite(ea) & (ea > 0), ea, np.nan)
+    days = predict(base, t_ref, _stack(list(profiles.values())), ph=ph, aw=aw, brix=brix, q10=q10, ea=ea,
+                   step_days=step_days)
+    # 보관 기준 온도에서는 속도 배수가 1이므로 예측값 = 기준일수 / pH·Aw 보정
+    own = np.minimum(base / condition_factor(ph, aw, brix), MAX_DAYS)
+    out = pd.DataFrame(days.round(0), index=df["제품명"], columns=list(profiles))
+    out["표시 유통기한(일)"] = np.floor(own * np.array([s[1] for s in storage]))
+    return out
@@ -0,0 +1,141 @@
+# llm_stub.py
+# OpenAI 호환 로컬 스텁 서버 (부하·성능 시험용, 네트워크 불필요)
+#
+#   python -m parts.llm_stub --port 8765 --delay 0.8 --chunk-delay 0.02
+#   NPD_LLM_BASE_URL=http://127.0.0.1:8765/v1 streamlit run main_app.py
+#
+# POST /v1/chat/completions : response_format=json_object → 고정 배합비(또는 패치) JSON, 그 외 → 고정 보고서 문안
+#                             stream=true면 SSE 조각 전송, stream_options.include_usage면 마지막에 사용량 조각
+# GET  /v1/models           : 모델 목록
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_FORMULA = {
+    "ingredients": [
+        {"원료명": "정제수",   "배합비(%)": 86.35, "사용 목적": "용매",   "용도": "기본",   "용법": "전체 용해", "사용주의사항": "먹는물 기준 적합"},
+        {"원료명": "설탕",     "배합비(%)": 10.00, "사용 목적": "감미",   "용도": "당도",   "용법": "선용해",    "사용주의사항": "당류 표시"},
+        {"원료명": "과즙농축액", "배합비(%)": 3.00, "사용 목적": "풍미",   "용도": "과즙감", "용법": "후첨",      "사용주의사항": "알레르기 확인"},
+        {"원료명": "구연산",   "배합비(%)": 0.25,  "사용 목적": "산미",   "용도": "pH 조정", "용법": "최종 투입", "사용주의사항": "과량 시 신맛"},
+        {"원료명": "향료",     "배합비(%)": 0.40,  "사용 목적": "향",     "용도": "플레이버", "용법": "냉각 후",  "사용주의사항": "휘발 주의"},
+    ],
+    "설계근거": "스텁 응답: 표준 음료 기본 배합입니다.",
+}
+CANNED_PATCH = {
+    "ops": [{"op": "adjust", "원료명": "설탕", "delta": -2},
+            {"op": "add", "원료명": "알룰로스", "배합비(%)": 2, "용법": "설탕과 함께 용해"}],
+    "reason": "스텁 응답: 설탕 2%를 알룰로스로 대체했습니다.",
+}
+CANNED_TEXT = (
+    "1. 시장 성장성\n스텁 응답입니다. 최근 검색 추이는 완만한 상승세입니다.\n\n"
+    "2. 경쟁 구조\n상위 브랜드 노출이 집중되어 있습니다.\n\n"
+    "3. 가격 전략\n중간 가격대 진입을 권장합니다.\n\n"
+    "4. 신규 진입 전략\n차별화된 플레이버와 저당 포지셔닝을 제안합니다.\n"
+)
+
+
+def _tokens(text):
+    return max(1, len(text) // 2)   # 한글 기준 대략치
+
+
+def _reply(body):
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        return json.dumps(CANNED_PATCH if '"ops"' in prompt else CANNED_FORMULA, ensure_ascii=False)
+    return CANNED_TEXT
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.5
+    jitter = 0.2
+    chunk_delay = 0.02
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": m, "object": "model", "owned_by": "stub"}
+                                                        for m in ("gpt-4o", "gpt-4o-mini")]})
+        else:
+            self._send_json({"error": {"message": "not found"}}, 404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": {"message": "not found"}}, 404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        content = _reply(body)
+        prompt_text = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        usage = {"prompt_tokens": _tokens(prompt_text), "completion_tokens": _tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"stub-{time.time_ns()}", "created": int(time.time()), "model": body.get("model", "stub")}
+
+        time.sleep(max(0.0, self.delay + random.uniform(-self.jitter, self.jitter)))   # 첫 토큰까지 지연
+        if not body.get("stream"):
+            self._send_json({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(obj):
+            self.wfile.write(f"data: {json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i in range(0, len(content), 8):
+            send({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "finish_reason": None, "delta": {"content": content[i:i + 8]}}]})
+            time.sleep(self.chunk_delay)
+        send({**base, "object": "chat.completion.chunk", "choices": [
+            {"index": 0, "finish_reason": "stop", "delta": {}}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve(host="127.0.0.1", port=8765, delay=0.5, jitter=0.2, chunk_delay=0.02, background=False):
+    """스텁 서버 시작 (background=True면 데몬 스레드에서 실행하고 서버 객체 반환)"""
+    handler = type("Handler", (StubHandler,), {"delay": delay, "jitter": jitter, "chunk_delay": chunk_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"LLM 스텁: http://{host}:{server.server_port}/v1 (지연 {delay}s ±{jitter}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OpenAI 호환 로컬 스텁 서버")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=0.5, help="응답(첫 토큰)까지 지연 초")
+    ap.add_argument("--jitter", type=float, default=0.2, help="지연 ± 무작위 폭 초")
+    ap.add_argument("--chunk-delay", type=float, default=0.02, help="스트리밍 조각 간격 초")
+    a = ap.parse_args()
+    serve(a.host, a.port, a.delay, a.jitter, a.chunk_delay)
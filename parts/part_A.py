@@ -1,12 +1,11 @@
 import streamlit as st
-import requests
 import json
 import urllib.parse
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import date
-from openai import OpenAI
-from parts import part_A_market, part_A_formula, part_A_risk, part_A_plan, part_A_report
+from parts import engine_costsim, engine_http, engine_ingredients, engine_llm, engine_optimize, engine_props, part_A_market, part_A_formula, part_A_risk, part_A_plan, part_A_report
 
 
 import streamlit as st
@@ -47,14 +46,7 @@ def run():
         "제로/저당음료":  355,
     }
 
-    try:
-        openai_enabled = (
-            "openai" in st.secrets
-            and bool(st.secrets["openai"].get("OPENAI_API_KEY"))
-            and OpenAI is not None
-        )
-    except Exception:
-        openai_enabled = False
+    openai_enabled = engine_llm.available(engine_llm.session_replay())
 
     def flavor_brand_selector(tab_key):
         selected_group = st.selectbox(
@@ -152,7 +144,7 @@ def run():
                 "timeUnit":  time_unit,
                 "keywordGroups": keyword_groups,
             }
-            response = requests.post(
+            response = engine_http.post(
                 "https://openapi.naver.com/v1/datalab/search",
                 headers={
                     "X-Naver-Client-Id":     st.secrets["naver_search"]["NAVER_CLIENT_ID"],
@@ -221,7 +213,7 @@ def run():
             # ────────────────────────────────
             shopping_summary = {}
             enc = urllib.parse.quote(search_keyword)
-            shop_response = requests.get(
+            shop_response = engine_http.get(
                 f"https://openapi.naver.com/v1/search/shop.json?query={enc}&display=100",
                 headers={
                     "X-Naver-Client-Id":     st.secrets["naver_shopping"]["NAVER_CLIENT_ID"],
@@ -439,18 +431,15 @@ def run():
             if openai_enabled:
                 st.markdown('<div class="section-title">🤖 AI 통합 전략 보고서</div>', unsafe_allow_html=True)
                 with st.spinner("AI 분석 중..."):
-                    client = OpenAI(api_key=st.secrets["openai"]["OPENAI_API_KEY"])
                     prompt = f"""
                     검색 키워드: {search_keyword}
                     트렌드 데이터: {trend_summary}
                     쇼핑 데이터: {shopping_summary}
                     위 내용을 기반으로 시장 성장성, 브랜드 경쟁 구조, 가격 전략, 신규 진입 전략을 종합 보고서로 작성하세요.
                     """
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[{"role": "user", "content": prompt}],
-                    )
-                st.markdown(f'<div class="ai-box">{resp.choices[0].message.content}</div>', unsafe_allow_html=True)
+                    ai_text = engine_llm.chat([{"role": "user", "content": prompt}], model=engine_llm.model_for("report"),
+                                              replay=engine_llm.session_replay())
+                st.markdown(f'<div class="ai-box">{ai_text}</div>', unsafe_allow_html=True)
             else:
                 st.info("OpenAI 키가 없어 AI 보고서는 비활성화됩니다.")
 
@@ -464,17 +453,25 @@ def run():
         part_A_risk.run()
 
     with tabs[3]:
-        part_A_plan.run()
+        plan_box = st.container()   # 생산 계획(소요량)은 아래 원료 구성표 편집 결과로 계산
 
         st.markdown('<div class="section-title">원료 구성표</div>', unsafe_allow_html=True)
 
-        ingredient_df = pd.DataFrame({
-            "원료명":      ["정제수", "설탕", "구연산", "향료", "비타민C"],
-            "규격":        ["식품용", "백설탕", "무수", "천연", "L-아스코르브산"],
-            "함량(%)":    [85.0, 8.0, 0.3, 0.2, 0.05],
-            "원가(원/kg)": [10, 800, 2000, 15000, 30000],
-            "비고":        ["기본", "감미", "산미", "향", "기능성"],
-        })
+        t1, t2, t3, t4 = st.columns(4)
+        target_brix = t1.number_input("목표 당도 (Brix)", 0.0, 70.0, 10.0, 0.5, key="target_brix")
+        target_ph   = t2.number_input("목표 pH", 2.0, 7.0, 3.2, 0.1, key="target_ph")
+        target_cost = t3.number_input("목표 원가 (원/L)", 0, 100000, 150, 10, key="target_cost")
+        unit_ml     = t4.number_input("제품 용량 (mL)", 50, 2000, 355, 5, key="target_unit_ml")
+
+        # 규격 · 원가 · 변동성은 원료 마스터에서 (편집기에서 비워 둔 칸도 마스터 값으로 채움)
+        master_cols = ["규격", "원가(원/kg)", "변동성(%)"]
+        ingredient_df = engine_ingredients.join(pd.DataFrame({
+            "원료명":      ["정제수", "설탕", "구연산", "구연산삼나트륨", "향료", "비타민C"],
+            "함량(%)":    [85.0, 8.0, 0.3, 0.1, 0.2, 0.05],
+            "최소(%)":    [0.0, 0.0, 0.0, 0.0, 0.2, 0.05],
+            "최대(%)":    [100.0, 15.0, 1.0, 0.5, 0.2, 0.05],
+            "비고":        ["기본", "감미", "산미", "완충", "향", "기능성"],
+        }), cols=master_cols)[["원료명", "규격", "함량(%)", "원가(원/kg)", "최소(%)", "최대(%)", "변동성(%)", "비고"]]
 
         edited_df = st.data_editor(
             ingredient_df,
@@ -482,19 +479,99 @@ def run():
             num_rows="dynamic",
             key="ingredient_editor"
         )
+        joined    = engine_ingredients.join(edited_df.dropna(subset=["원료명"]), cols=master_cols + ["알레르기"])
+        edited_df = joined.drop(columns=["표준원료명", "알레르기"])
+        prop_table = engine_ingredients.props_table()
 
-        total_ratio    = edited_df["함량(%)"].sum()
-        estimated_cost = (edited_df["함량(%)"] / 100 * edited_df["원가(원/kg)"]).sum() * 10
+        with plan_box:
+            part_A_plan.run(edited_df)
 
-        s1, s2, s3 = st.columns(3)
+        props = engine_props.evaluate_df(edited_df, unit_ml=unit_ml, table=prop_table,
+                                         targets={"brix": target_brix, "ph": target_ph, "cost": target_cost})
+        total_ratio    = props["total"]
+        estimated_cost = props["cost_l"]
+
+        s1, s2, s3, s4 = st.columns(4)
         s1.metric("총 함량 합계", f"{total_ratio:.2f} %",
                   delta=f"{total_ratio - 100:.2f}%" if abs(total_ratio - 100) > 0.01 else "정상")
         s2.metric("예상 원가", f"{estimated_cost:,.0f} 원/L")
-        s3.metric("목표 대비", f"{estimated_cost - target_cost:+,.0f} 원", delta_color="inverse")
+        s3.metric("목표 대비", f"{props['dev_cost']:+,.0f} 원", delta_color="inverse")
+        s4.metric("개당 원가", f"{props['cost_unit']:,.1f} 원", help=f"{unit_ml} mL 기준")
+
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("총고형분", f"{props['solids']:.2f} %")
+        p2.metric("추정 당도", f"{props['brix']:.1f} °Bx", delta=f"{props['dev_brix']:+.1f}", delta_color="off")
+        p3.metric("적정산도", f"{props['acidity']:.3f} %", help="구연산 환산 (w/v)")
+        p4.metric("근사 pH", f"{props['ph']:.2f}", delta=f"{props['dev_ph']:+.2f}", delta_color="off",
+                  help="산미료(구연산 환산)와 구연산염 완충의 전하 균형 추정값 — 과즙 등 다른 완충 성분은 빠져 있어 실측 확인 필요")
+        if props["unknown"]:
+            st.caption(f"물성 미등록 원료(0으로 계산): {', '.join(map(str, props['unknown']))}")
+        allergens = sorted({a for a in joined["알레르기"].dropna() for a in str(a).split(",") if a.strip()})
+        if allergens:
+            st.caption(f"⚠️ 알레르기 유발 원료 포함: {', '.join(allergens)}")
+
+        with st.expander("📚 원료 마스터"):
+            q = st.text_input("원료 검색 (원료명·별칭 앞글자)", key="master_query", placeholder="예: 구연, 비타민, sugar")
+            names = engine_ingredients.complete(q, limit=20) if q.strip() else None
+            master_df = engine_ingredients.frame(names)
+            edited_master = st.data_editor(master_df, use_container_width=True, hide_index=True,
+                                           num_rows="dynamic", key=f"master_editor_{q}")
+            if st.button("💾 마스터 저장", key="master_save"):
+                n = engine_ingredients.upsert(edited_master)
+                st.success(f"{n}개 원료를 저장했습니다.")
+
+        with st.expander("🎲 원가 변동 리스크 (몬테카를로)"):
+            corr = st.slider("원료 간 가격 상관", 0.0, 0.9, 0.3, 0.05, key="mc_corr",
+                             help="원료 가격이 함께 오르내리는 정도 (공통 시장 요인)")
+            mc = engine_costsim.simulate_df(edited_df, corr=corr, target=target_cost, table=prop_table)
+            r1, r2, r3, r4 = st.columns(4)
+            r1.metric("원가 P5",  f"{mc['pct'][5]:,.0f} 원/L")
+            r2.metric("원가 P50", f"{mc['pct'][50]:,.0f} 원/L")
+            r3.metric("원가 P95", f"{mc['pct'][95]:,.0f} 원/L")
+            r4.metric("목표 원가 초과 확률", f"{mc['p_exceed'] * 100:.1f} %")
+            fig = go.Figure(go.Histogram(x=mc["draws"], nbinsx=60, marker_color="#4A7BD0"))
+            fig.add_vline(x=target_cost, line_dash="dash", line_color="#D9534F", annotation_text="목표 원가")
+            fig.update_layout(height=260, margin=dict(l=10, r=10, t=10, b=10), xaxis_title="원/L", showlegend=False)
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"원료별 '변동성(%)'(가격 변동계수)을 로그정규 분포로 {engine_costsim.N_DRAWS:,}회 표본 추출")
+
+        o1, o2 = st.columns([1, 2])
+        closeness = o2.slider("현재 배합 유지 정도", 0.0, 1.0, 0.0, 0.05, key="opt_closeness",
+                              help="0이면 순수 최소원가, 클수록 현재 배합에서 덜 벗어난 해 (배합비 편차 합에 벌점)")
+        if o1.button("📐 최소원가 배합 계산", key="formula_opt"):
+            opt_df, opt, status = engine_optimize.optimize_df(
+                edited_df, {"brix": target_brix, "ph": target_ph}, closeness=closeness, unit_ml=unit_ml,
+                table=prop_table)
+            if status == "infeasible":
+                st.warning("원료별 최소/최대 범위로는 목표 당도·pH를 맞출 수 없습니다 (산미료는 현재 함량 이상 유지). "
+                           "범위나 목표를 조정하거나 구연산삼나트륨 같은 완충염을 추가하세요.")
+            else:
+                if status != "optimal":
+                    st.caption("⚠️ 반복 한도 안에 완전히 수렴하지 않은 근사해입니다.")
+                st.dataframe(opt_df, use_container_width=True, hide_index=True)
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("최적 원가", f"{opt['cost_l']:,.0f} 원/L", delta=f"{opt['cost_l'] - estimated_cost:+,.0f}",
+                          delta_color="inverse")
+                m2.metric("목표 원가 대비", f"{opt['cost_l'] - target_cost:+,.0f} 원",
+                          delta="충족" if opt["cost_l"] <= target_cost else "초과",
+                          delta_color="normal" if opt["cost_l"] <= target_cost else "inverse")
+                m3.metric("추정 당도", f"{opt['brix']:.1f} °Bx")
+                m4.metric("근사 pH", f"{opt['ph']:.2f}")
+
+        with st.expander("📊 목표 시나리오 일괄 계산"):
+            g1, g2 = st.columns(2)
+            brix_rng = g1.slider("Brix 범위", 0.0, 30.0, (max(0.0, target_brix - 2), target_brix + 2), 0.5,
+                                 key="grid_brix")
+            ph_rng = g2.slider("pH 범위", 2.0, 5.0, (max(2.0, target_ph - 0.3), min(5.0, target_ph + 0.3)), 0.05,
+                               key="grid_ph")
+            if st.button("시나리오 계산", key="grid_run"):
+                grid = engine_optimize.scenario_grid(edited_df, np.linspace(*brix_rng, 9), np.linspace(*ph_rng, 7),
+                                                     table=prop_table)
+                st.caption("목표 Brix × pH별 L당 최소원가 (—: 원료 범위로 맞출 수 없음 · 산미료는 현재 함량 이상 유지)")
+                st.dataframe(grid.style.format("{:,.0f}", na_rep="—"), use_container_width=True)
 
         if st.button("🧬 배합비 AI 최적화 제안", key="formula_ai"):
             if openai_enabled:
-                client = OpenAI(api_key=st.secrets["openai"]["OPENAI_API_KEY"])
                 with st.spinner("AI 배합비 분석 중..."):
                     prompt = f"""
                     제품명: {product_name1}, 계열: {selected_group1}
@@ -503,11 +580,9 @@ def run():
                     현재 원료구성: {edited_df.to_dict()}
                     원가 절감, 관능 개선, 규격 충족 측면에서 개선 방향을 제안하세요.
                     """
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[{"role": "user", "content": prompt}],
-                    )
-                st.markdown(f'<div class="ai-box">{resp.choices[0].message.content}</div>', unsafe_allow_html=True)
+                    ai_text = engine_llm.chat([{"role": "user", "content": prompt}], model=engine_llm.model_for("report"),
+                                              replay=engine_llm.session_replay())
+                st.markdown(f'<div class="ai-box">{ai_text}</div>', unsafe_allow_html=True)
             else:
                 st.info("OpenAI 키가 없어 AI 제안은 비활성화됩니다.")
 
@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
-from engine_data import FOOD_CODE_MAP, get_recommended_flavors
-from engine_ai import generate_food_formula, update_formula_with_chat
 from io import BytesIO
 
+# 다른 화면(part_B·part_A_report)과 같은 모듈 인스턴스를 써야 작업 풀 · LLM 캐시/통계 · 재생 모드가 공유된다
+try:
+    from parts.engine_data import FOOD_CODE_MAP, get_recommended_flavors
+    from parts.engine_ai import generate_food_formula, update_formula_with_chat
+    from parts.engine_formula import summarize
+    from parts import engine_jobs, engine_ingredients, engine_llm
+except ImportError:
+    from engine_data import FOOD_CODE_MAP, get_recommended_flavors
+    from engine_ai import generate_food_formula, update_formula_with_chat
+    from engine_formula import summarize
+    import engine_jobs
+    import engine_ingredients
+    import engine_llm
+
 st.set_page_config(page_title="식품 R&D 정밀 설계 시스템", layout="wide")
 
 st.title("🧪 정밀 식품 배합비 설계 시스템")
@@ -46,29 +58,57 @@ if st.button("🚀 정밀 배합비 생성 및 분석"):
             "concept": concept
         }
         
-        with st.spinner('식품공전 및 시장 트렌드 분석 중...'):
-            df, reasoning = generate_food_formula(input_data)
-            
-            if not df.empty:
-                st.session_state.current_df = df
-                st.session_state.reasoning = reasoning
-                st.session_state.chat_history = []  # 새로운 배합 생성 시 채팅 이력 초기화
-                st.rerun()  # 화면을 갱신하여 결과 표시
-            else:
-                st.error("데이터 생성 실패. 다시 시도해주세요.")
+        # 같은 조건으로 다시 누르면 "다시 생성" — 캐시된 배합 대신 새로 받아 캐시를 갱신
+        refresh = st.session_state.get("formula_input") == input_data and st.session_state.current_df is not None
+        st.session_state.formula_input = input_data
+        # 백그라운드 작업으로 생성 → 생성 중에도 화면 조작 가능, 재실행돼도 결과 유지
+        engine_jobs.start("formula_gen", "배합비 생성",
+                          lambda job, info, refresh, replay, key: generate_food_formula(info, refresh, replay, key),
+                          input_data, refresh, engine_llm.session_replay(), engine_llm.api_key(),
+                          label=f"{flavor_name} {sub_category} 배합비" + (" 다시 생성" if refresh else ""))
     else:
         st.warning("플레이버 명을 입력해주세요.")
 
+job = engine_jobs.collect("formula_gen")
+if job is not None and job.status == "cancelled":
+    st.info("배합비 생성을 중지했습니다.")
+elif job is not None:
+    df, reasoning = job.result if job.status == "done" else (None, job.error or "알 수 없는 오류")
+    if df is not None and not df.empty:
+        st.session_state.current_df = df
+        st.session_state.reasoning = reasoning
+        st.session_state.chat_history = []  # 새로운 배합 생성 시 채팅 이력 초기화
+    else:
+        st.error(f"데이터 생성 실패. 다시 시도해주세요. ({reasoning})")
+engine_jobs.watch("formula_gen")
+
 # --- 결과 및 챗봇 섹션 ---
 if st.session_state.current_df is not None:
     st.divider()
     
     # 전문가 설계 근거 출력
     st.info(f"💡 **전문가 설계 근거:** {st.session_state.reasoning}")
+
+    # 응답 자동 보정 내역 (배합비 합계 재정규화 · 제외된 행 등)
+    repair_note = summarize(st.session_state.current_df.attrs.get("issues", []))
+    if repair_note:
+        st.caption(f"🛠 자동 보정: {repair_note}")
     
     # 배합비 표 출력
     st.subheader(f"📊 {flavor_name} {sub_category} 표준 배합비")
     st.table(st.session_state.current_df)
+
+    # 원료 마스터 결합 (모델이 쓴 원료명은 별칭·부분 일치로 해석) → 원료비 · 알레르기
+    joined = engine_ingredients.join(st.session_state.current_df, cols=["원가(원/kg)", "알레르기"])
+    ratio = pd.to_numeric(joined["배합비(%)"], errors="coerce").fillna(0.0)
+    allergens = sorted({a.strip() for v in joined["알레르기"].dropna() for a in str(v).split(",") if a.strip()})
+    m1, m2 = st.columns(2)
+    m1.metric("원료비 추정", f"{(ratio / 100 * joined['원가(원/kg)'].fillna(0)).sum():,.0f} 원/kg",
+              help="원료 마스터 단가 기준 (미등록 원료 제외)")
+    m2.metric("알레르기 유발 원료", ", ".join(allergens) or "없음")
+    missing = joined.loc[joined["표준원료명"].isna(), "원료명"].tolist()
+    if missing:
+        st.caption(f"원료 마스터 미등록: {', '.join(missing)}")
     
     # 엑셀 다운로드 기능
     output = BytesIO()
@@ -102,7 +142,9 @@ if st.session_state.current_df is not None:
             
         with st.chat_message("assistant"):
             with st.spinner("전문가적 소견으로 배합비를 수정 중입니다..."):
-                updated_df, reason = update_formula_with_chat(st.session_state.current_df, user_input)
+                updated_df, reason = update_formula_with_chat(st.session_state.current_df, user_input,
+                                                              replay=engine_llm.session_replay(),
+                                                              api_key=engine_llm.api_key())
                 
                 # 데이터 갱신
                 st.session_state.current_df = updated_df
@@ -1,16 +1,10 @@
 import streamlit as st
-import requests
 import json
-import urllib.parse
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import date
 import re
-
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+from parts import engine_cache, engine_http, engine_llm, engine_naver
 
 # ── 공통 DB ──
 BEVERAGE_STRUCTURE = {
@@ -44,6 +38,12 @@ STANDARD_VOLUME = {
     "제로/저당음료": 355,
 }
 
+# (계열, 브랜드, 플레이버, 시작일, 종료일, 단위) → analyze_market 결과 — 사용자 간 공유, 6시간 · 최근 64건
+MARKET_CACHE = engine_cache.TTLCache(maxsize=64, ttl=6 * 3600)
+# 보고서 프롬프트 → 완성된 AI 보고서 문자열. 캐시된 결과 dict는 여러 세션이 함께 읽으므로 고치지 않고 따로 보관한다
+REPORT_CACHE = engine_cache.TTLCache(maxsize=64, ttl=6 * 3600)
+PROMPT_DIGEST_TOKENS = 400   # AI 보고서 프롬프트에 넣는 시장 요약의 토큰 상한
+
 DATALAB_KEYWORDS = {
     "건강기능성음료": ["에너지음료", "비타민음료", "단백질음료", "기능성음료"],
     "탄산음료":       ["콜라", "사이다", "이온음료", "과즙탄산음료"],
@@ -79,6 +79,49 @@ def flavor_brand_selector():
     return selected_group, final_flavor, final_brand
 
 
+def portfolio_groups():
+    """계열 키워드 그룹(DATALAB_KEYWORDS) + 전 계열 플레이버·브랜드 단일 그룹 (그룹명 중복 제거)"""
+    groups = {cat: {"groupName": cat, "keywords": kws} for cat, kws in DATALAB_KEYWORDS.items()}
+    for d in BEVERAGE_STRUCTURE.values():
+        for name in d["플레이버"] + d["브랜드"]:
+            groups.setdefault(name, {"groupName": name, "keywords": [name]})
+    return list(groups.values())
+
+
+def portfolio_section(start_date, end_date, time_unit):
+    """전체 포트폴리오 트렌드 매트릭스 (데이터랩 배치 호출 · 공통 기준어 환산)"""
+    with st.expander("🗺 전체 포트폴리오 트렌드 매트릭스 (모든 계열·플레이버·브랜드)"):
+        groups = portfolio_groups()
+        st.caption(f"키워드 그룹 {len(groups)}개 → 호출당 최대 {engine_naver.DATALAB_MAX_GROUPS}그룹, "
+                   f"기준어 '{engine_naver.DATALAB_ANCHOR['groupName']}'로 호출 간 비율을 맞춥니다.")
+        if st.button("🗺 매트릭스 생성", key="mkt_matrix_run"):
+            with st.spinner("데이터랩 배치 호출 중..."):
+                matrix, failed = engine_naver.datalab_trend_matrix(
+                    groups, start_date, end_date, time_unit,
+                    st.secrets["naver_search"]["NAVER_CLIENT_ID"],
+                    st.secrets["naver_search"]["NAVER_CLIENT_SECRET"],
+                )
+            st.session_state["mkt_matrix"] = matrix
+            if failed:
+                st.warning(f"⚠️ 수집 실패 그룹: {', '.join(failed)}")
+
+        matrix = st.session_state.get("mkt_matrix")
+        if matrix is not None and not matrix.empty:
+            fig = go.Figure(go.Heatmap(
+                z=matrix.T.values, x=matrix.index, y=matrix.columns,
+                colorscale=[[0, "#0B1629"], [0.5, "#00C8D4"], [1, "#B08FFF"]],
+            ))
+            fig.update_layout(
+                paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
+                font=dict(color="#7A9CC0"), height=max(300, 18 * len(matrix.columns)),
+                margin=dict(t=30, b=30),
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(matrix, use_container_width=True, height=220)
+            st.download_button("📥 매트릭스 CSV", matrix.to_csv().encode("utf-8-sig"),
+                               file_name="trend_matrix.csv", mime="text/csv", key="mkt_matrix_dl")
+
+
 def run():
     st.markdown("""
     <style>
@@ -112,14 +155,7 @@ def run():
         st.error("네이버 API secrets가 설정되지 않았습니다.")
         return
 
-    try:
-        openai_enabled = (
-            "openai" in st.secrets
-            and bool(st.secrets["openai"].get("OPENAI_API_KEY"))
-            and OpenAI is not None
-        )
-    except Exception:
-        openai_enabled = False
+    openai_enabled = engine_llm.available(engine_llm.session_replay())
 
     selected_group, final_flavor, final_brand = flavor_brand_selector()
 
@@ -131,254 +167,309 @@ def run():
     with col_e:
         time_unit = st.selectbox("📅 분석 단위", ["month", "week", "date"])
 
+    portfolio_section(start_date, end_date, time_unit)
+
     if st.button("📊 분석 실행", key="mkt_run"):
-        search_parts = [p for p in [final_brand, final_flavor] if p]
-        if not search_parts:
+        if not (final_brand or final_flavor):
             st.warning("⚠️ 플레이버 또는 브랜드 중 하나 이상 선택하거나 입력하세요.")
             return
-        search_keyword = " ".join(search_parts)
-
-        # ── DataLab 트렌드 ──
-        keyword_groups = []
-        if final_brand:
-            keyword_groups.append({"groupName": final_brand, "keywords": [final_brand]})
-        if final_flavor:
-            keyword_groups.append({"groupName": final_flavor, "keywords": [final_flavor]})
-        cat_kw = DATALAB_KEYWORDS.get(selected_group, [])
-        if cat_kw:
-            keyword_groups.append({"groupName": selected_group, "keywords": cat_kw})
-
-        body = {
-            "startDate": start_date.strftime("%Y-%m-%d"),
-            "endDate":   end_date.strftime("%Y-%m-%d"),
-            "timeUnit":  time_unit,
-            "keywordGroups": keyword_groups,
-        }
-        response = requests.post(
-            "https://openapi.naver.com/v1/datalab/search",
-            headers={
-                "X-Naver-Client-Id":     st.secrets["naver_search"]["NAVER_CLIENT_ID"],
-                "X-Naver-Client-Secret": st.secrets["naver_search"]["NAVER_CLIENT_SECRET"],
-                "Content-Type": "application/json",
-            },
-            data=json.dumps(body),
+        # 같은 조건이면 캐시된 결과 재사용 (API 호출·AI 토큰 소모 없음)
+        key = (selected_group, final_brand, final_flavor, str(start_date), str(end_date), time_unit)
+        # 다른 사용자가 같은 조건을 수집 중이면 그 결과를 기다려 공유 (single-flight)
+        with st.spinner("시장 데이터 수집 중..."):
+            result, computed = MARKET_CACHE.get_or_compute(
+                key,
+                lambda: analyze_market(selected_group, final_brand, final_flavor, start_date, end_date, time_unit),
+                should_store=lambda r: not r["errors"],   # 일부 수집 실패 결과는 캐시하지 않음
+            )
+        if not computed:
+            st.caption("⚡ 같은 조건의 최근 분석 결과를 재사용했습니다.")
+        st.session_state["mkt_key"] = key
+        st.session_state["mkt_result"] = result
+
+    # 마지막 분석 결과는 세션에 보관 → 위젯을 바꿔도 사라지지 않음
+    result = st.session_state.get("mkt_result")
+    if result is not None:
+        key = (selected_group, final_brand, final_flavor, str(start_date), str(end_date), time_unit)
+        if st.session_state.get("mkt_key") != key:
+            g, b, f, sd, ed, tu = st.session_state["mkt_key"]
+            st.caption(f"ℹ️ 이전 분석 결과 표시 중 — {g} · {' '.join(p for p in [b, f] if p)} · {sd}~{ed} · {tu}")
+        render_market(result, openai_enabled)
+
+
+def analyze_market(selected_group, final_brand, final_flavor, start_date, end_date, time_unit):
+    """
+    트렌드 · 쇼핑 수집 + AI 보고서 프롬프트 구성 → {"keyword", "trend", "shop", "prompt", "errors"}
+    MARKET_CACHE에 들어가 세션 간에 공유되는 값이라 만든 뒤에는 읽기만 한다 (보고서 본문은 REPORT_CACHE).
+    """
+    search_keyword = " ".join(p for p in [final_brand, final_flavor] if p)
+    errors = []
+
+    # ── DataLab 트렌드 ──
+    keyword_groups = []
+    if final_brand:
+        keyword_groups.append({"groupName": final_brand, "keywords": [final_brand]})
+    if final_flavor:
+        keyword_groups.append({"groupName": final_flavor, "keywords": [final_flavor]})
+    cat_kw = DATALAB_KEYWORDS.get(selected_group, [])
+    if cat_kw:
+        keyword_groups.append({"groupName": selected_group, "keywords": cat_kw})
+
+    body = {
+        "startDate": start_date.strftime("%Y-%m-%d"),
+        "endDate":   end_date.strftime("%Y-%m-%d"),
+        "timeUnit":  time_unit,
+        "keywordGroups": keyword_groups,
+    }
+    response = engine_http.post(
+        "https://openapi.naver.com/v1/datalab/search",
+        headers={
+            "X-Naver-Client-Id":     st.secrets["naver_search"]["NAVER_CLIENT_ID"],
+            "X-Naver-Client-Secret": st.secrets["naver_search"]["NAVER_CLIENT_SECRET"],
+            "Content-Type": "application/json",
+        },
+        data=json.dumps(body),
+    )
+
+    frames = []
+    if response.status_code == 200:
+        for res in response.json().get("results", []):
+            df_t = pd.DataFrame(res["data"])
+            if not df_t.empty:
+                df_t["period"] = pd.to_datetime(df_t["period"])
+                df_t["group"] = res["title"]
+                frames.append(df_t)
+    else:
+        errors.append(f"DataLab 오류: {response.status_code}")
+    trend_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["period", "ratio", "group"])
+
+    # ── 쇼핑 (start 오프셋 병렬 수집 · productId 중복 제거, 최대 1,000건) ──
+    try:
+        df_shop, shop_failed = engine_naver.collect_shopping(
+            [search_keyword],
+            st.secrets["naver_shopping"]["NAVER_CLIENT_ID"],
+            st.secrets["naver_shopping"]["NAVER_CLIENT_SECRET"],
+            max_items=1000,
         )
-
-        trend_summary = {}
-        if response.status_code == 200:
-            result = response.json()
-            if "results" in result:
-                st.markdown('<div class="section-title">📉 검색 트렌드</div>', unsafe_allow_html=True)
-                colors = ["#00C8D4", "#B08FFF", "#FFB347", "#34d399", "#f472b6"]
-                fig = go.Figure()
-                for i, res in enumerate(result["results"]):
-                    group_name = res["title"]
-                    df_t = pd.DataFrame(res["data"])
-                    df_t["period"] = pd.to_datetime(df_t["period"])
-                    trend_summary[group_name] = df_t["ratio"].tolist()[-3:]
-                    color = colors[i % len(colors)]
-                    fig.add_trace(go.Scatter(
-                        x=df_t["period"], y=df_t["ratio"],
-                        mode="lines", name=group_name,
-                        line=dict(color=color, width=2),
-                    ))
-                    fig.add_trace(go.Scatter(
-                        x=df_t["period"], y=df_t["ratio"],
-                        mode="markers+text", name=f"{group_name} 값",
-                        marker=dict(color=color, size=8, symbol="circle",
-                                    line=dict(color="white", width=1.5)),
-                        text=[f"{v:.1f}" for v in df_t["ratio"]],
-                        textposition="top center",
-                        textfont=dict(size=9, color=color),
-                        showlegend=False,
-                    ))
-                fig.update_layout(
-                    paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
-                    font=dict(color="#7A9CC0"),
-                    title=dict(text=f"🔍 '{search_keyword}' 및 계열 트렌드",
-                               font=dict(color="#E8F0FE", size=14)),
-                    hovermode="x unified",
-                    legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A",
-                                font=dict(color="#E8F0FE")),
-                    xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
-                    yaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
-                    margin=dict(t=50, b=30),
-                )
-                st.plotly_chart(fig, use_container_width=True)
-
-        # ── 쇼핑 분석 ──
-        shopping_summary = {}
-        enc = urllib.parse.quote(search_keyword)
-        shop_response = requests.get(
-            f"https://openapi.naver.com/v1/search/shop.json?query={enc}&display=100",
-            headers={
-                "X-Naver-Client-Id":     st.secrets["naver_shopping"]["NAVER_CLIENT_ID"],
-                "X-Naver-Client-Secret": st.secrets["naver_shopping"]["NAVER_CLIENT_SECRET"],
-            },
+        if shop_failed:
+            # 일부 페이지 누락 → 통계가 부분 표본 기준임을 알리고 캐시하지 않음
+            errors.append(f"쇼핑 {len(shop_failed)}개 페이지 수집 실패 — {len(df_shop):,}건 부분 표본 기준 통계입니다.")
+    except RuntimeError as e:
+        errors.append(f"쇼핑 {e}")
+        df_shop = pd.DataFrame()
+
+    # ── AI 보고서 프롬프트 (수집량과 무관한 고정 크기 요약) ──
+    digest = engine_naver.market_digest(trend_df, df_shop, max_tokens=PROMPT_DIGEST_TOKENS,
+                                        time_unit=time_unit)
+    prompt = f"""
+        검색 키워드: {search_keyword}
+        {digest}
+        시장 성장성, 브랜드 경쟁 구조, 가격 전략, 신규 진입 전략을 종합 보고서로 작성하세요.
+        """
+
+    return {"keyword": search_keyword, "trend": trend_df, "shop": df_shop,
+            "prompt": prompt, "errors": errors}
+
+
+def render_market(result, openai_enabled):
+    """
+    analyze_market 결과 출력 (트렌드 차트 · 쇼핑 현황 · AI 보고서).
+    보고서는 REPORT_CACHE[프롬프트]에 있으면 그대로, 없으면 스트리밍으로 만든 뒤 저장한다 (결과 dict는 고치지 않음).
+    같은 프롬프트를 여러 세션이 동시에 요청하면 chat_stream의 single-flight로 호출은 1번만 나간다.
+    """
+    search_keyword, trend_df, df_shop = result["keyword"], result["trend"], result["shop"]
+    for err in result["errors"]:
+        st.error(err)
+
+    if not trend_df.empty:
+        st.markdown('<div class="section-title">📉 검색 트렌드</div>', unsafe_allow_html=True)
+        colors = ["#00C8D4", "#B08FFF", "#FFB347", "#34d399", "#f472b6"]
+        fig = go.Figure()
+        for i, (group_name, df_t) in enumerate(trend_df.groupby("group", sort=False)):
+            color = colors[i % len(colors)]
+            fig.add_trace(go.Scatter(
+                x=df_t["period"], y=df_t["ratio"],
+                mode="lines", name=group_name,
+                line=dict(color=color, width=2),
+            ))
+            fig.add_trace(go.Scatter(
+                x=df_t["period"], y=df_t["ratio"],
+                mode="markers+text", name=f"{group_name} 값",
+                marker=dict(color=color, size=8, symbol="circle",
+                            line=dict(color="white", width=1.5)),
+                text=[f"{v:.1f}" for v in df_t["ratio"]],
+                textposition="top center",
+                textfont=dict(size=9, color=color),
+                showlegend=False,
+            ))
+        fig.update_layout(
+            paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
+            font=dict(color="#7A9CC0"),
+            title=dict(text=f"🔍 '{search_keyword}' 및 계열 트렌드",
+                       font=dict(color="#E8F0FE", size=14)),
+            hovermode="x unified",
+            legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A",
+                        font=dict(color="#E8F0FE")),
+            xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
+            yaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
+            margin=dict(t=50, b=30),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    items = df_shop.to_dict("records")
+    if items:
+        st.markdown(f'<div class="section-title">🛍 쇼핑 현황 — "{search_keyword}"</div>',
+                    unsafe_allow_html=True)
+
+        avg_price    = df_shop["lprice"].mean()
+        min_price    = df_shop["lprice"].min()
+        per_unit_est = df_shop["lprice"].median() / 6
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("평균 가격",        f"{avg_price:,.0f} 원")
+        m2.metric("최저 가격",        f"{min_price:,.0f} 원")
+        m3.metric("개당 가격 (예측)", f"≈ {per_unit_est:,.0f} 원")
+        m4.metric("상품 수",          f"{len(df_shop):,} 개")
+
+        # 이미지 카드
+        st.markdown('<div class="section-title">🖼 상품 목록 (이미지·링크)</div>', unsafe_allow_html=True)
+        image_items = [it for it in items if it.get("image")][:12]
+        if image_items:
+            cols_per_row = 4
+            for row_start in range(0, len(image_items), cols_per_row):
+                row_items = image_items[row_start:row_start + cols_per_row]
+                img_cols = st.columns(cols_per_row)
+                for col, it in zip(img_cols, row_items):
+                    title_clean = strip_html(it.get("title", ""))
+                    price_val   = pd.to_numeric(it.get("lprice"), errors="coerce")
+                    link_url    = it.get("link", "#")
+                    img_url     = it.get("image", "")
+                    with col:
+                        st.markdown(f"""
+                        <div class="product-card">
+                            <img src="{img_url}" onerror="this.style.display='none'" />
+                            <div class="prod-title">{title_clean}</div>
+                            <div class="prod-price">{f"{int(price_val):,} 원" if pd.notna(price_val) else "-"}</div>
+                            <a href="{link_url}" target="_blank">🔗 구매 링크</a>
+                        </div>
+                        """, unsafe_allow_html=True)
+
+        # 전체 테이블
+        st.markdown('<div class="section-title">📋 전체 상품 테이블</div>', unsafe_allow_html=True)
+        df_display = df_shop.copy()
+        df_display["상품명"] = df_display["title"].apply(strip_html)
+        st.dataframe(
+            df_display[["상품명", "lprice", "brand", "mallName"]].rename(columns={
+                "lprice": "최저가", "brand": "브랜드", "mallName": "쇼핑몰"
+            }),
+            use_container_width=True, height=220
         )
 
-        if shop_response.status_code == 200:
-            items = shop_response.json().get("items", [])
-            if items:
-                df_shop = pd.DataFrame(items)
-                df_shop["lprice"] = pd.to_numeric(df_shop["lprice"], errors="coerce")
-
-                st.markdown(f'<div class="section-title">🛍 쇼핑 현황 — "{search_keyword}"</div>',
-                            unsafe_allow_html=True)
-
-                avg_price    = df_shop["lprice"].mean()
-                min_price    = df_shop["lprice"].min()
-                per_unit_est = df_shop["lprice"].median() / 6
-
-                m1, m2, m3, m4 = st.columns(4)
-                m1.metric("평균 가격",        f"{avg_price:,.0f} 원")
-                m2.metric("최저 가격",        f"{min_price:,.0f} 원")
-                m3.metric("개당 가격 (예측)", f"≈ {per_unit_est:,.0f} 원")
-                m4.metric("상품 수",          f"{len(df_shop):,} 개")
-
-                # 이미지 카드
-                st.markdown('<div class="section-title">🖼 상품 목록 (이미지·링크)</div>', unsafe_allow_html=True)
-                image_items = [it for it in items if it.get("image")][:12]
-                if image_items:
-                    cols_per_row = 4
-                    for row_start in range(0, len(image_items), cols_per_row):
-                        row_items = image_items[row_start:row_start + cols_per_row]
-                        img_cols = st.columns(cols_per_row)
-                        for col, it in zip(img_cols, row_items):
-                            title_clean = strip_html(it.get("title", ""))
-                            price_val   = it.get("lprice", "0")
-                            link_url    = it.get("link", "#")
-                            img_url     = it.get("image", "")
-                            with col:
-                                st.markdown(f"""
-                                <div class="product-card">
-                                    <img src="{img_url}" onerror="this.style.display='none'" />
-                                    <div class="prod-title">{title_clean}</div>
-                                    <div class="prod-price">{int(price_val):,} 원</div>
-                                    <a href="{link_url}" target="_blank">🔗 구매 링크</a>
-                                </div>
-                                """, unsafe_allow_html=True)
-
-                # 전체 테이블
-                st.markdown('<div class="section-title">📋 전체 상품 테이블</div>', unsafe_allow_html=True)
-                df_display = df_shop.copy()
-                df_display["상품명"] = df_display["title"].apply(strip_html)
-                st.dataframe(
-                    df_display[["상품명", "lprice", "brand", "mallName"]].rename(columns={
-                        "lprice": "최저가", "brand": "브랜드", "mallName": "쇼핑몰"
-                    }),
-                    use_container_width=True, height=220
-                )
-
-                # 브랜드 노출순위 + 평균가 겹치기
-                st.markdown('<div class="section-title">🏆 브랜드 노출순위 + 평균가</div>', unsafe_allow_html=True)
-                brand_rank = df_shop["brand"].value_counts().reset_index()
-                brand_rank.columns = ["브랜드", "노출건수"]
-                brand_avg = df_shop.groupby("brand")["lprice"].agg(["mean", "std"]).reset_index()
-                brand_avg.columns = ["브랜드", "평균가", "표준편차"]
-                brand_avg["표준편차"] = brand_avg["표준편차"].fillna(0)
-                brand_merged = brand_rank.merge(brand_avg, on="브랜드", how="left")
-
-                fig_brand = go.Figure()
-                fig_brand.add_trace(go.Bar(
-                    x=brand_merged["브랜드"], y=brand_merged["노출건수"],
-                    name="노출건수", marker_color="#00C8D4", opacity=0.85, yaxis="y1",
-                ))
-                fig_brand.add_trace(go.Scatter(
-                    x=brand_merged["브랜드"], y=brand_merged["평균가"],
-                    mode="lines+markers+text", name="브랜드 평균가",
-                    line=dict(color="#B08FFF", width=2),
-                    marker=dict(size=8, color="#B08FFF", line=dict(color="white", width=1.5)),
-                    text=[f"{v:,.0f}원" for v in brand_merged["평균가"]],
-                    textposition="top center", textfont=dict(size=9, color="#B08FFF"),
-                    error_y=dict(type="data", array=brand_merged["표준편차"].tolist(),
-                                 visible=True, color="#B08FFF", thickness=1.5, width=4),
-                    yaxis="y2",
-                ))
-                fig_brand.update_layout(
-                    paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
-                    font=dict(color="#7A9CC0"),
-                    title=dict(text="브랜드 노출건수 + 평균가(표준편차)",
-                               font=dict(color="#E8F0FE", size=13)),
-                    hovermode="x unified",
-                    legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A", font=dict(color="#E8F0FE")),
-                    xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
-                    yaxis=dict(title="노출건수", gridcolor="#1A2E4A", color="#00C8D4"),
-                    yaxis2=dict(title="평균 가격 (원)", overlaying="y", side="right",
-                                color="#B08FFF", showgrid=False),
-                    margin=dict(t=50, b=30),
-                )
-                st.plotly_chart(fig_brand, use_container_width=True)
-
-                # 브랜드 평균가 + 개당 예측가
-                st.markdown('<div class="section-title">💰 브랜드 평균 가격 (개당 예측 포함)</div>',
-                            unsafe_allow_html=True)
-                brand_price = df_shop.groupby("brand")["lprice"].agg(["mean", "std", "count"]).reset_index()
-                brand_price.columns = ["브랜드", "평균가", "표준편차", "상품수"]
-                brand_price["표준편차"]   = brand_price["표준편차"].fillna(0)
-                brand_price["개당예측가"] = brand_price["평균가"] / 6
-                brand_price = brand_price.sort_values("평균가", ascending=False)
-
-                fig_price = go.Figure()
-                fig_price.add_trace(go.Bar(
-                    x=brand_price["브랜드"], y=brand_price["평균가"],
-                    name="묶음 평균가", marker_color="#00C8D4", opacity=0.8,
-                    error_y=dict(type="data", array=brand_price["표준편차"].tolist(),
-                                 visible=True, color="#00F0FF", thickness=2, width=6),
-                    text=[f"{v:,.0f}원" for v in brand_price["평균가"]],
-                    textposition="outside", textfont=dict(size=9, color="#00C8D4"),
-                ))
-                fig_price.add_trace(go.Scatter(
-                    x=brand_price["브랜드"], y=brand_price["개당예측가"],
-                    mode="lines+markers+text", name="개당 예측가 (÷6)",
-                    line=dict(color="#FFB347", width=2, dash="dot"),
-                    marker=dict(size=8, color="#FFB347", line=dict(color="white", width=1.5)),
-                    text=[f"≈{v:,.0f}원" for v in brand_price["개당예측가"]],
-                    textposition="bottom center", textfont=dict(size=9, color="#FFB347"),
-                ))
-                fig_price.update_layout(
-                    paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
-                    font=dict(color="#7A9CC0"),
-                    title=dict(text="브랜드 평균가(막대) + 개당 예측가(선, ÷6 기준)",
-                               font=dict(color="#E8F0FE", size=13)),
-                    hovermode="x unified",
-                    legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A", font=dict(color="#E8F0FE")),
-                    xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
-                    yaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
-                    margin=dict(t=60, b=30),
-                )
-                st.plotly_chart(fig_price, use_container_width=True)
-
-                bp = brand_price.copy()
-                bp["평균가"]    = bp["평균가"].apply(lambda x: f"{x:,.0f} 원")
-                bp["개당예측가"] = bp["개당예측가"].apply(lambda x: f"≈ {x:,.0f} 원")
-                bp["표준편차"]  = bp["표준편차"].apply(lambda x: f"±{x:,.0f}")
-                st.dataframe(bp[["브랜드", "평균가", "개당예측가", "표준편차", "상품수"]],
-                             use_container_width=True)
-
-                shopping_summary = {
-                    "평균가격": float(df_shop["lprice"].mean()),
-                    "브랜드순위": brand_rank.to_dict(),
-                }
-            else:
-                st.info("쇼핑 검색 결과가 없습니다.")
-
-        # ── AI 보고서 ──
-        if openai_enabled:
-            st.markdown('<div class="section-title">🤖 AI 통합 전략 보고서</div>', unsafe_allow_html=True)
-            with st.spinner("AI 분석 중..."):
-                client = OpenAI(api_key=st.secrets["openai"]["OPENAI_API_KEY"])
-                prompt = f"""
-                검색 키워드: {search_keyword}
-                트렌드 데이터: {trend_summary}
-                쇼핑 데이터: {shopping_summary}
-                시장 성장성, 브랜드 경쟁 구조, 가격 전략, 신규 진입 전략을 종합 보고서로 작성하세요.
-                """
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                )
-            st.markdown(f'<div class="ai-box">{resp.choices[0].message.content}</div>',
-                        unsafe_allow_html=True)
-        else:
-            st.info("OpenAI 키가 없어 AI 보고서는 비활성화됩니다.")
\ No newline at end of file
+        # 브랜드 노출순위 + 평균가 겹치기
+        st.markdown('<div class="section-title">🏆 브랜드 노출순위 + 평균가</div>', unsafe_allow_html=True)
+        brand_rank = df_shop["brand"].value_counts().reset_index()
+        brand_rank.columns = ["브랜드", "노출건수"]
+        brand_avg = df_shop.groupby("brand")["lprice"].agg(["mean", "std"]).reset_index()
+        brand_avg.columns = ["브랜드", "평균가", "표준편차"]
+        brand_avg["표준편차"] = brand_avg["표준편차"].fillna(0)
+        brand_merged = brand_rank.merge(brand_avg, on="브랜드", how="left")
+
+        fig_brand = go.Figure()
+        fig_brand.add_trace(go.Bar(
+            x=brand_merged["브랜드"], y=brand_merged["노출건수"],
+            name="노출건수", marker_color="#00C8D4", opacity=0.85, yaxis="y1",
+        ))
+        fig_brand.add_trace(go.Scatter(
+            x=brand_merged["브랜드"], y=brand_merged["평균가"],
+            mode="lines+markers+text", name="브랜드 평균가",
+            line=dict(color="#B08FFF", width=2),
+            marker=dict(size=8, color="#B08FFF", line=dict(color="white", width=1.5)),
+            text=[f"{v:,.0f}원" for v in brand_merged["평균가"]],
+            textposition="top center", textfont=dict(size=9, color="#B08FFF"),
+            error_y=dict(type="data", array=brand_merged["표준편차"].tolist(),
+                         visible=True, color="#B08FFF", thickness=1.5, width=4),
+            yaxis="y2",
+        ))
+        fig_brand.update_layout(
+            paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
+            font=dict(color="#7A9CC0"),
+            title=dict(text="브랜드 노출건수 + 평균가(표준편차)",
+                       font=dict(color="#E8F0FE", size=13)),
+            hovermode="x unified",
+            legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A", font=dict(color="#E8F0FE")),
+            xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
+            yaxis=dict(title="노출건수", gridcolor="#1A2E4A", color="#00C8D4"),
+            yaxis2=dict(title="평균 가격 (원)", overlaying="y", side="right",
+                        color="#B08FFF", showgrid=False),
+            margin=dict(t=50, b=30),
+        )
+        st.plotly_chart(fig_brand, use_container_width=True)
+
+        # 브랜드 평균가 + 개당 예측가
+        st.markdown('<div class="section-title">💰 브랜드 평균 가격 (개당 예측 포함)</div>',
+                    unsafe_allow_html=True)
+        brand_price = df_shop.groupby("brand")["lprice"].agg(["mean", "std", "count"]).reset_index()
+        brand_price.columns = ["브랜드", "평균가", "표준편차", "상품수"]
+        brand_price["표준편차"]   = brand_price["표준편차"].fillna(0)
+        brand_price["개당예측가"] = brand_price["평균가"] / 6
+        brand_price = brand_price.sort_values("평균가", ascending=False)
+
+        fig_price = go.Figure()
+        fig_price.add_trace(go.Bar(
+            x=brand_price["브랜드"], y=brand_price["평균가"],
+            name="묶음 평균가", marker_color="#00C8D4", opacity=0.8,
+            error_y=dict(type="data", array=brand_price["표준편차"].tolist(),
+                         visible=True, color="#00F0FF", thickness=2, width=6),
+            text=[f"{v:,.0f}원" for v in brand_price["평균가"]],
+            textposition="outside", textfont=dict(size=9, color="#00C8D4"),
+        ))
+        fig_price.add_trace(go.Scatter(
+            x=brand_price["브랜드"], y=brand_price["개당예측가"],
+            mode="lines+markers+text", name="개당 예측가 (÷6)",
+            line=dict(color="#FFB347", width=2, dash="dot"),
+            marker=dict(size=8, color="#FFB347", line=dict(color="white", width=1.5)),
+            text=[f"≈{v:,.0f}원" for v in brand_price["개당예측가"]],
+            textposition="bottom center", textfont=dict(size=9, color="#FFB347"),
+        ))
+        fig_price.update_layout(
+            paper_bgcolor="#0B1629", plot_bgcolor="#0B1629",
+            font=dict(color="#7A9CC0"),
+            title=dict(text="브랜드 평균가(막대) + 개당 예측가(선, ÷6 기준)",
+                       font=dict(color="#E8F0FE", size=13)),
+            hovermode="x unified",
+            legend=dict(bgcolor="#1A2E4A", bordercolor="#1E3A5A", font=dict(color="#E8F0FE")),
+            xaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
+            yaxis=dict(gridcolor="#1A2E4A", color="#7A9CC0"),
+            margin=dict(t=60, b=30),
+        )
+        st.plotly_chart(fig_price, use_container_width=True)
+
+        bp = brand_price.copy()
+        bp["평균가"]    = bp["평균가"].apply(lambda x: f"{x:,.0f} 원")
+        bp["개당예측가"] = bp["개당예측가"].apply(lambda x: f"≈ {x:,.0f} 원")
+        bp["표준편차"]  = bp["표준편차"].apply(lambda x: f"±{x:,.0f}")
+        st.dataframe(bp[["브랜드", "평균가", "개당예측가", "표준편차", "상품수"]],
+                     use_container_width=True)
+    else:
+        st.info("쇼핑 검색 결과가 없습니다.")
+
+    # ── AI 보고서 (처음 한 번은 토큰 스트리밍, 이후 REPORT_CACHE의 본문 재사용) ──
+    report = REPORT_CACHE.get(result["prompt"])
+    if report is not None:
+        st.markdown('<div class="section-title">🤖 AI 통합 전략 보고서</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="ai-box">{report}</div>', unsafe_allow_html=True)
+    elif openai_enabled:
+        st.markdown('<div class="section-title">🤖 AI 통합 전략 보고서</div>', unsafe_allow_html=True)
+        try:
+            report = engine_llm.render_stream(
+                st.empty(),
+                engine_llm.chat_stream([{"role": "user", "content": result["prompt"]}], model=engine_llm.model_for("report"),
+                                       replay=engine_llm.session_replay()),
+                template='<div class="ai-box">{}</div>',
+            )
+            if report:
+                REPORT_CACHE.put(result["prompt"], report)
+        except engine_llm.ReplayMiss as e:
+            st.warning(str(e))
+    else:
+        st.info("OpenAI 키가 없어 AI 보고서는 비활성화됩니다.")
@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 
+try:
+    from parts import engine_ingredients
+except ImportError:
+    import engine_ingredients
+
 BEVERAGE_STRUCTURE = {
     "건강기능성음료": {"플레이버": ["망고", "베리", "레몬", "복숭아", "초코"], "브랜드": ["몬스터", "레드불", "셀시어스", "마이밀", "닥터유"]},
     "탄산음료":       {"플레이버": ["콜라", "레몬", "자몽", "라임", "청포도"], "브랜드": ["코카콜라", "펩시", "칠성사이다", "환타"]},
@@ -11,7 +16,13 @@ BEVERAGE_STRUCTURE = {
 }
 
 
-def run():
+# 배합표를 받지 못했을 때의 기본 배합 (원료명 · 함량%)
+DEFAULT_FORMULA = pd.DataFrame({"원료명": ["정제수", "설탕", "구연산", "향료"], "함량(%)": [85.0, 8.0, 0.3, 0.2]})
+PACKAGING       = ["용기", "캡", "라벨"]
+STOCK           = {"구연산": "부족", "캡": "확인 필요"}   # 재고 현황 (기본: 충분)
+
+
+def run(formula_df=None):
     st.markdown("""
     <style>
     .section-title {
@@ -63,29 +74,24 @@ def run():
 
     st.markdown(f'<div class="section-title">📦 [{plan_product}] 원부자재 소요량</div>', unsafe_allow_html=True)
 
-    mat_df = pd.DataFrame({
-        "원부자재": ["정제수", "설탕", "구연산", "향료", "용기", "캡", "라벨"],
-        "단위":     ["L", "kg", "kg", "kg", "개", "개", "개"],
-        "소요량":   [
-            round(total_volume * 0.85, 1), round(total_volume * 0.08, 2),
-            round(total_volume * 0.003, 3), round(total_volume * 0.002, 3),
-            plan_qty, plan_qty, plan_qty,
-        ],
-        "재고 현황": ["충분", "충분", "부족", "충분", "충분", "확인 필요", "충분"],
-    })
+    mat_df = engine_ingredients.requirements(formula_df if formula_df is not None else DEFAULT_FORMULA, total_volume)
+    mat_df = pd.concat([mat_df, pd.DataFrame({"원부자재": PACKAGING, "단위": "개", "소요량": plan_qty})],
+                       ignore_index=True)
+    mat_df["재고 현황"] = mat_df["원부자재"].map(STOCK).fillna("충분")
 
     def highlight_stock(val):
         if val == "부족":        return "background-color:#7f1d1d;color:#fecaca"
         elif val == "확인 필요": return "background-color:#713f12;color:#fef08a"
         return ""
 
-    st.dataframe(mat_df.style.applymap(highlight_stock, subset=["재고 현황"]), use_container_width=True)
+    st.dataframe(mat_df.style.map(highlight_stock, subset=["재고 현황"]), use_container_width=True)
 
-    p1, p2, p3 = st.columns(3)
+    p1, p2, p3, p4 = st.columns(4)
     p1.metric("총 생산량",    f"{plan_qty:,} 개")
     p2.metric("총 용량",      f"{total_volume:,.0f} L")
     days = max((plan_end - plan_start).days, 1)
     p3.metric("일 평균 생산", f"{plan_qty // days:,} 개/일")
+    p4.metric("원료비 합계",  f"{mat_df['금액(원)'].sum():,.0f} 원")
 
     st.markdown('<div class="section-title">생산 일정표</div>', unsafe_allow_html=True)
     schedule   = [
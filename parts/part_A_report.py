@@ -1,11 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+from parts import engine_jobs, engine_llm, engine_sched, engine_shelflife
 
 BEVERAGE_STRUCTURE = {
     "건강기능성음료": {"플레이버": ["망고", "베리", "레몬", "복숭아", "초코"], "브랜드": ["몬스터", "레드불", "셀시어스", "마이밀", "닥터유"]},
@@ -16,6 +12,21 @@ BEVERAGE_STRUCTURE = {
 }
 
 
+def _draft_job(job, prompt, model, replay, api_key):
+    """보고서 초안 작업: 스트리밍 조각을 job.partial에 누적 (화면은 engine_jobs.watch가 조각 단위로 표시)"""
+    text = ""
+    for delta in engine_llm.chat_stream([{"role": "user", "content": prompt}], model=model, key=api_key,
+                                        priority=engine_sched.BATCH, replay=replay):
+        job.check()
+        text += delta
+        job.update(message=f"{len(text):,}자 수신", partial=text)
+    return text
+
+
+def _ai_box(text):
+    st.markdown(f'<div class="ai-box">{text}</div>', unsafe_allow_html=True)
+
+
 def run():
     st.markdown("""
     <style>
@@ -31,14 +42,7 @@ def run():
     </style>
     """, unsafe_allow_html=True)
 
-    try:
-        openai_enabled = (
-            "openai" in st.secrets
-            and bool(st.secrets["openai"].get("OPENAI_API_KEY"))
-            and OpenAI is not None
-        )
-    except Exception:
-        openai_enabled = False
+    openai_enabled = engine_llm.available(engine_llm.session_replay())
 
     st.markdown('<div class="section-title">개발보고서 작성</div>', unsafe_allow_html=True)
 
@@ -70,40 +74,83 @@ def run():
     rep_quality = st.text_area("🔬 품질 규격", height=80, placeholder="당도, pH, 미생물, 이화학 규격 등", key="rep_quality")
     rep_issue   = st.text_area("⚠️ 이슈 & 개선사항", height=80, placeholder="발생 이슈 및 해결 방안", key="rep_issue")
 
+    st.markdown('<div class="section-title">🧪 유통기한 예측</div>', unsafe_allow_html=True)
+    sku_df = st.data_editor(
+        pd.DataFrame({"제품명": [rep_product], "보관": ["상온"], "기준일수": [365], "pH": [3.5],
+                      "Brix": [10.0], "Aw": [None], "Q10": [2.0], "Ea(kJ/mol)": [None]}),
+        num_rows="dynamic", use_container_width=True, key="rep_shelf_skus",
+        column_config={
+            "보관": st.column_config.SelectboxColumn(options=list(engine_shelflife.STORAGE)),
+            "기준일수": st.column_config.NumberColumn(help="기준 온도(상온 25 · 냉장 5 · 냉동 −18°C) · pH 3.5 · Aw 0.98에서의 유통기한"),
+            "Aw": st.column_config.NumberColumn(help="비우면 Brix로 추정", min_value=0.0, max_value=1.0, step=0.01),
+            "Ea(kJ/mol)": st.column_config.NumberColumn(help="입력하면 Q10 대신 Arrhenius 식 사용"),
+        })
+    shelf_profiles = st.multiselect("🌡 보관 온도 이력", list(engine_shelflife.PROFILES),
+                                    default=list(engine_shelflife.PROFILES)[:3], key="rep_shelf_profiles")
+    shelf_summary = ""
+    if shelf_profiles and not sku_df.dropna(subset=["제품명"]).empty:
+        shelf = engine_shelflife.predict_df(sku_df, {k: engine_shelflife.PROFILES[k] for k in shelf_profiles})
+        st.dataframe(shelf, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format="%d") for c in shelf.columns})
+        st.caption("표시 유통기한 = 보관 조건 기준 온도(상온 25 · 냉장 5 · 냉동 −18°C) 예측값 × 안전계수 "
+                   "(상온 0.7 · 냉장 0.8 · 냉동 0.85). "
+                   "pH·Aw 보정은 부패 미생물 카디널 모델 근사라 실측 저장 시험으로 확인해야 합니다.")
+        first = sku_df.dropna(subset=["제품명"]).iloc[0]
+        base_temp = engine_shelflife.STORAGE.get(first["보관"], engine_shelflife.STORAGE["상온"])[0]
+        with st.expander(f"⏱ 가속 시험 설계 — {first['제품명']}"):
+            st.dataframe(engine_shelflife.accelerated_plan(
+                float(pd.to_numeric(pd.Series([first["기준일수"]]), errors="coerce").fillna(365).iloc[0]),
+                float(pd.to_numeric(pd.Series([first["Q10"]]), errors="coerce").fillna(2.0).iloc[0]), base_temp,
+                [base_temp + 13, base_temp + 18, base_temp + 23] if base_temp < 0 else None),
+                use_container_width=True, hide_index=True)
+        shelf_summary = "; ".join(f"{name} 표시 {r['표시 유통기한(일)']:.0f}일 ("
+                                  + ", ".join(f"{k} {r[k]:.0f}일" for k in shelf_profiles) + ")"
+                                  for name, r in shelf.iterrows())
+
     col_btn1, col_btn2 = st.columns(2)
     with col_btn1:
-        if st.button("🤖 AI 보고서 초안 생성", key="rep_ai_btn"):
-            if openai_enabled:
-                client = OpenAI(api_key=st.secrets["openai"]["OPENAI_API_KEY"])
-                with st.spinner("AI 보고서 작성 중..."):
-                    prompt = f"""
-                    제품명: {rep_product}, 계열: {selected_group}
-                    플레이버: {final_flavor}, 브랜드: {final_brand}
-                    담당자: {rep_manager}, 버전: {rep_version}
-                    컨셉: {rep_concept}
-                    배합비: {rep_formula}
-                    관능평가: {rep_sensory}
-                    품질규격: {rep_quality}
-                    이슈: {rep_issue}
-                    위 내용으로 신제품 개발 보고서를 전문적으로 작성하세요.
-                    항목: 개발배경, 제품특성, 배합비 요약, 관능평가, 품질기준, 향후 과제
-                    """
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[{"role": "user", "content": prompt}],
-                    )
-                st.session_state["report_ai_text"] = resp.choices[0].message.content
-            else:
-                st.info("OpenAI 키가 없어 AI 초안 생성은 비활성화됩니다.")
+        ai_clicked = st.button("🤖 AI 보고서 초안 생성", key="rep_ai_btn",
+                               disabled=engine_jobs.running("report_ai"))
+        if ai_clicked and not openai_enabled:
+            st.info("OpenAI 키가 없어 AI 초안 생성은 비활성화됩니다.")
 
     with col_btn2:
         if st.button("💾 보고서 저장", key="rep_save_btn"):
             st.success(f"✅ [{rep_product}] {rep_version} 보고서가 저장되었습니다.")
 
-    if "report_ai_text" in st.session_state:
+    if ai_clicked and openai_enabled:
+        prompt = f"""
+        제품명: {rep_product}, 계열: {selected_group}
+        플레이버: {final_flavor}, 브랜드: {final_brand}
+        담당자: {rep_manager}, 버전: {rep_version}
+        컨셉: {rep_concept}
+        배합비: {rep_formula}
+        관능평가: {rep_sensory}
+        품질규격: {rep_quality}
+        유통기한 예측: {shelf_summary or "미산정"}
+        이슈: {rep_issue}
+        위 내용으로 신제품 개발 보고서를 전문적으로 작성하세요.
+        항목: 개발배경, 제품특성, 배합비 요약, 관능평가, 품질기준, 유통기한, 향후 과제
+        """
+        # 백그라운드 작업으로 생성 → 다른 입력을 만져도 중단되지 않음
+        engine_jobs.start("report_ai", "AI 보고서", _draft_job, prompt, engine_llm.model_for("report"),
+                          engine_llm.session_replay(), engine_llm.api_key(),
+                          label=f"{rep_product} 보고서 초안")
+
+    job = engine_jobs.collect("report_ai")
+    if job is not None:
+        if job.status == "done":
+            st.session_state["report_ai_text"] = job.result   # 완료 본문은 세션에 보관
+        elif job.status == "failed":
+            st.warning(f"AI 초안 생성 실패: {job.error}")
+
+    if engine_jobs.running("report_ai"):
+        # 수신 중인 본문을 조각이 도착하는 대로 ai-box에 표시 (토큰 단위 스트리밍 유지)
         st.markdown('<div class="section-title">📄 AI 생성 보고서</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="ai-box">{st.session_state["report_ai_text"]}</div>',
-                    unsafe_allow_html=True)
+        engine_jobs.watch("report_ai", render=lambda j: _ai_box((j.partial or "") + "▌"), interval=0.5)
+    elif "report_ai_text" in st.session_state:
+        st.markdown('<div class="section-title">📄 AI 생성 보고서</div>', unsafe_allow_html=True)
+        _ai_box(st.session_state["report_ai_text"])
 
     st.markdown('<div class="section-title">📁 최근 보고서 목록</div>', unsafe_allow_html=True)
     history = pd.DataFrame({
@@ -113,4 +160,24 @@ def run():
         "작성일":  ["2025-01-15", "2025-01-10", "2024-12-20", "2024-12-05", "2024-11-28"],
         "상태":    ["승인 대기", "완료", "완료", "완료", "개발 중"],
     })
-    st.dataframe(history, use_container_width=True)
\ No newline at end of file
+    st.dataframe(history, use_container_width=True)
+
+    with st.expander("🧠 AI 백엔드 · 응답 캐시"):
+        st.caption(f"엔드포인트 {engine_llm.base_url() or 'OpenAI 기본'} · "
+                   f"배합비 {engine_llm.model_for('formula')} · 보고서 {engine_llm.model_for('report')}")
+        usage = engine_llm.usage_stats()
+        if usage:
+            st.dataframe(pd.DataFrame(usage).T, use_container_width=True)
+        budget = engine_sched.scheduler.budget_status()
+        st.caption(f"오늘 사용 토큰 {budget['used']:,}"
+                   + (f" / 예산 {budget['cap']:,}" if budget["cap"] else " (예산 무제한)"))
+        sched = engine_sched.scheduler.stats()
+        if sched:
+            st.dataframe(pd.DataFrame(sched).T, use_container_width=True)
+        # 재생 모드는 이 세션에만 적용 (다른 사용자의 호출에는 영향 없음)
+        st.toggle("재생 전용 모드 (이 세션만 · 기록된 응답만 사용 · 네트워크 호출 없음)",
+                  value=engine_llm.REPLAY_DEFAULT, key=engine_llm.REPLAY_KEY)
+        st.dataframe(pd.Series(engine_llm.cache_stats(engine_llm.session_replay()), name="값").astype(str),
+                     use_container_width=True)
+        if st.button("🗑 AI 응답 캐시 비우기", key="rep_llm_clear"):
+            st.success(f"✅ {engine_llm.clear_cache()}건 삭제")
\ No newline at end of file
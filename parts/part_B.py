@@ -2,7 +2,7 @@ import streamlit as st
 import requests
 import pandas as pd
 import io
-import time  # [추가] 재시도 대기 시간을 위한 모듈
+from parts import engine_cache, engine_http, engine_i1250, engine_jobs, engine_naver, engine_search
 
 # ──────────────────────────────────────────
 # Part B - 시장조사 시스템 (독립 모듈)
@@ -16,26 +16,25 @@ FOOD_SERVICES = [
     {"순위": 6, "서비스명": "공통기준종류",             "ID": "I2590"},
 ]
 
-I1250_KOR = {
-    "LCNS_NO":                  "인허가번호",
-    "BSSH_NM":                  "업체명",
-    "PRDLST_REPORT_NO":         "품목보고번호",
-    "PRMS_DT":                  "신고일자",
-    "PRDLST_NM":                "제품명",
-    "PRDLST_DCNM":              "품목유형",
-    "PRODUCTION":               "생산종료여부",
-    "HIENG_LNTRT_DVS_NM":       "고열량저영양",
-    "CHILD_CRTFC_YN":           "어린이인증",
-    "POG_DAYCNT":               "소비기한",
-    "LAST_UPDT_DTM":            "최종수정일",
-    "INDUTY_CD_NM":             "업종",
-    "QLITY_MNTNC_TMLMT_DAYCNT": "품질유지기한",
-    "USAGE":                    "용법",
-    "PRPOS":                    "용도",
-    "DISPOS":                   "제품형태",
-    "FRMLC_MTRQLT":             "포장재질",
-    "ETQTY_XPORT_PRDLST_YN":    "내수겸용",
-}
+I1250_KOR = engine_i1250.I1250_KOR  # 한글 컬럼 매핑 (미러 적재와 공용)
+
+def _page_progress(job):
+    """harvest/sync 진행 콜백 → 작업 진행률 갱신 + 취소 지점"""
+    def on_progress(done, n_pages):
+        job.check()
+        job.update(done / n_pages if n_pages else 0.0, f"페이지 {done:,} / {n_pages:,}")
+    return on_progress
+
+
+def _bulk_job(job, api_key, extra, resume):
+    return engine_i1250.harvest_i1250(api_key, extra, resume=resume, on_progress=_page_progress(job))
+
+
+def _sync_job(job, api_key, full):
+    n, failed = engine_i1250.sync_mirror(api_key, full=full, on_progress=_page_progress(job))
+    job.update(message="검색 색인 갱신 중...")
+    engine_search.build_index()
+    return n, failed
 
 def _get_food_key():
     try:    return st.secrets["FOOD_SAFETY_API_KEY"]
@@ -55,53 +54,70 @@ def _get_naver_keys():
     import os
     return os.environ.get("NAVER_CLIENT_ID"), os.environ.get("NAVER_CLIENT_SECRET")
 
-# [수정 및 강화] 타임아웃 연장 및 자동 재시도 로직 도입
+# 타임아웃·재시도·호출 제한은 공용 클라이언트(engine_http)에서 일괄 처리
 def _call_i1250(api_key, start, end, extra_params=""):
-    # **[변경] API 규격에 맞게 앤드(&)가 아닌 슬래시(/) 파라미터 구조 권장**
-    # **[변경] 타임아웃을 20초에서 60초로 대폭 연장**
+    # API 규격: 앤드(&)가 아닌 슬래시(/) 파라미터 구조 (예: /BSSH_NM=업체명)
     url = f"http://openapi.foodsafetykorea.go.kr/api/{api_key}/I1250/json/{start}/{end}"
     if extra_params:
-        # 슬래시 기반 파라미터로 변환 (예: /BSSH_NM=업체명)
         url += f"/{extra_params.replace('&', '/')}"
-    
-    max_retries = 3  # **[추가] 최대 3번까지 재시도**
-    for i in range(max_retries):
-        try:
-            # **[수정] timeout을 60으로 증설**
-            resp = requests.get(url, timeout=60)
-            resp.raise_for_status() # HTTP 오류 발생 시 예외 발생
-            data = resp.json()
-            
-            svc = data.get("I1250", {})
-            code = svc.get("RESULT", {}).get("CODE", "")
-            msg = svc.get("RESULT", {}).get("MSG", "")
-            rows = svc.get("row", [])
-            total = int(svc.get("total_count", 0) or len(rows))
-            return rows, code, msg, total
-            
-        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectTimeout):
-            if i < max_retries - 1:
-                time.sleep(2) # **[추가] 타임아웃 시 2초 대기 후 재시도**
-                continue
-            return [], "TIMEOUT", "서버 응답 시간이 초과되었습니다. 잠시 후 다시 시도하세요.", 0
-        except Exception as e:
-            return [], "ERR", str(e), 0
 
-def _call_other(api_key, svc_id, start, end):
-    url = f"http://openapi.foodsafetykorea.go.kr/api/{api_key}/{svc_id}/json/{start}/{end}"
     try:
-        # **[수정] 공통적으로 timeout을 60으로 증설**
-        resp = requests.get(url, timeout=60)
+        resp = engine_http.get(url, retries=2, backoff=2.0)
+        resp.raise_for_status() # HTTP 오류 발생 시 예외 발생
         data = resp.json()
-        svc = data.get(svc_id, {})
+
+        svc = data.get("I1250", {})
         code = svc.get("RESULT", {}).get("CODE", "")
         msg = svc.get("RESULT", {}).get("MSG", "")
         rows = svc.get("row", [])
         total = int(svc.get("total_count", 0) or len(rows))
         return rows, code, msg, total
+
+    except requests.exceptions.Timeout:
+        return [], "TIMEOUT", "서버 응답 시간이 초과되었습니다. 잠시 후 다시 시도하세요.", 0
     except Exception as e:
         return [], "ERR", str(e), 0
 
+def _call_other(api_key, svc_id, start, end):
+    # 기준규격·영양DB는 거의 바뀌지 않으므로 디스크 캐시 우선 (TTL 경과 시 백그라운드 재검증)
+    url = f"http://openapi.foodsafetykorea.go.kr/api/{api_key}/{svc_id}/json/{start}/{end}"
+    def load():
+        try:
+            resp = engine_http.get(url)
+            data = resp.json()
+            svc = data.get(svc_id, {})
+            code = svc.get("RESULT", {}).get("CODE", "")
+            msg = svc.get("RESULT", {}).get("MSG", "")
+            rows = svc.get("row", [])
+            total = int(svc.get("total_count", 0) or len(rows))
+            return rows, code, msg, total
+        except Exception as e:
+            return [], "ERR", str(e), 0
+
+    rows, code, msg, total = engine_cache.cached_call(
+        svc_id, [start, end], load, is_valid=lambda v: v[1] in ("INFO-000", "INFO-200"))
+    return rows, code, msg, total
+
+def _i1250_df(rows):
+    """I1250 원본 row 목록 → 한글 컬럼 · 신고일자(YYYYMMDD) 역순 DataFrame"""
+    df = pd.DataFrame(rows)
+    df = df.rename(columns={k: v for k, v in I1250_KOR.items() if k in df.columns})
+    if "신고일자" in df.columns:
+        df = df.sort_values("신고일자", ascending=False)
+    return df.reset_index(drop=True)
+
+def _store_fs(df, total, failed=()):
+    """
+    조회 결과를 dtype 정규화(메모리 절감) 후 세션에 저장.
+    total은 이번 조회가 받아야 할 건수(min(호출 건수, total_count)), failed는 끝내 못 받은 페이지 구간.
+    """
+    norm = engine_i1250.normalize_i1250(df)
+    norm.insert(0, "번호", pd.Series(range(1, len(norm)+1), index=norm.index, dtype="int32"))
+    st.session_state["B_fs_df"] = norm
+    st.session_state["B_fs_total"] = total
+    st.session_state["B_fs_failed"] = list(failed)
+    st.session_state["B_fs_mem"] = engine_i1250.memory_report(df, norm)
+
 # ─────────────────────────────────────────────
 # 탭1: 식품시장현황분석 (네이버) - 기존과 동일
 # ─────────────────────────────────────────────
@@ -113,9 +129,9 @@ def _tab_naver():
 
     c1, c2, c3 = st.columns([3, 1, 1])
     with c1:
-        kw = st.text_input("🔍 검색어", placeholder="예: 라면, 음료, 과자...", key="B_nkw")
+        kw = st.text_input("🔍 검색어 (쉼표로 여러 개)", placeholder="예: 라면, 음료, 과자...", key="B_nkw")
     with c2:
-        disp = st.selectbox("수집 수", [10, 20, 50, 100], index=1, key="B_ndp")
+        disp = st.selectbox("키워드당 수집 수", [20, 100, 300, 500, 1000], index=1, key="B_ndp")
     with c3:
         sort = st.selectbox("정렬", ["sim","asc","dsc","date"],
             format_func=lambda x: {"sim":"정확도","asc":"가격↑","dsc":"가격↓","date":"날짜"}[x],
@@ -124,27 +140,31 @@ def _tab_naver():
     if st.button("🚀 수집 시작", key="B_ngo"):
         if not cid: st.error("API 키 미설정"); return
         if not kw:  st.warning("검색어 입력 필요"); return
-        headers = {"X-Naver-Client-Id": cid, "X-Naver-Client-Secret": csec}
-        with st.spinner(f"'{kw}' 수집 중..."):
-            r = requests.get("https://openapi.naver.com/v1/search/shop.json",
-                             headers=headers,
-                             params={"query": kw, "display": disp, "sort": sort})
-        if r.status_code == 200:
-            items = [{"상품명": i["title"].replace("<b>","").replace("</b>",""),
-                      "카테고리": i.get("category2",""),
-                      "최저가": int(i["lprice"] or 0),
-                      "쇼핑몰": i["mallName"],
-                      "productId": i.get("productId","")}
-                     for i in r.json().get("items",[]) if i.get("category1")=="식품"]
-            if items:
-                df = pd.DataFrame(items)
-                st.success(f"✅ {len(df)}개 수집 완료")
-                st.dataframe(df, use_container_width=True)
-                st.session_state["B_ndf"] = df
-            else:
-                st.info("식품 카테고리 상품 없음")
+        keywords = [k.strip() for k in kw.split(",") if k.strip()]
+        try:
+            with st.spinner(f"'{kw}' 수집 중... (키워드당 최대 {disp:,}건 동시 수집)"):
+                raw, failed = engine_naver.collect_shopping(keywords, cid, csec, max_items=disp,
+                                                    sort=sort, food_only=True)
+        except RuntimeError as e:
+            st.error(str(e)); return
+        if not raw.empty:
+            df = pd.DataFrame({
+                "키워드":    raw["keywords"],
+                "상품명":    raw["title"],
+                "카테고리":  raw.get("category2", ""),
+                "최저가":    raw["lprice"].fillna(0).astype(int),
+                "쇼핑몰":    raw["mallName"],
+                "productId": raw.get("productId", ""),
+            })
+            if len(keywords) == 1:
+                df = df.drop(columns=["키워드"])
+            st.success(f"✅ {len(df):,}개 수집 완료 (productId 중복 제거)")
+            if failed:
+                st.warning(f"⚠️ {len(failed)}개 페이지 수집 실패 — 일부 표본만 수집되었습니다.")
+            st.dataframe(df, use_container_width=True)
+            st.session_state["B_ndf"] = df
         else:
-            st.error(f"API 오류: {r.status_code}")
+            st.info("식품 카테고리 상품 없음")
 
     if "B_ndf" in st.session_state:
         buf = io.BytesIO()
@@ -183,14 +203,31 @@ def _tab_food_safety():
     r2c1, r2c2 = st.columns([1, 2])
     with r2c1:
         # **[시니어 조언] 타임아웃을 피하려면 최초 호출 건수를 50~100건으로 줄이는 것이 안전합니다.**
-        fetch_count = st.selectbox("📦 호출 건수", [50, 100, 200, 500], index=0, key="B_cnt")
+        fetch_count = st.selectbox("📦 호출 건수", [50, 100, 200, 500, 1000], index=0, key="B_cnt")
     with r2c2:
-        st.markdown("<br>", unsafe_allow_html=True)
+        stream_mode = st.checkbox("⚡ 스트리밍 표시 (도착한 페이지부터 바로 표시)", value=True, key="B_fs_stream")
         st.caption("💡 서버 상태가 불안정할 경우 호출 건수를 줄여보세요.")
 
+    mirror = engine_i1250.mirror_status()
+    use_mirror = st.checkbox(
+        f"⚡ 로컬 미러에서 검색 ({mirror['rows']:,}건 · 동기화 {mirror['last_sync'] or '미실행'})",
+        value=mirror["rows"] > 0, disabled=mirror["rows"] == 0, key="B_fs_local")
+
     st.markdown("</div>", unsafe_allow_html=True)
 
-    if st.button("🔍 검색", key="B_fs_fetch"):
+    search_go = st.button("🔍 검색", key="B_fs_fetch")
+    if search_go and use_mirror:
+        # 업체명·제품명은 n-gram 색인(부분일치·다중어 AND·순위), 색인 미생성 시 미러 LIKE 검색
+        ranked = engine_search.search(inp_prdnm, inp_bssh, limit=fetch_count, report_no=inp_rno)
+        if ranked is None:
+            df = engine_i1250.search_mirror(inp_bssh, inp_prdnm, inp_rno, limit=fetch_count)
+        else:
+            df = engine_i1250.fetch_rows([r for r, _ in ranked])
+        if df.empty:
+            st.info("해당하는 데이터가 없습니다.")
+        else:
+            _store_fs(df, len(df))
+    elif search_go:
         # **[수정] 파라미터 구분자를 슬래시(/)로 미리 준비**
         params_list = []
         if inp_bssh:  params_list.append(f"BSSH_NM={inp_bssh}")
@@ -198,22 +235,32 @@ def _tab_food_safety():
         if inp_rno:   params_list.append(f"PRDLST_REPORT_NO={inp_rno}")
         extra = "/".join(params_list)
 
-        with st.spinner(f"데이터 {fetch_count}건 수집 중... (최대 60초 소요)"):
-            rows, code, msg, total = _call_i1250(api_key, 1, fetch_count, extra)
+        if stream_mode:
+            # 100건 단위 페이지를 도착 순서대로 표에 이어 붙임 → 첫 페이지 지연만큼만 대기
+            prog, table = st.empty(), st.empty()
+            rows, code, msg, total, failed = [], "INFO-000", "", 0, []
+            prog.caption("첫 페이지 수집 중...")
+            try:
+                for page, total in engine_i1250.iter_pages(api_key, fetch_count, extra, failed=failed):
+                    rows.extend(page)
+                    if total:
+                        prog.progress(min(len(rows) / total, 1.0), text=f"{len(rows):,} / {total:,}건 수신")
+                    if rows:
+                        table.dataframe(_i1250_df(rows), use_container_width=True)
+            except requests.exceptions.Timeout:
+                code, msg = "TIMEOUT", "서버 응답 시간이 초과되었습니다. 잠시 후 다시 시도하세요."
+            except Exception as e:
+                code, msg = "ERR", str(e)
+            prog.empty(); table.empty()
+            if not rows and code == "INFO-000":
+                code = "INFO-200"
+        else:
+            with st.spinner(f"데이터 {fetch_count}건 수집 중... (최대 60초 소요)"):
+                rows, code, msg, total = _call_i1250(api_key, 1, fetch_count, extra)
+            total, failed = min(fetch_count, total), []
 
         if rows:
-            df = pd.DataFrame(rows)
-            df = df.rename(columns={k: v for k, v in I1250_KOR.items() if k in df.columns})
-
-            if "신고일자" in df.columns:
-                df["신고일자_dt"] = pd.to_datetime(df["신고일자"], format="%Y%m%d", errors="coerce")
-                df = df.sort_values("신고일자_dt", ascending=False)
-                df["신고일자"] = df["신고일자_dt"].dt.strftime("%Y-%m-%d")
-                df = df.drop(columns=["신고일자_dt"])
-
-            df.insert(0, "번호", range(1, len(df)+1))
-            st.session_state["B_fs_df"] = df
-            st.session_state["B_fs_total"] = total
+            _store_fs(_i1250_df(rows), total, failed)
         elif code == "TIMEOUT":
             st.error(f"⏳ {msg}")
         elif code == "INFO-200":
@@ -221,10 +268,81 @@ def _tab_food_safety():
         else:
             st.error(f"조회 실패 [{code}]: {msg}")
 
+    # ── 벌크 수집: total_count 기준 페이지 분할 → 병렬 호출 (중단 시 이어받기) ──
+    bc1, bc2 = st.columns([1, 2])
+    with bc1:
+        bulk_go = st.button("📦 전체 수집 (벌크)", key="B_fs_bulk")
+    with bc2:
+        bulk_resume = st.checkbox("이전 수집 이어받기", value=True, key="B_fs_resume")
+        st.caption("💡 검색 조건 전체를 1,000건 단위로 나눠 동시에 수집합니다. 실패 페이지는 다시 실행하면 이어받습니다.")
+
+    if bulk_go and not engine_jobs.running("B_bulk"):
+        params_list = []
+        if inp_bssh:  params_list.append(f"BSSH_NM={inp_bssh}")
+        if inp_prdnm: params_list.append(f"PRDLST_NM={inp_prdnm}")
+        if inp_rno:   params_list.append(f"PRDLST_REPORT_NO={inp_rno}")
+        extra = "/".join(params_list)
+        # 백그라운드 작업으로 실행 → 화면 조작·재실행과 무관하게 계속 수집
+        engine_jobs.start("B_bulk", "I1250", _bulk_job, api_key, extra, bulk_resume,
+                          label=f"I1250 벌크 수집 {extra or '(전체)'}")
+
+    job = engine_jobs.collect("B_bulk")
+    if job is not None:
+        if job.status == "cancelled":
+            st.info("벌크 수집을 중지했습니다. 다시 실행하면 받은 페이지 이후부터 이어받습니다.")
+        elif job.status == "failed":
+            st.error(f"벌크 수집 실패: {job.error}")
+        else:
+            rows, failed, total = job.result
+            if rows:
+                _store_fs(_i1250_df(rows), total, failed)
+                st.success(f"✅ {len(rows):,} / {total:,}건 수집 완료")
+            else:
+                st.info("해당하는 데이터가 없습니다.")
+            if failed:
+                st.warning(f"⚠️ {len(failed)}개 페이지 수집 실패 — 다시 실행하면 실패 페이지만 이어받습니다.")
+
+    engine_jobs.watch("B_bulk")
+
+    # ── 로컬 미러 동기화: 최초 1회 전체 수집, 이후 최종수정일 기준 변경분만 ──
+    with st.expander("🗄 I1250 로컬 미러 동기화"):
+        st.caption(f"적재 {mirror['rows']:,}건 · 마지막 동기화 {mirror['last_sync'] or '없음'}"
+                   f" · 증분 기준일 {mirror['watermark'] or '없음'}")
+        sync_full = st.checkbox("전체 재수집", value=False, key="B_fs_sync_full")
+        if mirror["rows"] and engine_search.load_index() is None and st.button("🔎 검색 색인 생성", key="B_fs_index"):
+            with st.spinner("검색 색인 생성 중..."):
+                st.success(f"✅ {engine_search.build_index():,}건 색인 완료")
+        if st.button("🔄 미러 동기화", key="B_fs_sync") and not engine_jobs.running("B_sync"):
+            engine_jobs.start("B_sync", "I1250", _sync_job, api_key, sync_full, label="I1250 미러 동기화")
+        job = engine_jobs.collect("B_sync")
+        if job is not None:
+            if job.status == "failed":
+                st.error(f"동기화 실패: {job.error}")
+            elif job.status == "cancelled":
+                st.info("동기화를 중지했습니다. 기준일은 유지됩니다.")
+            else:
+                n, failed = job.result
+                st.success(f"✅ {n:,}건 반영 · 검색 색인 갱신 완료")
+                if failed:
+                    st.warning(f"⚠️ {len(failed)}개 페이지 실패 — 기준일은 유지되며 다시 실행하면 재시도합니다.")
+        engine_jobs.watch("B_sync")
+
     # 결과 출력 및 다운로드 로직 (기존과 동일하므로 생략 가능하나 전체 유지를 위해 포함)
     if "B_fs_df" in st.session_state:
         df = st.session_state["B_fs_df"]
-        st.dataframe(df, use_container_width=True)
+        st.dataframe(df, use_container_width=True, column_config={
+            "신고일자":   st.column_config.DateColumn(format="YYYY-MM-DD"),
+            "최종수정일": st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm"),
+        })
+        fs_total, fs_failed = st.session_state.get("B_fs_total", len(df)), st.session_state.get("B_fs_failed", [])
+        if fs_failed or len(df) < fs_total:
+            ranges = ", ".join(f"{s:,}~{e:,}" for s, e in fs_failed[:5]) + (" 외" if len(fs_failed) > 5 else "")
+            st.warning(f"⚠️ 부분 결과: {len(df):,} / {fs_total:,}건"
+                       + (f" — 실패 구간 {ranges}. 다시 조회하면 재시도합니다." if fs_failed else ""))
+        mem = st.session_state.get("B_fs_mem")
+        if mem:
+            st.caption(f"🧮 세션 메모리 {mem['before_mb']:.2f}MB → {mem['after_mb']:.2f}MB "
+                       f"(×{mem['ratio']} 절감, {len(df):,}행)")
 
 def run():
     st.markdown("# 📊 시장조사 시스템")
@@ -233,5 +351,56 @@ def run():
     with tabs[1]: _tab_food_safety()
     with tabs[2]: st.info("매출 집계 기능 — 추후 연동 예정")
 
+    with st.expander("🗂 참조 데이터 조회 · 캐시 (I2580 · I2600 · I2590 · I0760)"):
+        ref_svcs = [s for s in FOOD_SERVICES if s["ID"] != "I1250"]
+        rc1, rc2, rc3 = st.columns([2, 1, 1])
+        with rc1:
+            ref_svc = st.selectbox("참조 서비스", ref_svcs, format_func=lambda s: f"{s['서비스명']} ({s['ID']})",
+                                   key="B_ref_svc")
+        with rc2:
+            ref_start = st.number_input("시작", min_value=1, value=1, step=100, key="B_ref_start")
+        with rc3:
+            ref_end = st.number_input("끝", min_value=1, value=100, step=100, key="B_ref_end")
+        if st.button("📖 참조 데이터 조회", key="B_ref_go"):
+            api_key = _get_food_key()
+            if not api_key:
+                st.warning("⚠️ Streamlit Secrets에 `FOOD_SAFETY_API_KEY` 등록 필요")
+            else:
+                rows, code, msg, total = _call_other(api_key, ref_svc["ID"], int(ref_start),
+                                                     min(max(int(ref_start), int(ref_end)), int(ref_start) + 999))
+                if rows:
+                    st.caption(f"{len(rows):,} / {total:,}건 (캐시 우선 · TTL 경과 시 백그라운드 갱신)")
+                    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+                elif code == "INFO-200":
+                    st.info("해당하는 데이터가 없습니다.")
+                else:
+                    st.error(f"조회 실패 [{code}]: {msg}")
+
+        cache = engine_cache.cache_status()
+        if cache:
+            st.dataframe(pd.DataFrame(cache).T.rename(columns={"entries": "캐시 건수", "oldest": "최초 저장"}),
+                         use_container_width=True)
+        else:
+            st.caption("저장된 캐시가 없습니다.")
+        svc_opts = ["전체"] + [s["ID"] for s in FOOD_SERVICES if s["ID"] != "I1250"]
+        inv_svc = st.selectbox("무효화 대상", svc_opts, key="B_cache_svc")
+        if st.button("🗑 캐시 무효화", key="B_cache_inv"):
+            n = engine_cache.invalidate(None if inv_svc == "전체" else inv_svc)
+            st.success(f"✅ {n}건 삭제 — 다음 조회 시 새로 받아옵니다.")
+
+    with st.expander("🧵 백그라운드 작업"):
+        jobs = engine_jobs.snapshot()
+        if jobs:
+            st.dataframe(pd.DataFrame(jobs), use_container_width=True, hide_index=True)
+        else:
+            st.caption("실행된 작업이 없습니다.")
+
+    with st.expander("📡 외부 API 호출 통계"):
+        stats = engine_http.stats()
+        if stats:
+            st.dataframe(pd.DataFrame(stats).T, use_container_width=True)
+        else:
+            st.caption("아직 호출 기록이 없습니다.")
+
 if __name__ == "__main__":
     run()
\ No newline at end of file
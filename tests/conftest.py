@@ -0,0 +1,11 @@
+# conftest.py
+# 엔진 단위 시험 공용 설정 — 엔진 모듈은 가져올 때 DATA_DIR을 정하므로, 가져오기 전에 임시 폴더로 돌린다
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ["NPD_DATA_DIR"] = tempfile.mkdtemp(prefix="npd_test_")
+os.environ.pop("NPD_LLM_REPLAY", None)
+sys.path.insert(0, ROOT)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from parts import engine_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(engine_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_ttl_expiry(clock):
+    cache = engine_cache.TTLCache(ttl=60)
+    cache.put("k", 1)
+    clock[0] += 60
+    assert cache.get("k") == 1
+    clock[0] += 1
+    assert cache.get("k") is None and len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = engine_cache.TTLCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_single_flight_computes_once():
+    cache = engine_cache.TTLCache()
+    calls, started = [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(fresh for _, fresh in results) == [False] * 7 + [True]
+    assert {v for v, _ in results} == {"value"}
+
+
+def test_unstored_result_is_recomputed():
+    cache = engine_cache.TTLCache()
+    assert cache.get_or_compute("k", lambda: "partial", should_store=lambda v: False) == ("partial", True)
+    assert cache.get_or_compute("k", lambda: "full") == ("full", True)
+    assert cache.get_or_compute("k", lambda: "other") == ("full", False)
+
+
+def test_cached_call_serves_stale_and_revalidates(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(engine_cache, "CACHE_DIR", str(tmp_path))
+    assert engine_cache.cached_call("svc", ["a"], lambda: [1], ttl=10) == [1]
+    assert engine_cache.cached_call("svc", ["a"], lambda: [2], ttl=10) == [1]
+    done = threading.Event()
+
+    def loader():
+        done.set()
+        return [3]
+
+    clock[0] += 11
+    assert engine_cache.cached_call("svc", ["a"], loader, ttl=10) == [1]   # 만료 → 기존 값 즉시 반환
+    assert done.wait(5)
+    for _ in range(100):
+        if engine_cache._read(engine_cache._key("svc", "a"))["value"] == [3]:
+            break
+        time.sleep(0.01)
+    assert engine_cache.cached_call("svc", ["a"], lambda: [4], ttl=10) == [3]
+    assert engine_cache.invalidate("svc") == 1
+
+
+def test_cached_call_skips_invalid(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_cache, "CACHE_DIR", str(tmp_path))
+    assert engine_cache.cached_call("svc", ["b"], lambda: [], is_valid=bool) == []
+    assert engine_cache.cached_call("svc", ["b"], lambda: [5], is_valid=bool) == [5]
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from parts import engine_formula as ef
+
+
+def codes(issues):
+    return [i["code"] for i in issues]
+
+
+def test_renormalize_hits_total_exactly():
+    out = ef.renormalize([1, 1, 1])
+    assert round(out.sum(), 2) == 100.0
+    assert sorted(out.tolist(), reverse=True) == [33.34, 33.33, 33.33]
+
+
+def test_renormalize_keeps_proportions():
+    v = np.array([50.3, 30.1, 19.9, 0.05])
+    out = ef.renormalize(v)
+    assert round(out.sum(), 2) == 100.0
+    assert np.abs(out - v / v.sum() * 100).max() <= 0.01
+
+
+def test_renormalize_empty_and_zero():
+    assert len(ef.renormalize([])) == 0
+    assert ef.renormalize([0, 0]).tolist() == [0, 0]
+
+
+def test_repair_renormalizes_small_drift_with_aliases():
+    rows = [{"원재료명": "정제수", "배합비": "89.9%"}, {"원료명": "설탕", "함량(%)": 10}]
+    df, issues = ef.repair_formula(rows)
+    assert not ef.is_fatal(issues)
+    assert df[ef.RATIO_COL].sum().round(2) == 100.0
+    assert "renormalized" in codes(issues) and "coerced_ratio" in codes(issues)
+    assert list(df.columns[:len(ef.COLUMNS)]) == ef.COLUMNS
+
+
+def test_repair_sums_duplicates():
+    df, issues = ef.repair_formula([{"원료명": "설탕", "배합비(%)": 5}, {"원료명": "설탕", "배합비(%)": 5},
+                                    {"원료명": "정제수", "배합비(%)": 90}])
+    assert "duplicate_name" in codes(issues)
+    assert df.set_index("원료명")[ef.RATIO_COL].to_dict() == {"설탕": 10.0, "정제수": 90.0}
+
+
+def test_repair_refuses_far_off_total():
+    df, issues = ef.repair_formula([{"원료명": "정제수", "배합비(%)": 60}, {"원료명": "설탕", "배합비(%)": 10}])
+    assert ef.is_fatal(issues) and "total_off" in codes(issues)
+    assert df[ef.RATIO_COL].tolist() == [60.0, 10.0]
+
+
+def test_repair_does_not_spread_dropped_rows():
+    df, issues = ef.repair_formula([{"원료명": "정제수", "배합비(%)": 97}, {"원료명": "설탕", "배합비(%)": "적당량"},
+                                    {"원료명": "구연산", "배합비(%)": 0.2}])
+    assert ef.is_fatal(issues) and "dropped_rows" in codes(issues)
+    assert df[ef.RATIO_COL].sum() == 97.2
+
+
+def test_repair_rejects_empty():
+    df, issues = ef.repair_formula([])
+    assert df.empty and ef.is_fatal(issues)
+
+
+def base_df():
+    return pd.DataFrame({"원료명": ["정제수", "설탕", "구연산"], ef.RATIO_COL: [89.7, 10.0, 0.3],
+                         "사용 목적": ["", "", ""], "용도": "", "용법": "", "사용주의사항": ""})
+
+
+def test_apply_patch_adjust_and_add_keep_touched_values():
+    df, issues = ef.apply_patch(base_df(), [{"op": "adjust", "원료명": "설탕", "delta": -2},
+                                            {"op": "add", "원료명": "알룰로스", "배합비(%)": 2}])
+    r = df.set_index("원료명")[ef.RATIO_COL]
+    assert r["설탕"] == 8.0 and r["알룰로스"] == 2.0 and r["구연산"] == 0.3
+    assert round(r.sum(), 2) == 100.0
+
+
+def test_apply_patch_remove_and_bad_ops():
+    df, issues = ef.apply_patch(base_df(), [{"op": "remove", "원료명": " 구 연산"}, {"op": "explode", "원료명": "설탕"},
+                                            {"op": "adjust", "원료명": "없는원료", "delta": 1}])
+    assert "구연산" not in df["원료명"].tolist()
+    assert round(df[ef.RATIO_COL].sum(), 2) == 100.0
+    assert "bad_op" in codes(issues) and "not_found" in codes(issues)
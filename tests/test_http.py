@@ -0,0 +1,36 @@
+import pytest
+
+from parts import engine_http
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(engine_http.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_burst_up_to_capacity(clock):
+    bucket = engine_http.TokenBucket(rate=2.0, capacity=5)
+    assert [bucket.try_take() for _ in range(5)] == [0.0] * 5
+    assert bucket.try_take() == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_rate(clock):
+    bucket = engine_http.TokenBucket(rate=8.0, capacity=8)
+    assert bucket.try_take(8) == 0.0
+    assert bucket.try_take(4) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert bucket.try_take(4) == 0.0
+    clock[0] += 100.0   # 용량 이상으로는 쌓이지 않음
+    assert bucket.try_take(8) == 0.0
+    assert bucket.try_take(1) == pytest.approx(0.125)
+
+
+def test_bucket_oversized_request_and_refund(clock):
+    bucket = engine_http.TokenBucket(rate=1.0, capacity=3)
+    assert bucket.try_take(10) == 0.0   # 용량보다 큰 요청은 가득 찼을 때 통과
+    bucket.refund(-2)                   # 실제 사용량이 더 많았음 → 빚
+    assert bucket.try_take(1) == pytest.approx(3.0)
+    bucket.refund(5)
+    assert bucket.try_take(3) == 0.0
@@ -0,0 +1,65 @@
+import pytest
+import requests
+
+from parts import engine_i1250
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(engine_i1250.time, "sleep", lambda s: None)
+
+
+def flaky(errors, result=([], 0)):
+    calls = []
+
+    def fetch(api_key, start, end, extra_params=""):
+        calls.append((start, end))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fetch, calls
+
+
+def test_permanent_error_is_not_retried(monkeypatch):
+    fetch, calls = flaky([engine_i1250.ApiError("INFO-100", "인증키가 유효하지 않습니다")])
+    monkeypatch.setattr(engine_i1250, "fetch_page", fetch)
+    with pytest.raises(engine_i1250.ApiError):
+        engine_i1250.fetch_page_retry("key", 1, 10)
+    assert len(calls) == 1
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    code = sorted(engine_i1250.TRANSIENT_CODES)[0]
+    fetch, calls = flaky([requests.ConnectionError(), engine_i1250.ApiError(code)], ([{"a": 1}], 1))
+    monkeypatch.setattr(engine_i1250, "fetch_page", fetch)
+    assert engine_i1250.fetch_page_retry("key", 1, 10) == ([{"a": 1}], 1)
+    assert len(calls) == 3
+
+
+def test_plan_pages_covers_total():
+    assert engine_i1250.plan_pages(27, 10) == [(1, 10), (11, 20), (21, 27)]
+    assert engine_i1250.plan_pages(0, 10) == []
+
+
+def test_checkpoint_reset_when_total_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_i1250, "HARVEST_DIR", str(tmp_path))
+    total = [25]
+    calls = []
+
+    def fetch(api_key, start, end, extra_params=""):
+        calls.append(start)
+        return [{"PRDLST_REPORT_NO": f"{total[0]}-{i}"} for i in range(start, end + 1)], total[0]
+
+    monkeypatch.setattr(engine_i1250, "fetch_page", fetch)
+    rows, failed, n = engine_i1250.harvest_i1250("key", page_size=10, max_workers=1)
+    assert (len(rows), failed, n) == (25, [], 25)
+
+    calls.clear()
+    engine_i1250.harvest_i1250("key", page_size=10, max_workers=1)
+    assert calls == [1]                       # 같은 건수 → 체크포인트 이어받기
+
+    calls.clear()
+    total[0] = 27
+    rows, _, n = engine_i1250.harvest_i1250("key", page_size=10, max_workers=1)
+    assert sorted(calls) == [1, 11, 21] and n == 27
+    assert all(r["PRDLST_REPORT_NO"].startswith("27-") for r in rows)
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from parts import engine_ai, engine_llm, llm_stub
+
+MESSAGES = [{"role": "user", "content": "안녕하세요"}]
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    server = llm_stub.serve(port=0, delay=0, jitter=0, chunk_delay=0, background=True)
+    monkeypatch.setenv("NPD_LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(engine_llm, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_cache_key_includes_sampling_params():
+    base = engine_llm.cache_key("m", MESSAGES)
+    assert base == engine_llm.cache_key("m", MESSAGES)
+    assert base != engine_llm.cache_key("m", MESSAGES, temperature=0.2)
+    assert engine_llm.cache_key("m", MESSAGES, temperature=0.2) != engine_llm.cache_key("m", MESSAGES, temperature=0.9)
+    assert base != engine_llm.cache_key("m", MESSAGES, {"type": "json_object"})
+
+
+def test_chat_caches_and_replays(stub):
+    first = engine_llm.chat(MESSAGES, model="stub", replay=False)
+    assert first
+    stub.shutdown()   # 서버가 없어도 같은 요청은 캐시에서 나온다
+    assert engine_llm.chat(MESSAGES, model="stub", replay=True) == first
+    with pytest.raises(engine_llm.ReplayMiss):
+        engine_llm.chat(MESSAGES, model="stub", replay=True, temperature=0.5)
+
+
+def test_generate_formula_through_stub_is_repaired(stub):
+    info = {"category": "음료류", "sub_category": "과채음료", "flavor_name": "오렌지", "concept": "저당"}
+    df, reasoning = engine_ai.generate_food_formula(info, replay=False)
+    assert not df.empty and reasoning
+    assert round(df["배합비(%)"].sum(), 2) == 100.0
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("scipy")
+
+from parts import engine_optimize as eo
+from parts import engine_props as ep
+
+
+def sugars():
+    props, _ = ep.lookup(["정제수", "설탕", "액상과당"])
+    return props, np.array([0.0, 1000.0, 700.0])
+
+
+def test_cheapest_sweetener_hits_brix():
+    props, prices = sugars()
+    res = eo.optimize(props, prices, [0, 0, 0], [100, 100, 100], brix=10, tol_brix=0)
+    assert res["status"][0] == "optimal"
+    assert res["ratios"][0, 1] == pytest.approx(0, abs=1e-6)
+    assert res["ratios"][0, 2] == pytest.approx(1000 / 77, abs=1e-3)
+    assert res["brix"][0] == pytest.approx(10, abs=1e-6)
+
+
+def test_batched_targets_are_independent_and_verified():
+    props, prices = sugars()
+    res = eo.optimize(props, prices, [0, 0, 0], [100, 100, 100], brix=[8, 10, 12])
+    assert list(res["status"]) == ["optimal"] * 3
+    assert np.all(np.abs(res["brix"] - [8, 10, 12]) <= eo.TOL_BRIX + 1e-6)
+    np.testing.assert_allclose(res["ratios"].sum(axis=1), 100)
+
+
+def test_infeasible_inputs():
+    props, prices = sugars()
+    assert eo.optimize(np.zeros((0, 4)), [], [], [], brix=10)["status"][0] == "infeasible"
+    assert eo.optimize(props, prices, [0, 50, 0], [100, 10, 100], brix=10)["status"][0] == "infeasible"
+    # 설탕만으로는 Brix 100을 넘을 수 없다
+    assert eo.optimize(props, prices, [0, 0, 0], [100, 100, 100], brix=120)["status"][0] == "infeasible"
+    # 산이 없으면 pH 3은 불가
+    assert eo.optimize(props, prices, [0, 0, 0], [100, 100, 100], ph=3.0)["status"][0] == "infeasible"
+
+
+def drink():
+    return pd.DataFrame({"원료명": ["정제수", "설탕", "구연산", "구연산삼나트륨"],
+                         "함량(%)": [89.7, 10.0, 0.3, 0.0], "원가(원/kg)": [0, 1000, 3000, 4000],
+                         "최대(%)": [100, 100, 1, 1]})
+
+
+def test_ph_target_is_met_and_acidulant_kept():
+    table, props, status = eo.optimize_df(drink(), {"brix": 10.3, "ph": 3.2})
+    assert status == "optimal"
+    assert abs(props["ph"] - 3.2) <= eo.TOL_PH + eo.CHECK_SLACK
+    ratios = table.set_index("원료명")["최적(%)"]
+    assert ratios["구연산"] >= 0.3 - 1e-6
+    assert ratios["구연산삼나트륨"] > 0
+
+
+def test_scenario_grid_cost_rises_with_brix():
+    grid = eo.scenario_grid(drink(), [8, 10, 12], [3.2])
+    col = grid.iloc[:, 0].to_numpy()
+    assert np.isfinite(col).all()
+    assert col[0] < col[1] < col[2]
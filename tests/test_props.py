@@ -0,0 +1,48 @@
+import numpy as np
+
+from parts import engine_props as ep
+
+NAMES = ["정제수", "설탕", "구연산", "구연산삼나트륨"]
+
+
+def test_lookup_exact_alias_and_unknown():
+    props, unknown = ep.lookup(["설탕", "백 설탕", "물", "미등록원료"])
+    assert props[0].tolist() == list(ep.DEFAULT_PROPS["설탕"])
+    assert props[1].tolist() == list(ep.DEFAULT_PROPS["백설탕"])
+    assert "미등록원료" in unknown
+    assert props[3].tolist() == [0.0, 0.0, 0.0, 0.0]
+
+
+def test_evaluate_is_linear_and_batched():
+    props, _ = ep.lookup(NAMES)
+    prices = np.array([0, 1000, 3000, 4000])
+    ratios = np.array([[89.7, 10.0, 0.3, 0.0], [79.7, 20.0, 0.3, 0.0]])
+    out = ep.evaluate(ratios, props, prices, unit_ml=500, targets={"brix": 10})
+    assert out["brix"].shape == (2,)
+    np.testing.assert_allclose(out["brix"], [10.3, 20.3])
+    np.testing.assert_allclose(out["total"], [100, 100])
+    np.testing.assert_allclose(out["density"], 1 + 0.004 * out["brix"])
+    np.testing.assert_allclose(out["cost_kg"], [109.0, 209.0])
+    np.testing.assert_allclose(out["cost_unit"], out["cost_l"] * 0.5)
+    np.testing.assert_allclose(out["dev_brix"], [0.3, 10.3])
+
+
+def test_buffer_salt_raises_ph():
+    props, _ = ep.lookup(NAMES)
+    phs = [float(ep.evaluate([89.7 - c, 10.0, 0.3, c], props, np.zeros(4))["ph"]) for c in (0, 0.05, 0.1, 0.2)]
+    assert all(a < b for a, b in zip(phs, phs[1:]))
+    assert 2.3 < phs[0] < 2.7
+
+
+def test_acid_for_ph_round_trips_through_evaluate():
+    props, _ = ep.lookup(NAMES)
+    for ph, base in ((3.0, 0.0), (3.5, 0.0), (3.5, 0.1)):
+        acid = float(ep.acid_for_ph(ph, base))
+        salt = base / props[3, 3]           # 염기 당량 → 구연산삼나트륨 함량
+        # 비중 1 근처(Brix ≈ 0)에서 w/v ≈ w/w
+        out = ep.evaluate([100 - acid - salt, 0.0, acid, salt], props, np.zeros(4))
+        assert abs(float(out["ph"]) - ph) < 0.02
+
+
+def test_acid_for_ph_zero_when_base_alone_is_lower():
+    assert float(ep.acid_for_ph(8.0, 0.0)) == 0.0
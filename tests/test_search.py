@@ -0,0 +1,46 @@
+import pytest
+
+from parts import engine_i1250, engine_search
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_i1250, "MIRROR_PATH", str(tmp_path / "mirror.sqlite"))
+    monkeypatch.setitem(engine_search._loaded, "mtime", None)
+    index_dir = str(tmp_path / "index")
+
+    def load(rows):
+        engine_i1250.upsert_rows([{"PRDLST_REPORT_NO": rno, "PRDLST_NM": prd, "BSSH_NM": bssh,
+                                   "PRMS_DT": "20240101"} for rno, prd, bssh in rows])
+        engine_search.build_index(index_dir)
+        return index_dir
+    return load
+
+
+def test_search_finds_every_matching_product(mirror):
+    rows = [(f"A{i:05d}", f"제주 감귤 오렌지 주스 {i}", "가나식품") for i in range(2500)]
+    rows += [(f"B{i:05d}", f"사과 주스 {i}", "가나식품") for i in range(500)]
+    index_dir = mirror(rows)
+    hits = engine_search.search("오렌지", limit=10000, index_dir=index_dir)
+    assert {r for r, _ in hits} == {r for r, _, _ in rows[:2500]}
+
+
+def test_prefix_match_outranks_short_names_beyond_first_chunk(mirror):
+    rows = [(f"S{i:05d}", f"감귤오렌지{i}", "가나식품") for i in range(engine_search.SCORE_CHUNK + 500)]
+    rows += [(f"L{i}", f"오렌지 과즙 듬뿍 들어간 프리미엄 스파클링 음료 {i}", "다라음료") for i in range(3)]
+    index_dir = mirror(rows)
+    hits = engine_search.search("오렌지", limit=3, index_dir=index_dir)
+    assert sorted(r for r, _ in hits) == ["L0", "L1", "L2"]
+
+
+def test_multi_term_and_report_no_filter(mirror):
+    rows = [("R1", "오렌지 주스", "가나식품"), ("R2", "오렌지 주스", "다라음료"), ("R3", "포도 주스", "가나식품")]
+    index_dir = mirror(rows)
+    assert [r for r, _ in engine_search.search("오렌지 주스", "가나", index_dir=index_dir)] == ["R1"]
+    assert [r for r, _ in engine_search.search("주스", report_no="R3", limit=1, index_dir=index_dir)] == ["R3"]
+    assert engine_search.search("주스", report_no="R9", index_dir=index_dir) == []
+
+
+def test_unnarrowable_query_returns_none(mirror):
+    index_dir = mirror([("R1", "오렌지 주스", "가나식품")])
+    assert engine_search.search("주", index_dir=index_dir) is None
@@ -0,0 +1,54 @@
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from parts import engine_shelflife as es
+
+HTML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shelflife_simulator.html")
+JS_KEYS = {"cold": "냉장", "room": "상온", "frozen": "냉동"}
+
+
+def js_constants():
+    src = open(HTML, encoding="utf-8").read()
+    base = re.search(r'baseTemp=storage==="cold"\?([-\d.]+):storage==="room"\?([-\d.]+):([-\d.]+)', src).groups()
+    safety = re.search(r'safetyFactor=storage==="cold"\?([-\d.]+):storage==="room"\?([-\d.]+):([-\d.]+)', src).groups()
+    return {JS_KEYS[k]: (float(b), float(s)) for k, b, s in zip(("cold", "room", "frozen"), base, safety)}
+
+
+def test_storage_matches_js_simulator():
+    assert js_constants() == es.STORAGE
+
+
+def test_accelerated_plan_matches_js_formula():
+    target, q10, base = 365, 2.5, 25.0
+    plan = es.accelerated_plan(target, q10, base)
+    expected = [round(target / q10 ** ((t - base) / 10)) for t in (base + 10, base + 20, base + 30)]
+    assert plan["시험 일수"].tolist() == expected
+
+
+def test_predict_at_reference_conditions_returns_base_days():
+    days = es.predict([180, 365], 25.0, [[25.0] * 8], ph=es.PH_REF, aw=es.AW_REF)
+    np.testing.assert_allclose(days[:, 0], [180, 365], rtol=1e-6)
+
+
+def test_q10_scales_predicted_days():
+    days = es.predict(200, 25.0, [[35.0] * 8, [15.0] * 8], q10=2.0, ph=es.PH_REF, aw=es.AW_REF)
+    np.testing.assert_allclose(days[0], [100, 400], rtol=1e-6)
+
+
+def test_predict_df_label_uses_own_storage_safety_factor():
+    sku = pd.DataFrame({"제품명": ["주스", "아이스크림", "음료"], "보관": ["냉장", "냉동", "상온"],
+                        "기준일수": [30, 365, 365], "pH": [es.PH_REF] * 3, "Aw": [es.AW_REF] * 3})
+    out = es.predict_df(sku)
+    expected = [math.floor(d * es.STORAGE[s][1]) for d, s in zip(sku["기준일수"], sku["보관"])]
+    assert out["표시 유통기한(일)"].tolist() == expected
+
+
+def test_predict_df_tolerates_bad_inputs():
+    sku = pd.DataFrame({"제품명": ["A"], "보관": ["모름"], "기준일수": [0], "pH": [None], "Q10": [-1]})
+    out = es.predict_df(sku)
+    assert np.isfinite(out.to_numpy(dtype=float)).all()
+    assert (out.to_numpy(dtype=float) > 0).all()